@@ -1,27 +1,52 @@
 """contain-agent: A lightweight tool to run AI coding agents inside isolated Docker containers."""
 
-from contain_agent.cli import app, run
-from contain_agent.constants import (
-    DEFAULT_IMAGE,
-    KNOWN_CONFIG_NAMES,
-    SENSITIVE_DIRECTORIES,
-)
-from contain_agent.docker import (
-    build_docker_command,
-    build_image_command,
-    check_image_exists,
-    get_docker_cmd,
-    get_docker_context,
-)
-from contain_agent.paths import (
-    get_config_mounts,
-    is_sensitive_directory,
-)
-from contain_agent.settings import (
-    Settings,
-    load_settings,
-    settings,
-)
+from importlib import import_module
+from types import ModuleType
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from contain_agent.cli import app, run
+    from contain_agent.constants import (
+        DEFAULT_IMAGE,
+        KNOWN_CONFIG_NAMES,
+        SENSITIVE_DIRECTORIES,
+    )
+    from contain_agent.docker import (
+        build_docker_command,
+        build_image_command,
+        check_image_exists,
+        get_docker_cmd,
+        get_docker_context,
+    )
+    from contain_agent.paths import (
+        get_config_mounts,
+        is_sensitive_directory,
+    )
+    from contain_agent.settings import (
+        Settings,
+        load_settings,
+        settings,
+    )
+
+# Public names are resolved on first access so that importing the package (as
+# the fast launcher does) pulls in neither typer nor pydantic.
+_EXPORTS = {
+    "DEFAULT_IMAGE": "contain_agent.constants",
+    "KNOWN_CONFIG_NAMES": "contain_agent.constants",
+    "SENSITIVE_DIRECTORIES": "contain_agent.constants",
+    "Settings": "contain_agent.settings",
+    "app": "contain_agent.cli",
+    "build_docker_command": "contain_agent.docker",
+    "build_image_command": "contain_agent.docker",
+    "check_image_exists": "contain_agent.docker",
+    "get_config_mounts": "contain_agent.paths",
+    "get_docker_cmd": "contain_agent.docker",
+    "get_docker_context": "contain_agent.docker",
+    "is_sensitive_directory": "contain_agent.paths",
+    "load_settings": "contain_agent.settings",
+    "run": "contain_agent.cli",
+    "settings": "contain_agent.settings",
+}
 
 __all__ = [
     "DEFAULT_IMAGE",
@@ -40,3 +65,20 @@ __all__ = [
     "run",
     "settings",
 ]
+
+
+def __getattr__(name: str) -> object:
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(import_module(module), name)
+    globals()[name] = value
+    # Loading the `settings` submodule binds it as the package attribute of the
+    # same name, shadowing the exported Settings object; restore the export.
+    if isinstance(globals().get("settings"), ModuleType):
+        globals()["settings"] = import_module("contain_agent.settings").settings
+    return value
+
+
+def __dir__() -> list[str]:
+    return sorted({*globals(), *__all__})
@@ -1,4 +1,4 @@
-from contain_agent.cli import app
+from contain_agent.launch import main
 
 if __name__ == "__main__":
-    app()
+    main()
@@ -0,0 +1,196 @@
+"""Per-workspace volumes for build-artifact directories.
+
+Directories such as node_modules, target/ and .venv see heavy I/O, which is
+slow across the workspace bind mount on VM-backed daemons and keeps host file
+watchers and indexers busy. Each path in the `artifact_dirs` setting is
+overlaid with a named volume keyed by the workspace path and the directory,
+so builds write to container-native storage that stays warm across runs. The
+host only sees the empty mount point Docker creates.
+
+Docker would create a volume owned by root on first use, which the agent
+user cannot write to, so new volumes are created by a one-shot container
+that hands them to the agent's uid. ~/.contain-agent/artifacts.json records
+which workspace and directory each one belongs to, for `contain-agent
+artifacts`; a volume missing from it counts as new.
+"""
+
+import hashlib
+import json
+import re
+import subprocess
+from dataclasses import dataclass
+from pathlib import Path, PurePosixPath
+
+from contain_agent.docker import container_workdir, get_docker_cmd
+
+VOLUME_PREFIX = "contain-agent-artifacts-"
+
+
+class ArtifactError(Exception):
+    """An artifact directory is invalid or its volume could not be managed."""
+
+
+@dataclass
+class ArtifactVolume:
+    name: str
+    workspace: str | None
+    path: str | None
+
+
+def _normalize(path: str) -> str:
+    rel = PurePosixPath(path.strip().rstrip("/"))
+    if rel.is_absolute() or ".." in rel.parts or str(rel) in ("", "."):
+        raise ArtifactError(
+            f"artifact directory '{path}' must be a path inside the workspace"
+        )
+    return str(rel)
+
+
+def _sanitize(name: str) -> str:
+    return re.sub(r"[^a-zA-Z0-9_.-]", "-", name)
+
+
+def _workspace_prefix(workspace: Path) -> str:
+    """Common prefix of the names of `workspace`'s volumes."""
+    resolved = workspace.resolve()
+    digest = hashlib.sha256(str(resolved).encode()).hexdigest()[:12]
+    return f"{VOLUME_PREFIX}{_sanitize(resolved.name)}-{digest}-"
+
+
+def artifact_volume(workspace: Path, path: str) -> str:
+    """Name of the volume overlaying `path` of `workspace`."""
+    return _workspace_prefix(workspace) + _sanitize(path)
+
+
+def artifact_mounts(workspace: Path, paths: list[str]) -> list[tuple[str, str]]:
+    """Volume mounts overlaying each of `paths` inside the container workspace."""
+    workdir = container_workdir(workspace)
+    mounts = []
+    for path in paths:
+        rel = _normalize(path)
+        mounts.append((artifact_volume(workspace, rel), f"{workdir}/{rel}"))
+    return mounts
+
+
+def registry_path(state_dir: Path) -> Path:
+    return state_dir / "artifacts.json"
+
+
+def _load_registry(state_dir: Path) -> dict[str, dict[str, str]]:
+    try:
+        with open(registry_path(state_dir), encoding="utf-8") as f:
+            data = json.load(f)
+    except OSError, ValueError:
+        return {}
+    return data if isinstance(data, dict) else {}
+
+
+def _save_registry(state_dir: Path, registry: dict[str, dict[str, str]]) -> None:
+    path = registry_path(state_dir)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text(json.dumps(registry, indent=2, sort_keys=True), encoding="utf-8")
+    tmp.replace(path)
+
+
+def register_volumes(state_dir: Path, workspace: Path, paths: list[str]) -> None:
+    """Record the workspace and directory of each of the workspace's volumes."""
+    registry = _load_registry(state_dir)
+    workspace_str = str(workspace.resolve())
+    changed = False
+    for path in paths:
+        rel = _normalize(path)
+        entry = {"workspace": workspace_str, "path": rel}
+        name = artifact_volume(workspace, rel)
+        if registry.get(name) != entry:
+            registry[name] = entry
+            changed = True
+    if changed:
+        try:
+            _save_registry(state_dir, registry)
+        except OSError:
+            pass
+
+
+def prepare_volumes(
+    state_dir: Path, workspace: Path, paths: list[str], image: str, uid: int
+) -> None:
+    """Create the workspace's new volumes, owned by `uid`, and register them all."""
+    registry = _load_registry(state_dir)
+    new = [
+        name for name, _ in artifact_mounts(workspace, paths) if name not in registry
+    ]
+    if new:
+        mounts = []
+        targets = []
+        for i, name in enumerate(new):
+            mounts.extend(["-v", f"{name}:/artifacts/{i}"])
+            targets.append(f"/artifacts/{i}")
+        res = _docker(
+            [
+                "run",
+                "--rm",
+                "--user",
+                "root",
+                "--entrypoint",
+                "chown",
+                *mounts,
+                image,
+                str(uid),
+                *targets,
+            ]
+        )
+        if res.returncode != 0:
+            raise ArtifactError(res.stderr.strip() or "cannot create the volumes")
+    register_volumes(state_dir, workspace, paths)
+
+
+def _docker(args: list[str]) -> subprocess.CompletedProcess:
+    try:
+        return subprocess.run(
+            [get_docker_cmd(), *args], capture_output=True, text=True, check=False
+        )
+    except OSError as e:
+        raise ArtifactError(f"cannot run docker: {e}")
+
+
+def list_volumes(
+    state_dir: Path, workspace: Path | None = None
+) -> list[ArtifactVolume]:
+    """Existing artifact volumes, of `workspace` only if given."""
+    res = _docker(
+        ["volume", "ls", "--filter", f"name={VOLUME_PREFIX}", "--format", "{{.Name}}"]
+    )
+    if res.returncode != 0:
+        raise ArtifactError(res.stderr.strip() or "docker volume ls failed")
+    registry = _load_registry(state_dir)
+    # The name filter matches substrings, so the prefix is checked again.
+    prefix = _workspace_prefix(workspace) if workspace is not None else VOLUME_PREFIX
+    volumes = []
+    for name in sorted(res.stdout.split()):
+        if not name.startswith(prefix):
+            continue
+        entry = registry.get(name, {})
+        volumes.append(ArtifactVolume(name, entry.get("workspace"), entry.get("path")))
+    return volumes
+
+
+def purge_volumes(state_dir: Path, volumes: list[ArtifactVolume]) -> list[str]:
+    """Remove `volumes`, returning an error message for each one still in use."""
+    errors = []
+    removed = set()
+    for volume in volumes:
+        res = _docker(["volume", "rm", volume.name])
+        if res.returncode != 0:
+            errors.append(f"{volume.name}: {res.stderr.strip() or 'cannot remove'}")
+        else:
+            removed.add(volume.name)
+    registry = _load_registry(state_dir)
+    if removed & registry.keys():
+        try:
+            _save_registry(
+                state_dir, {k: v for k, v in registry.items() if k not in removed}
+            )
+        except OSError:
+            pass
+    return errors
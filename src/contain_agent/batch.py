@@ -0,0 +1,168 @@
+"""Run a manifest of non-interactive agent jobs on a bounded worker pool.
+
+A batch manifest is a JSON list (or JSON Lines file) of job objects:
+
+    {"workspace": "proj", "command": "yclaude -p 'fix the tests'",
+     "image": "contain-agent", "network": "agents", "name": "fix-tests"}
+
+`command` may be a string (split like a shell would) or a list. Relative
+workspaces are resolved against the manifest's directory. Every job runs as
+its own `docker run` with stdin closed and its output captured to a log file,
+so a slow or failing job only ever occupies one worker.
+"""
+
+import json
+import os
+import shlex
+import subprocess
+import time
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass
+from pathlib import Path
+
+from contain_agent.constants import DEFAULT_IMAGE
+from contain_agent.docker import get_docker_cmd
+
+# Exit codes reported for jobs that never produced one of their own, matching
+# the conventions of timeout(1) and the shell.
+TIMEOUT_EXIT = 124
+NOT_FOUND_EXIT = 127
+
+
+@dataclass
+class BatchJob:
+    workspace: Path | None
+    command: list[str]
+    image: str = DEFAULT_IMAGE
+    network: str | None = None
+    name: str | None = None
+
+
+@dataclass
+class JobResult:
+    index: int
+    name: str
+    exit_code: int
+    duration: float
+    log: str
+
+
+def _parse_job(entry: object, base_dir: Path, index: int) -> BatchJob:
+    if not isinstance(entry, dict):
+        raise TypeError(f"Job {index} is not an object")
+    unknown = set(entry) - {"workspace", "command", "image", "network", "name"}
+    if unknown:
+        raise ValueError(
+            f"Job {index} has unknown key(s): {', '.join(sorted(unknown))}"
+        )
+    command = entry.get("command", [])
+    if isinstance(command, str):
+        command = shlex.split(command)
+    elif not isinstance(command, list) or not all(isinstance(c, str) for c in command):
+        raise ValueError(f"Job {index} command must be a string or a list of strings")
+    workspace = entry.get("workspace")
+    return BatchJob(
+        workspace=base_dir / workspace if workspace is not None else None,
+        command=command,
+        image=entry.get("image") or DEFAULT_IMAGE,
+        network=entry.get("network"),
+        name=entry.get("name"),
+    )
+
+
+def load_batch_manifest(path: Path) -> list[BatchJob]:
+    """Load batch jobs from a JSON list or a JSON Lines file."""
+    text = path.read_text(encoding="utf-8")
+    try:
+        data = json.loads(text)
+    except json.JSONDecodeError:
+        data = [json.loads(line) for line in text.splitlines() if line.strip()]
+    if isinstance(data, dict):
+        data = [data]
+    if not isinstance(data, list):
+        raise TypeError("Batch manifest must be a list of jobs")
+    return [_parse_job(entry, path.parent, i) for i, entry in enumerate(data, 1)]
+
+
+def max_workers() -> int:
+    """Upper bound on concurrent jobs: the CPUs this process may run on."""
+    return os.process_cpu_count() or 1
+
+
+def job_label(index: int, job: BatchJob) -> str:
+    label = job.name or (job.workspace.name if job.workspace else "job")
+    # The label names the job's log file, so keep it to a single path component.
+    return f"{index}-{label.replace(os.sep, '_')}"
+
+
+def _run_job(
+    index: int,
+    label: str,
+    cmd: list[str],
+    container: str,
+    output_dir: Path,
+    timeout: float | None,
+) -> JobResult:
+    log_path = output_dir / f"{label}.log"
+    start = time.monotonic()
+    with open(log_path, "wb") as log:
+        try:
+            proc = subprocess.Popen(
+                cmd, stdin=subprocess.DEVNULL, stdout=log, stderr=subprocess.STDOUT
+            )
+        except OSError as e:
+            log.write(f"Error: cannot start docker: {e}\n".encode())
+            exit_code = NOT_FOUND_EXIT
+        else:
+            try:
+                exit_code = proc.wait(timeout=timeout)
+            except subprocess.TimeoutExpired:
+                # Killing the client leaves the container running; remove it
+                # so the worker is free for the next job.
+                subprocess.run(
+                    [get_docker_cmd(), "rm", "-f", container],
+                    stdout=subprocess.DEVNULL,
+                    stderr=subprocess.DEVNULL,
+                    check=False,
+                )
+                proc.kill()
+                proc.wait()
+                log.write(f"\n[contain-agent] timed out after {timeout}s\n".encode())
+                exit_code = TIMEOUT_EXIT
+    return JobResult(
+        index=index,
+        name=label,
+        exit_code=exit_code,
+        duration=time.monotonic() - start,
+        log=str(log_path),
+    )
+
+
+def run_batch(
+    commands: list[tuple[str, list[str], str]],
+    output_dir: Path,
+    jobs: int,
+    timeout: float | None = None,
+    on_result: Callable[[JobResult], None] | None = None,
+) -> list[JobResult]:
+    """Run (label, docker argv, container name) triples, `jobs` at a time.
+
+    Results are returned in manifest order; `on_result` is called with each
+    result as soon as its job finishes.
+    """
+    output_dir.mkdir(parents=True, exist_ok=True)
+    with ThreadPoolExecutor(max_workers=max(1, jobs)) as executor:
+        futures = [
+            executor.submit(_run_job, i, label, cmd, container, output_dir, timeout)
+            for i, (label, cmd, container) in enumerate(commands, 1)
+        ]
+        if on_result is not None:
+            for future in futures:
+                future.add_done_callback(lambda f: on_result(f.result()))
+        results = [future.result() for future in futures]
+    summary = output_dir / "summary.json"
+    summary.write_text(
+        json.dumps([asdict(r) for r in results], indent=2), encoding="utf-8"
+    )
+    return results
@@ -0,0 +1,288 @@
+"""Benchmarks for CLI overhead and container start latency.
+
+    python -m contain_agent.bench run -o results.json
+    python -m contain_agent.bench compare baseline.json results.json
+
+`run` always measures the CLI itself against a fake `docker` binary: import
+time, argv construction, settings and config discovery with a large dotfiles
+directory, and full launch wall-clock with and without a cached launch plan.
+When a Docker daemon and the contain-agent image are available it also
+measures cold `docker run`, warm `docker exec` and the in-container
+`bash -l -i` init; a benchmarked command that fails aborts the run. `compare`
+exits non-zero when any metric's median regressed by more than the threshold.
+"""
+
+import argparse
+import json
+import os
+import platform
+import shlex
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections.abc import Callable
+from pathlib import Path
+
+from contain_agent.constants import DEFAULT_IMAGE
+from contain_agent.docker import build_docker_command, content_image_tag, get_docker_cmd
+from contain_agent.paths import get_config_mounts
+from contain_agent.settings import clear_settings_cache, load_settings
+
+RESULTS_VERSION = 1
+
+FAKE_DOCKER = """#!/bin/sh
+if [ "$1" = image ] && [ "$2" = inspect ]; then
+  for last; do :; done
+  echo "sha256:$last"
+fi
+exit 0
+"""
+
+# Regressions smaller than this are noise however large the ratio.
+MIN_DELTA_MS = 1.0
+
+
+def _summary(samples: list[float]) -> dict:
+    ordered = sorted(samples)
+    return {
+        "median_ms": round(statistics.median(ordered), 4),
+        "p90_ms": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.9))], 4),
+        "min_ms": round(ordered[0], 4),
+        "samples": len(ordered),
+    }
+
+
+def _time_ms(fn: Callable[[], object], repeat: int, inner: int = 1) -> list[float]:
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(inner):
+            fn()
+        samples.append((time.perf_counter() - start) * 1000 / inner)
+    return samples
+
+
+class BenchmarkError(Exception):
+    """A benchmarked command failed, so its timings would be meaningless."""
+
+
+def _run_quiet(
+    cmd: list[str], env: dict[str, str] | None = None, check: bool = True
+) -> None:
+    res = subprocess.run(
+        cmd,
+        env=env,
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        check=False,
+    )
+    if check and res.returncode != 0:
+        lines = res.stderr.decode(errors="replace").strip().splitlines()
+        detail = f": {lines[-1]}" if lines else ""
+        raise BenchmarkError(
+            f"{shlex.join(cmd)} exited with status {res.returncode}{detail}"
+        )
+
+
+def _fake_home(root: Path, dotfiles: int, depth: int) -> tuple[Path, Path]:
+    """A HOME with a large dotfiles dir, and a workspace nested `depth` deep."""
+    home = root / "home"
+    dotfiles_dir = home / ".contain-agent" / "dotfiles"
+    dotfiles_dir.mkdir(parents=True)
+    for i in range(dotfiles):
+        (dotfiles_dir / f".config-{i}").write_text("x")
+    (home / ".contain-agent" / "settings.json").write_text('{"pool": false}')
+    workspace = root.joinpath(*(f"d{i}" for i in range(depth)), "ws")
+    workspace.mkdir(parents=True)
+    return home, workspace
+
+
+def cli_benchmarks(repeat: int) -> dict[str, dict]:
+    """Metrics that need no Docker daemon."""
+    results: dict[str, dict] = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        home, workspace = _fake_home(root, dotfiles=2000, depth=30)
+        docker = root / "docker"
+        docker.write_text(FAKE_DOCKER)
+        docker.chmod(0o755)
+        env = {
+            **os.environ,
+            "HOME": str(home),
+            "CONTAIN_AGENT_DOCKER_CMD": str(docker),
+        }
+        env.pop("CONTAIN_AGENT_TIMINGS", None)
+
+        import_cmd = [sys.executable, "-c", "import contain_agent.cli"]
+        results["import_cli"] = _summary(
+            _time_ms(lambda: _run_quiet(import_cmd, env), repeat)
+        )
+        launch_cmd = [sys.executable, "-m", "contain_agent", str(workspace), "true"]
+        no_plan = {**env, "CONTAIN_AGENT_NO_PLAN_CACHE": "1"}
+        _run_quiet(launch_cmd, no_plan)  # build the image ID cache
+        results["launch_full"] = _summary(
+            _time_ms(lambda: _run_quiet(launch_cmd, no_plan), repeat)
+        )
+        _run_quiet(launch_cmd, env)  # record a launch plan
+        results["launch_plan"] = _summary(
+            _time_ms(lambda: _run_quiet(launch_cmd, env), repeat)
+        )
+
+        saved_home = os.environ.get("HOME")
+        os.environ["HOME"] = str(home)
+        try:
+            results.update(_in_process_benchmarks(home, workspace, repeat))
+        finally:
+            if saved_home is None:
+                os.environ.pop("HOME", None)
+            else:
+                os.environ["HOME"] = saved_home
+    return results
+
+
+def _in_process_benchmarks(home: Path, workspace: Path, repeat: int) -> dict:
+    dotfiles_dir = home / ".contain-agent" / "dotfiles"
+    mounts = get_config_mounts(False, dotfiles_dir)
+
+    def discover() -> None:
+        clear_settings_cache()
+        load_settings(workspace=workspace)
+        get_config_mounts(False, dotfiles_dir)
+
+    def argv() -> None:
+        build_docker_command(
+            image="contain-agent:bench",
+            workspace_path=workspace,
+            config_mounts=mounts,
+            command=["yclaude", "-p", "task"],
+            network="bench",
+        )
+
+    return {
+        "settings_and_config_discovery": _summary(_time_ms(discover, repeat)),
+        "argv_construction": _summary(_time_ms(argv, repeat, inner=100)),
+    }
+
+
+def daemon_available(image: str) -> bool:
+    try:
+        res = subprocess.run(
+            [get_docker_cmd(), "image", "inspect", image],
+            capture_output=True,
+            check=False,
+        )
+    except OSError:
+        return False
+    return res.returncode == 0
+
+
+def daemon_benchmarks(image: str, repeat: int) -> dict[str, dict]:
+    """Container start and shell init latency against a real daemon."""
+
+    results: dict[str, dict] = {}
+    docker = get_docker_cmd()
+    cold = [docker, "run", "--rm", "--entrypoint", "true", image]
+    results["container_cold_start"] = _summary(
+        _time_ms(lambda: _run_quiet(cold), repeat)
+    )
+
+    name = f"contain-agent-bench-{os.getpid()}"
+    _run_quiet([docker, "run", "-d", "--rm", "--name", name, image, "sleep", "600"])
+    try:
+        warm = [docker, "exec", name, "true"]
+        shell = [docker, "exec", name, "bash", "-l", "-i", "-c", "true"]
+        warm_samples = _time_ms(lambda: _run_quiet(warm), repeat)
+        shell_samples = _time_ms(lambda: _run_quiet(shell), repeat)
+    finally:
+        _run_quiet([docker, "rm", "-f", name], check=False)
+    results["container_warm_exec"] = _summary(warm_samples)
+    # Shell init is what a login shell adds on top of a bare exec.
+    base = statistics.median(warm_samples)
+    results["shell_init"] = _summary([s - base for s in shell_samples])
+    return results
+
+
+def run_benchmarks(repeat: int, image: str | None) -> dict:
+    metrics = cli_benchmarks(repeat)
+    if image and daemon_available(image):
+        metrics.update(daemon_benchmarks(image, repeat))
+    return {
+        "version": RESULTS_VERSION,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "metrics": metrics,
+    }
+
+
+def compare(baseline: dict, current: dict, threshold: float) -> list[str]:
+    """Describe every metric whose median regressed by more than `threshold`."""
+    regressions = []
+    for name, base in sorted(baseline.get("metrics", {}).items()):
+        now = current.get("metrics", {}).get(name)
+        if now is None:
+            continue
+        before, after = base["median_ms"], now["median_ms"]
+        if after - before > MIN_DELTA_MS and after > before * (1 + threshold):
+            pct = (after / before - 1) * 100 if before else float("inf")
+            regressions.append(f"{name}: {before:.2f}ms -> {after:.2f}ms (+{pct:.0f}%)")
+    return regressions
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m contain_agent.bench")
+    sub = parser.add_subparsers(dest="command", required=True)
+    run_p = sub.add_parser("run", help="Run the benchmarks")
+    run_p.add_argument("-o", "--output", type=Path, help="Write results JSON here")
+    run_p.add_argument("-n", "--repeat", type=int, default=15)
+    run_p.add_argument(
+        "--image",
+        default=None,
+        help="Image for daemon benchmarks (default: the current contain-agent tag)",
+    )
+    run_p.add_argument(
+        "--no-daemon", action="store_true", help="Skip benchmarks needing Docker"
+    )
+    cmp_p = sub.add_parser("compare", help="Fail if results regressed vs a baseline")
+    cmp_p.add_argument("baseline", type=Path)
+    cmp_p.add_argument("current", type=Path)
+    cmp_p.add_argument(
+        "--threshold",
+        type=float,
+        default=0.25,
+        help="Allowed relative slowdown of a median (default: 0.25)",
+    )
+    args = parser.parse_args(argv)
+
+    if args.command == "run":
+        image = None
+        if not args.no_daemon:
+            image = args.image or content_image_tag(DEFAULT_IMAGE)
+        try:
+            results = run_benchmarks(args.repeat, image)
+        except BenchmarkError as e:
+            print(f"Error: {e}", file=sys.stderr)
+            return 1
+        text = json.dumps(results, indent=2)
+        if args.output:
+            args.output.write_text(text + "\n", encoding="utf-8")
+        for name, summary in results["metrics"].items():
+            print(f"{name:<32} {summary['median_ms']:10.3f}ms", file=sys.stderr)
+        if not args.output:
+            print(text)
+        return 0
+
+    baseline = json.loads(args.baseline.read_text(encoding="utf-8"))
+    current = json.loads(args.current.read_text(encoding="utf-8"))
+    regressions = compare(baseline, current, args.threshold)
+    for line in regressions:
+        print(f"REGRESSION {line}", file=sys.stderr)
+    if not regressions:
+        print("No regressions.", file=sys.stderr)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
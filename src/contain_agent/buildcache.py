@@ -0,0 +1,136 @@
+"""Exportable BuildKit layer cache, for fast image builds on fresh machines.
+
+The daemon's own layer cache goes away with the machine, so a new workstation
+or CI runner rebuilds the whole image. With `--cache-dir PATH` (or the
+`build_cache_dir` setting), builds also import and export their layer cache
+as an OCI layout under PATH, one directory per image. PATH can be archived
+and restored elsewhere, turning a cold build into a cache restore.
+
+Exporting a cache needs a BuildKit builder with the docker-container driver,
+so cached builds run through `docker buildx` on a builder named contain-agent,
+created on first use, and load the result into the daemon. The local exporter
+never removes blobs, so each build exports to a staging directory that
+replaces the image's cache only once the build succeeded. The caches of the
+least recently built images are then removed to keep PATH within
+`build_cache_max_mb`; the cache just written is always kept.
+"""
+
+import re
+import shutil
+import subprocess
+from dataclasses import dataclass
+from pathlib import Path
+
+from contain_agent.docker import BuildSpec, get_docker_cmd
+
+BUILDER = "contain-agent"
+
+
+class BuildCacheError(Exception):
+    """The buildx builder for cache export could not be set up."""
+
+
+@dataclass
+class BuildCache:
+    root: Path
+    max_mb: int = 0
+
+
+def image_cache_dir(cache: BuildCache, image: str) -> Path:
+    return cache.root / re.sub(r"[^a-zA-Z0-9_.-]", "-", image)
+
+
+def _staging_dir(cache_dir: Path) -> Path:
+    return cache_dir.with_name(f".{cache_dir.name}.new")
+
+
+def use_build_cache(spec: BuildSpec, cache: BuildCache, image: str) -> None:
+    """Make `spec` import `image`'s layer cache, if any, and export a new one."""
+    cache_dir = image_cache_dir(cache, image)
+    spec.builder = BUILDER
+    if (cache_dir / "index.json").is_file():
+        spec.cache_from = f"type=local,src={cache_dir}"
+    spec.cache_to = f"type=local,dest={_staging_dir(cache_dir)},mode=max"
+
+
+def prepare_export(cache: BuildCache, image: str) -> None:
+    """Create the buildx builder if needed and clear any stale staging export."""
+    docker = get_docker_cmd()
+    try:
+        res = subprocess.run(
+            [docker, "buildx", "inspect", BUILDER], capture_output=True, check=False
+        )
+        if res.returncode != 0:
+            res = subprocess.run(
+                [
+                    docker,
+                    "buildx",
+                    "create",
+                    "--name",
+                    BUILDER,
+                    "--driver",
+                    "docker-container",
+                ],
+                capture_output=True,
+                text=True,
+                check=False,
+            )
+            if res.returncode != 0:
+                raise BuildCacheError(
+                    res.stderr.strip() or "docker buildx create failed"
+                )
+    except OSError as e:
+        raise BuildCacheError(f"cannot run docker: {e}")
+    cache.root.mkdir(parents=True, exist_ok=True)
+    shutil.rmtree(_staging_dir(image_cache_dir(cache, image)), ignore_errors=True)
+
+
+def finish_export(cache: BuildCache, image: str, ok: bool) -> None:
+    """Replace `image`'s cache with the staged export if the build succeeded."""
+    cache_dir = image_cache_dir(cache, image)
+    staging = _staging_dir(cache_dir)
+    if ok and (staging / "index.json").is_file():
+        old = cache_dir.with_name(f".{cache_dir.name}.old")
+        shutil.rmtree(old, ignore_errors=True)
+        if cache_dir.exists():
+            cache_dir.rename(old)
+        staging.rename(cache_dir)
+        shutil.rmtree(old, ignore_errors=True)
+    else:
+        shutil.rmtree(staging, ignore_errors=True)
+    prune_caches(cache, keep=cache_dir)
+
+
+def _tree_size(path: Path) -> int:
+    total = 0
+    for entry in path.rglob("*"):
+        try:
+            if entry.is_file():
+                total += entry.stat().st_size
+        except OSError:
+            pass
+    return total
+
+
+def prune_caches(cache: BuildCache, keep: Path | None = None) -> list[Path]:
+    """Remove the least recently built image caches until the root fits its budget.
+
+    Returns the removed directories. A `max_mb` of 0 means no limit.
+    """
+    if cache.max_mb <= 0 or not cache.root.is_dir():
+        return []
+    dirs = [
+        d for d in cache.root.iterdir() if d.is_dir() and not d.name.startswith(".")
+    ]
+    sizes = {d: _tree_size(d) for d in dirs}
+    total = sum(sizes.values())
+    removed = []
+    for d in sorted(dirs, key=lambda d: d.stat().st_mtime):
+        if total <= cache.max_mb * 1024 * 1024:
+            break
+        if d == keep:
+            continue
+        shutil.rmtree(d, ignore_errors=True)
+        total -= sizes[d]
+        removed.append(d)
+    return removed
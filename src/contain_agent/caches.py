@@ -0,0 +1,102 @@
+"""Shared package-manager cache volumes.
+
+Each cache directory declared in toolchains.toml (uv, pip, npm, bun, the
+cargo registry) is backed by a named volume mounted into every container, so
+repeated installs are served locally. The package managers themselves lock
+or write their caches atomically, which makes sharing a volume between
+concurrent containers safe.
+
+Volumes have no native size limit, so oversized caches are trimmed instead:
+at most once per PRUNE_INTERVAL a detached helper container deletes the
+least recently accessed files of any cache above its limit.
+"""
+
+import os
+import shlex
+import subprocess
+import time
+from pathlib import Path
+
+from contain_agent.docker import get_docker_cmd
+
+VOLUME_PREFIX = "contain-agent-cache-"
+
+PRUNE_INTERVAL = 24 * 3600
+
+# Deletes the least recently accessed files of $1 until it fits in $2 bytes.
+_TRIM_SCRIPT = r"""
+total=$(du -sb "$1" | cut -f1)
+excess=$((total - $2))
+[ "$excess" -gt 0 ] || exit 0
+find "$1" -type f -printf '%A@ %s %p\n' | sort -n |
+  awk -v excess="$excess" 'freed < excess {
+    freed += $2; sub(/^[^ ]+ [^ ]+ /, ""); printf "%s%c", $0, 0 }' |
+  xargs -0 rm -f --
+"""
+
+
+def cache_volume(name: str) -> str:
+    return f"{VOLUME_PREFIX}{name}"
+
+
+def cache_mounts(caches: dict[str, str]) -> list[tuple[str, str]]:
+    """Volume mounts for the given cache name -> container path mapping."""
+    return [(cache_volume(name), path) for name, path in caches.items()]
+
+
+def prune_due(state_dir: Path, now: float | None = None) -> bool:
+    """Whether the caches should be checked against their limits now.
+
+    The first call only starts the clock: freshly created caches are small.
+    """
+    stamp = state_dir / "caches" / "last-prune"
+    now = time.time() if now is None else now
+    try:
+        if now - stamp.stat().st_mtime < PRUNE_INTERVAL:
+            return False
+        due = True
+    except FileNotFoundError:
+        due = False
+    try:
+        stamp.parent.mkdir(parents=True, exist_ok=True)
+        stamp.touch()
+        os.utime(stamp, (now, now))
+    except OSError:
+        return False
+    return due
+
+
+def prune_command(image: str, limits: dict[str, int]) -> list[str]:
+    """Helper container command trimming each named cache to its byte limit."""
+    cmd = [get_docker_cmd(), "run", "--rm", "--entrypoint", "sh"]
+    script = []
+    for name, limit in sorted(limits.items()):
+        mount = f"/caches/{name}"
+        cmd.extend(["-v", f"{cache_volume(name)}:{mount}"])
+        script.append(f"sh -c {shlex.quote(_TRIM_SCRIPT)} trim {mount} {limit}")
+    cmd.extend([image, "-c", " ; ".join(script)])
+    return cmd
+
+
+def schedule_prune(image: str, limits: dict[str, int]) -> None:
+    """Trim the caches in a detached helper container, without waiting for it."""
+    if not limits:
+        return
+    try:
+        subprocess.Popen(
+            prune_command(image, limits),
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            start_new_session=True,
+        )
+    except OSError:
+        pass
+
+
+def cache_limits(
+    caches: dict[str, str], default_mb: int, overrides_mb: dict[str, int]
+) -> dict[str, int]:
+    """Byte limit for every cache; a limit of 0 MB disables trimming that cache."""
+    limits = {name: overrides_mb.get(name, default_mb) for name in caches}
+    return {name: mb * 1024 * 1024 for name, mb in limits.items() if mb > 0}
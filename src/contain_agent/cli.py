@@ -1,29 +1,612 @@
+import os
 import shlex
 import subprocess
 import sys
+import time
+import uuid
 from pathlib import Path
-from typing import Annotated
+from typing import Annotated, Literal
 
 import typer
+from typer.core import TyperCommand, TyperGroup
 
-from contain_agent.constants import DEFAULT_IMAGE
+from contain_agent import launch
+from contain_agent.artifacts import (
+    ArtifactError,
+    artifact_mounts,
+    list_volumes,
+    prepare_volumes,
+    purge_volumes,
+    registry_path,
+)
+from contain_agent.batch import (
+    job_label,
+    load_batch_manifest,
+    max_workers,
+    run_batch,
+)
+from contain_agent.buildcache import (
+    BuildCache,
+    BuildCacheError,
+    finish_export,
+    prepare_export,
+    use_build_cache,
+)
+from contain_agent.caches import (
+    cache_limits,
+    cache_mounts,
+    prune_due,
+    schedule_prune,
+)
+from contain_agent.constants import ALL_AGENTS, DEFAULT_IMAGE, DEFAULT_PROFILE
 from contain_agent.docker import (
+    BuildSpec,
     build_docker_command,
-    build_image_command,
-    check_image_exists,
+    build_exec_command,
+    build_spec_command,
+    container_workdir,
+    content_image_tag,
+    docker_run_options,
+    effective_uid,
+    get_docker_context,
+    get_image_id,
+    image_build_spec,
+    profile_image,
+    write_build_files,
+)
+from contain_agent.dockerfile import load_manifest
+from contain_agent.engine import (
+    EngineClient,
+    EngineError,
+    container_config,
+    run_container,
+)
+from contain_agent.events import stream_events
+from contain_agent.history import (
+    GROUP_COLUMNS,
+    RunInfo,
+    history_path,
+    query_stats,
+    tracked_run,
+)
+from contain_agent.images import (
+    image_cache_path,
+    load_image_cache,
+    read_agent_versions,
+    record_agent_versions,
+    record_image_id,
+)
+from contain_agent.paths import (
+    config_candidates,
+    get_config_mounts,
+    get_state_dir,
+    is_sensitive_directory,
 )
-from contain_agent.paths import get_config_mounts, is_sensitive_directory
-from contain_agent.settings import load_settings
+from contain_agent.pool import Pool, PoolConfig
+from contain_agent.prewarm import (
+    build_lock,
+    mark_built,
+    prewarm_image,
+    refresh_at,
+    retry_at,
+    schedule_prewarm,
+)
+from contain_agent.proxy import (
+    PROXY_NETWORK,
+    ProxyError,
+    cargo_config_mount,
+    ensure_proxy,
+    proxy_env,
+)
+from contain_agent.resources import CPUSET_LABEL, auto_share
+from contain_agent.sessions import (
+    SessionError,
+    container_name,
+    create_command,
+    ensure_session,
+    session_run,
+)
+from contain_agent.settings import (
+    Settings,
+    load_settings,
+    project_settings_candidates,
+)
+from contain_agent.snapshot import (
+    Snapshot,
+    SnapshotError,
+    collect_snapshot,
+    create_snapshot,
+    remove_snapshot,
+)
+from contain_agent.sync import (
+    LocalTree,
+    SyncError,
+    VolumeTree,
+    describe,
+    manifest_path,
+    sync_trees,
+    volume_name,
+)
+from contain_agent.timings import Timings, timings_target
+from contain_agent.transcript import Transcript, relay, transcript_path
+
+
+class DefaultRunGroup(TyperGroup):
+    """Dispatches to `run` unless the first argument names another subcommand."""
+
+    def parse_args(self, ctx: typer.Context, args: list[str]) -> list[str]:
+        if not args or (
+            args[0] not in self.commands and args[0] not in ctx.help_option_names
+        ):
+            args = ["run", *args]
+        return super().parse_args(ctx, args)
+
 
 app = typer.Typer(
+    cls=DefaultRunGroup,
     help="A lightweight tool to run AI coding agents inside isolated Docker containers.",
     add_completion=False,
     context_settings={"allow_interspersed_args": False},
 )
 
 
-@app.command()
+def _connect_engine(backend: str) -> EngineClient | None:
+    """Open the Engine API backend, or return None to use the docker CLI."""
+    if backend != "engine":
+        return None
+    try:
+        client = EngineClient()
+    except EngineError as e:
+        print(f"Warning: {e}; falling back to the docker CLI.", file=sys.stderr)
+        return None
+    if not client.ping():
+        print(
+            "Warning: Docker Engine API is unreachable; falling back to the docker CLI.",
+            file=sys.stderr,
+        )
+        return None
+    return client
+
+
+def _lookup_image_id(engine: EngineClient | None, image: str) -> str | None:
+    if engine is None:
+        return get_image_id(image)
+    try:
+        info = engine.inspect_image(image)
+    except EngineError:
+        return None
+    return info.get("Id") if info else None
+
+
+class RunCommand(TyperCommand):
+    """Lets `--fresh-rebuild-image` be given with or without a value."""
+
+    def parse_args(self, ctx: typer.Context, args: list[str]) -> list[str]:
+        takes_value = {
+            opt
+            for param in self.params
+            if param.param_type_name == "option"
+            and not getattr(param, "is_flag", False)
+            for opt in param.opts
+        }
+        args = list(args)
+        i = 0
+        while i < len(args):
+            arg = args[i]
+            if arg == "--" or not arg.startswith("-"):
+                break
+            if arg == "--fresh-rebuild-image":
+                args[i] = f"{arg}={ALL_AGENTS}"
+            elif arg in takes_value:
+                i += 1
+            i += 1
+        return super().parse_args(ctx, args)
+
+
+def _print_agent_version_report(old: dict[str, str], new: dict[str, str]) -> None:
+    if not new:
+        print("No agent versions recorded in the image.", file=sys.stderr)
+        return
+    print("Agent versions:", file=sys.stderr)
+    for agent, version in sorted(new.items()):
+        before = old.get(agent)
+        if before is None or before == version:
+            note = "" if before else " (new)"
+            print(f"  {agent}: {version}{note}", file=sys.stderr)
+        else:
+            print(f"  {agent}: {before} -> {version}", file=sys.stderr)
+
+
+def _resolve_workspace(workspace_path: Path, force: bool) -> Path:
+    """Resolve a directory to mount, refusing missing or sensitive ones."""
+    if not workspace_path.exists():
+        print(
+            f"Error: Directory '{workspace_path}' does not exist (did you forget --no-mount?)",
+            file=sys.stderr,
+        )
+        raise typer.Exit(1)
+
+    try:
+        workspace_path = workspace_path.resolve()
+    except OSError as e:
+        print(
+            f"Error: Cannot resolve directory '{workspace_path}': {e}",
+            file=sys.stderr,
+        )
+        raise typer.Exit(1)
+
+    if is_sensitive_directory(workspace_path) and not force:
+        print(
+            f"Cowardly refusing to mount sensitive directory '{workspace_path}'. Use --force to override.",
+            file=sys.stderr,
+        )
+        raise typer.Exit(1)
+    return workspace_path
+
+
+def _resolve_env_file(env_file: Path | None, no_env_file: bool) -> Path | None:
+    """Pick the .env file to load, exiting if an explicit one is missing."""
+    if no_env_file:
+        return None
+    if env_file:
+        if not env_file.exists() or not env_file.is_file():
+            print(
+                f"Error: Specified env file '{env_file}' does not exist.",
+                file=sys.stderr,
+            )
+            raise typer.Exit(1)
+        return env_file
+    default_env = get_state_dir() / ".env"
+    if default_env.is_file():
+        return default_env
+    return None
+
+
+def _split_mount(spec: str) -> tuple[str, str]:
+    host, _, target = spec.partition(":")
+    return host, target
+
+
+def _parse_agent_list(value: str) -> list[str]:
+    known_agents = [a.name for a in load_manifest().agents]
+    agents = [a.strip() for a in value.split(",") if a.strip()]
+    unknown = [a for a in agents if a not in known_agents]
+    if unknown:
+        print(
+            f"Error: Unknown agent(s) for --fresh-rebuild-image: {', '.join(unknown)} "
+            f"(known: {', '.join(known_agents)})",
+            file=sys.stderr,
+        )
+        raise typer.Exit(1)
+    return agents
+
+
+def _check_profile(profile: str | None) -> str | None:
+    if profile is None:
+        return None
+    known = [p.name for p in load_manifest().profiles]
+    if profile not in known:
+        print(
+            f"Error: Unknown image profile '{profile}' (known: {', '.join(known)})",
+            file=sys.stderr,
+        )
+        raise typer.Exit(1)
+    return profile
+
+
+def _direct_exec(
+    flag: bool | None,
+    current_settings: Settings,
+    command_args: list[str],
+    interactive: bool,
+) -> bool:
+    """Whether to run the command without a login shell.
+
+    The image's ENV holds the toolchain paths the rc files would add, but
+    interactive use may rely on the rest of them (aliases, `cd` hooks), so
+    `auto` only applies without a terminal.
+    """
+    if not command_args:
+        return False
+    if flag is not None:
+        return flag
+    mode = current_settings.direct_exec
+    return mode == "always" or (mode == "auto" and not interactive)
+
+
+def _build_cache(
+    cache_dir: Path | None, current_settings: Settings
+) -> BuildCache | None:
+    root = cache_dir or current_settings.build_cache_dir
+    if root is None:
+        return None
+    return BuildCache(
+        Path(root).expanduser().resolve(), current_settings.build_cache_max_mb
+    )
+
+
+def _build_image(spec: BuildSpec, image: str, build_cache: BuildCache | None) -> None:
+    """Build `spec` with the docker CLI, exporting its layer cache if asked to.
+
+    Builds always use the CLI, even with the engine backend: only it drives
+    BuildKit.
+    """
+    if build_cache is not None:
+        try:
+            prepare_export(build_cache, image)
+        except BuildCacheError as e:
+            print(f"Error: cannot export the build cache: {e}", file=sys.stderr)
+            raise typer.Exit(1)
+    try:
+        write_build_files(spec)
+    except OSError as e:
+        print(f"Error: cannot write the Dockerfile: {e}", file=sys.stderr)
+        raise typer.Exit(1)
+    try:
+        status = subprocess.run(build_spec_command(spec), check=False).returncode
+    except FileNotFoundError:
+        print(
+            "Error: 'docker' command not found. Please ensure Docker is installed and in your PATH.",
+            file=sys.stderr,
+        )
+        raise typer.Exit(1)
+    if build_cache is not None:
+        finish_export(build_cache, image, ok=status == 0)
+    if status != 0:
+        raise typer.Exit(status)
+
+
+def _ensure_image(
+    image: str,
+    engine: EngineClient | None,
+    build: bool = False,
+    no_cache: bool = False,
+    fresh_rebuild: bool = False,
+    rebuild_agents: list[str] | None = None,
+    dry_run: bool = False,
+    background: bool = False,
+    profile: str | None = None,
+    build_cache: BuildCache | None = None,
+) -> tuple[str, str | None]:
+    """Resolve the image to run, building it when missing or when asked to.
+
+    Returns the content-addressed image reference and its ID, if known. With
+    `background`, a missing tag whose previous build is known is built in a
+    detached process while the previous build runs; its ID is then not
+    returned, so no launch plan pins it. A `profile` resolves that profile's
+    image instead of `image` itself. Builds hold the image's host-wide build
+    lock; a launch that had to wait for another build reuses its result. With
+    a `build_cache`, builds import and export their layer cache there.
+    """
+    base_image = image
+    image = profile_image(base_image, profile)
+    # The common case resolves the content-addressed tag from the local cache
+    # without any docker call; a changed Dockerfile yields a new tag to build.
+    image_ref = content_image_tag(image)
+    explicit_build = build or fresh_rebuild or no_cache
+    image_cache = load_image_cache()
+    image_id = image_cache.get(image_ref)
+    if image_id is None and not explicit_build:
+        image_id = _lookup_image_id(engine, image_ref)
+        if image_id:
+            record_image_id(image_ref, image_id)
+
+    if not explicit_build and image_id is not None:
+        return image_ref, image_id
+
+    if (
+        background
+        and not explicit_build
+        and not dry_run
+        and image_ref != image
+        and image in image_cache
+    ):
+        retry = retry_at(get_state_dir(), image)
+        if retry is not None and retry > time.time():
+            print(
+                f"Docker image '{image}' is out of date; using the previous build, "
+                "as the last background build failed "
+                "(see ~/.contain-agent/prewarm/).",
+                file=sys.stderr,
+            )
+            return image, None
+        print(
+            f"Docker image '{image}' is out of date; using the previous build "
+            "while the new one builds in the background.",
+            file=sys.stderr,
+        )
+        schedule_prewarm(base_image, profile=profile, build_cache=build_cache)
+        return image, None
+
+    if not explicit_build:
+        print(
+            f"Docker image '{image}' not found locally. Building it...",
+            file=sys.stderr,
+        )
+    spec = image_build_spec(
+        image=base_image,
+        no_cache=no_cache,
+        fresh_rebuild=fresh_rebuild,
+        rebuild_agents=rebuild_agents,
+        profile=profile,
+    )
+    if build_cache is not None:
+        use_build_cache(spec, build_cache, image)
+    if dry_run:
+        print(" ".join(shlex.quote(arg) for arg in build_spec_command(spec)))
+        return image_ref, image_id
+
+    with build_lock(get_state_dir(), image) as waited:
+        if waited and not explicit_build:
+            # The build we waited for most likely produced this very image.
+            image_id = _lookup_image_id(engine, image_ref)
+            if image_id:
+                record_image_id(image_ref, image_id)
+                return image_ref, image_id
+        _build_image(spec, image, build_cache)
+
+    image_id = _lookup_image_id(engine, image_ref)
+    if image_id:
+        record_image_id(image_ref, image_id)
+        if image_ref != image:
+            # Every build also tags the plain name: the last good image.
+            record_image_id(image, image_id)
+    mark_built(get_state_dir(), image)
+    if fresh_rebuild:
+        versions = read_agent_versions(image_ref)
+        _print_agent_version_report(record_agent_versions(image, versions), versions)
+    return image_ref, image_id
+
+
+def _package_cache_mounts(
+    image_ref: str, current_settings: Settings, dry_run: bool
+) -> list[tuple[str, str]]:
+    """Cache volume mounts for the image's toolchains, trimming them when due."""
+    caches = load_manifest().caches
+    if not dry_run and prune_due(get_state_dir()):
+        schedule_prune(
+            image_ref,
+            cache_limits(
+                caches, current_settings.cache_max_mb, current_settings.cache_limits_mb
+            ),
+        )
+    return cache_mounts(caches)
+
+
+def _run_docker(
+    cmd: list[str],
+    clock: Timings | None = None,
+    transcript: Transcript | None = None,
+) -> int:
+    """Run a docker client command; with a clock, time it and its first output."""
+    if transcript is None and clock is None:
+        return subprocess.run(cmd, check=False).returncode
+    mark = (lambda: clock.mark("first_output")) if clock is not None else None
+    try:
+        if clock is None:
+            return relay(cmd, transcript, mark)
+        with clock.phase("container"):
+            return relay(cmd, transcript, mark)
+    finally:
+        if transcript is not None and transcript.path.exists():
+            print(f"Transcript saved to {transcript.path}", file=sys.stderr)
+
+
+def _report_timings(clock: Timings, target: Path | str) -> None:
+    if isinstance(target, Path):
+        clock.append_jsonl(target)
+    else:
+        clock.print_table()
+
+
+def _finish_snapshot(snapshot: Snapshot) -> None:
+    """Save a snapshot's changes as a patch and discard its worktree."""
+    patch_path = get_state_dir() / "snapshots" / f"{snapshot.id}.patch"
+    try:
+        saved = collect_snapshot(snapshot, patch_path)
+    except SnapshotError as e:
+        print(
+            f"Error: could not collect snapshot changes ({e}); "
+            f"leaving them in '{snapshot.worktree}'.",
+            file=sys.stderr,
+        )
+        return
+    remove_snapshot(snapshot)
+    if saved is None:
+        print("Snapshot: no changes.", file=sys.stderr)
+    else:
+        print(
+            f"Snapshot changes saved to {saved}\n"
+            f"  apply with: git -C {shlex.quote(str(snapshot.source))} apply {shlex.quote(str(saved))}",
+            file=sys.stderr,
+        )
+
+
+def _sync_workspace(
+    workspace_path: Path, volume: VolumeTree, prefer: Literal["local", "remote"]
+) -> bool:
+    """Reconcile the host workspace with its sync volume, reporting the outcome."""
+    try:
+        result = sync_trees(
+            LocalTree(workspace_path),
+            volume,
+            manifest_path(get_state_dir(), volume.volume),
+            prefer=prefer,
+        )
+    except (OSError, SyncError) as e:
+        print(f"Error: workspace sync failed: {e}", file=sys.stderr)
+        return False
+    print(f"Synced {volume.volume}: {describe(result)}", file=sys.stderr)
+    for rel in result.conflicts:
+        print(f"  conflict in {rel}: kept the {prefer} copy", file=sys.stderr)
+    return True
+
+
+def _run_session(
+    name: str,
+    image_ref: str,
+    run_options: list[str],
+    command_args: list[str],
+    workdir: str,
+    interactive: bool,
+    headless: bool,
+    dry_run: bool,
+    clock: Timings,
+    timed: Timings | None,
+    transcript: Transcript | None,
+    history: RunInfo | None,
+    login_shell: bool = True,
+) -> int:
+    """Run a command in the named session's container; return its exit status."""
+    try:
+        container = container_name(name)
+    except SessionError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    env = {"CONTAIN_AGENT_SESSION": name}
+    if dry_run:
+        create_cmd = create_command(name, image_ref, run_options, "SPEC")
+        exec_cmd = build_exec_command(
+            container, command_args, workdir, interactive, env, login_shell
+        )
+        for cmd in (create_cmd, exec_cmd):
+            print(" ".join(shlex.quote(arg) for arg in cmd))
+        return 0
+
+    try:
+        with session_run(get_state_dir(), name):
+            with clock.phase("session"):
+                _, resumed = ensure_session(name, image_ref, run_options)
+            if resumed:
+                # Lets setup scripts skip work the container has already done.
+                env["CONTAIN_AGENT_SESSION_RESUMED"] = "1"
+            exec_cmd = build_exec_command(
+                container, command_args, workdir, interactive, env, login_shell
+            )
+
+            def _exec() -> int:
+                if headless:
+                    with clock.phase("container"):
+                        return stream_events(exec_cmd)
+                return _run_docker(exec_cmd, timed, transcript)
+
+            return tracked_run(history, container, _exec, existing=resumed)
+    except SessionError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    except FileNotFoundError:
+        print(
+            "Error: 'docker' command not found. Please ensure Docker is installed and in your PATH.",
+            file=sys.stderr,
+        )
+        return 1
+    except KeyboardInterrupt:
+        return 130
+
+
+@app.command(cls=RunCommand, context_settings={"allow_interspersed_args": False})
 def run(
+    ctx: typer.Context,
     args: Annotated[
         list[str] | None,
         typer.Argument(
@@ -60,13 +643,45 @@ def run(
         typer.Option("--no-env-file", help="Do not load any .env file"),
     ] = False,
     image: Annotated[
-        str,
-        typer.Option("--image", help="Docker image to run"),
-    ] = DEFAULT_IMAGE,
+        str | None,
+        typer.Option("--image", help=f"Docker image to run (default: {DEFAULT_IMAGE})"),
+    ] = None,
+    profile: Annotated[
+        str | None,
+        typer.Option(
+            "--profile",
+            help=f"Image profile to run, e.g. minimal or web (default: {DEFAULT_PROFILE})",
+        ),
+    ] = None,
     network: Annotated[
         str | None,
         typer.Option("--network", help="Docker network to connect container to"),
     ] = None,
+    cpus: Annotated[
+        float | None,
+        typer.Option("--cpus", help="Number of CPUs the container may use"),
+    ] = None,
+    memory: Annotated[
+        str | None,
+        typer.Option("--memory", help="Memory limit for the container, e.g. 4g"),
+    ] = None,
+    cpuset_cpus: Annotated[
+        str | None,
+        typer.Option("--cpuset-cpus", help="Cores to pin the container to, e.g. 0-3"),
+    ] = None,
+    pids_limit: Annotated[
+        int | None,
+        typer.Option(
+            "--pids-limit", help="Maximum number of processes in the container"
+        ),
+    ] = None,
+    auto_resources: Annotated[
+        bool | None,
+        typer.Option(
+            "--auto-resources/--no-auto-resources",
+            help="Give the container an even, pinned share of the host's cores and memory",
+        ),
+    ] = None,
     build_image: Annotated[
         bool,
         typer.Option(
@@ -75,12 +690,13 @@ def run(
         ),
     ] = False,
     fresh_rebuild_image: Annotated[
-        bool,
+        str | None,
         typer.Option(
             "--fresh-rebuild-image",
-            help="Rebuild image updating agents (busts agent cache)",
+            help="Rebuild image updating agents (busts agent cache); pass =claude,codex to update only those",
+            metavar="[AGENTS]",
         ),
-    ] = False,
+    ] = None,
     no_cache_rebuild_image: Annotated[
         bool,
         typer.Option(
@@ -88,10 +704,119 @@ def run(
             help="Rebuild image from scratch (no cache)",
         ),
     ] = False,
+    cache_dir: Annotated[
+        Path | None,
+        typer.Option(
+            "--cache-dir",
+            help="Directory to import and export the image build's layer cache",
+        ),
+    ] = None,
     rm: Annotated[
         bool,
         typer.Option("--rm/--no-rm", help="Remove container automatically after exit"),
     ] = True,
+    pool: Annotated[
+        bool | None,
+        typer.Option(
+            "--pool/--no-pool",
+            help="Exec into a pre-started idle container from a warm pool",
+        ),
+    ] = None,
+    pool_size: Annotated[
+        int | None,
+        typer.Option("--pool-size", help="Number of idle containers to keep warm"),
+    ] = None,
+    pool_idle_timeout: Annotated[
+        int | None,
+        typer.Option(
+            "--pool-idle-timeout",
+            help="Seconds an idle pooled container is kept before removal",
+        ),
+    ] = None,
+    backend: Annotated[
+        Literal["cli", "engine"] | None,
+        typer.Option(
+            "--backend",
+            help="Talk to Docker via the docker CLI or the Engine API socket",
+        ),
+    ] = None,
+    package_caches: Annotated[
+        bool | None,
+        typer.Option(
+            "--package-caches/--no-package-caches",
+            help="Mount shared volumes for uv, pip, npm, bun and cargo caches",
+        ),
+    ] = None,
+    direct_exec: Annotated[
+        bool | None,
+        typer.Option(
+            "--exec/--login-shell",
+            help="Run the command directly instead of in a login shell (skips .bashrc)",
+        ),
+    ] = None,
+    cache_proxy: Annotated[
+        bool | None,
+        typer.Option(
+            "--cache-proxy/--no-cache-proxy",
+            help="Route package downloads through the shared caching proxy container",
+        ),
+    ] = None,
+    timings: Annotated[
+        bool,
+        typer.Option(
+            "--timings",
+            help="Print how long each launch phase took (or set CONTAIN_AGENT_TIMINGS=1)",
+        ),
+    ] = False,
+    timings_file: Annotated[
+        Path | None,
+        typer.Option(
+            "--timings-file",
+            help="Append launch timings as JSON lines to this file (or set CONTAIN_AGENT_TIMINGS=PATH)",
+        ),
+    ] = None,
+    sync: Annotated[
+        bool,
+        typer.Option(
+            "--sync",
+            help="Serve the workspace from a Docker volume, syncing changed files before and after the run",
+        ),
+    ] = False,
+    snapshot: Annotated[
+        bool,
+        typer.Option(
+            "--snapshot",
+            help="Mount a private copy-on-write git worktree of the workspace and save its changes as a patch",
+        ),
+    ] = False,
+    transcript: Annotated[
+        bool | None,
+        typer.Option(
+            "--transcript/--no-transcript",
+            help="Record the container's output to a compressed file in ~/.contain-agent/transcripts/",
+        ),
+    ] = None,
+    history: Annotated[
+        bool | None,
+        typer.Option(
+            "--history/--no-history",
+            help="Record the run and its resource usage for `contain-agent stats`",
+        ),
+    ] = None,
+    session: Annotated[
+        str | None,
+        typer.Option(
+            "--session",
+            help="Run in the named, persistent container, creating it on first use",
+        ),
+    ] = None,
+    headless: Annotated[
+        bool,
+        typer.Option(
+            "--headless",
+            help="Allocate no TTY and stream output and exit status as JSON lines",
+        ),
+    ] = False,
     force: Annotated[
         bool,
         typer.Option("-f", "--force", help="Allow mounting sensitive host directories"),
@@ -102,6 +827,13 @@ def run(
     ] = False,
 ) -> None:
     """Run AI coding agents in an isolated Docker container."""
+    clock = Timings()
+    clock.record("import")
+    report_to = None if dry_run else timings_target(timings, timings_file)
+    if report_to is not None:
+        ctx.call_on_close(lambda: _report_timings(clock, report_to))
+    timed = clock if report_to is not None else None
+
     workspace_path: Path | None = None
     command_args: list[str] = []
 
@@ -113,54 +845,32 @@ def run(
         else:
             workspace_path = Path.cwd()
 
-        if not workspace_path.exists():
-            print(
-                f"Error: Directory '{workspace_path}' does not exist (did you forget --no-mount?)",
-                file=sys.stderr,
-            )
-            raise typer.Exit(1)
-
-        try:
-            workspace_path = workspace_path.resolve()
-        except OSError as e:
-            print(
-                f"Error: Cannot resolve directory '{workspace_path}': {e}",
-                file=sys.stderr,
-            )
-            raise typer.Exit(1)
-
-        if is_sensitive_directory(workspace_path) and not force:
-            print(
-                f"Cowardly refusing to mount sensitive directory '{workspace_path}'. Use --force to override.",
-                file=sys.stderr,
-            )
-            raise typer.Exit(1)
+        workspace_path = _resolve_workspace(workspace_path, force)
     else:
         if args:
             command_args = args
 
-    current_settings = load_settings()
+    current_settings = load_settings(workspace=workspace_path or Path.cwd())
     if not command_args and current_settings.default_command:
         command_args = [
             current_settings.default_command,
             *current_settings.default_args,
         ]
+    image = image or current_settings.image or DEFAULT_IMAGE
+    profile = _check_profile(profile or current_settings.profile)
+    network = network or current_settings.network
+    cpus = cpus or current_settings.cpus
+    memory = memory or current_settings.memory
+    cpuset_cpus = cpuset_cpus or current_settings.cpuset_cpus
+    pids_limit = pids_limit or current_settings.pids_limit
+    auto = (
+        auto_resources
+        if auto_resources is not None
+        else current_settings.auto_resources
+    )
+    clock.record("settings")
 
-    # Determine env file
-    env_file_path: Path | None = None
-    if not no_env_file:
-        if env_file:
-            if not env_file.exists() or not env_file.is_file():
-                print(
-                    f"Error: Specified env file '{env_file}' does not exist.",
-                    file=sys.stderr,
-                )
-                raise typer.Exit(1)
-            env_file_path = env_file
-        else:
-            default_env = Path.home() / ".contain-agent" / ".env"
-            if default_env.is_file():
-                env_file_path = default_env
+    env_file_path = _resolve_env_file(env_file, no_env_file)
 
     # Determine config mounts
     effective_dotfiles_dir = (
@@ -168,56 +878,403 @@ def run(
         if dotfiles_dir is not None
         else (Path.home() / ".contain-agent" / "dotfiles")
     )
-    config_mounts = get_config_mounts(share_config, effective_dotfiles_dir)
+    config_mounts = [
+        *get_config_mounts(share_config, effective_dotfiles_dir),
+        *(_split_mount(spec) for spec in current_settings.mounts),
+    ]
+    clock.record("config_mounts")
 
-    image_exists = check_image_exists(image)
-    should_build = (
-        build_image or fresh_rebuild_image or no_cache_rebuild_image or not image_exists
-    )
+    rebuild_agents: list[str] | None = None
+    if fresh_rebuild_image is not None and fresh_rebuild_image != ALL_AGENTS:
+        rebuild_agents = _parse_agent_list(fresh_rebuild_image)
 
-    if should_build:
-        if not (build_image or fresh_rebuild_image or no_cache_rebuild_image):
+    engine = None if dry_run else _connect_engine(backend or current_settings.backend)
+    build_cache = _build_cache(cache_dir, current_settings)
+    image_ref, image_id = _ensure_image(
+        image,
+        engine,
+        build=build_image,
+        no_cache=no_cache_rebuild_image,
+        fresh_rebuild=fresh_rebuild_image is not None,
+        rebuild_agents=rebuild_agents,
+        dry_run=dry_run,
+        background=current_settings.prewarm,
+        profile=profile,
+        build_cache=build_cache,
+    )
+    image_name = profile_image(image, profile)
+    plan_expires = None
+    if current_settings.prewarm and image_ref != image_name and not dry_run:
+        plan_expires = refresh_at(
+            get_state_dir(), image_name, current_settings.image_max_age
+        )
+        retry = retry_at(get_state_dir(), image_name)
+        if plan_expires is not None and retry is not None:
+            # A failed refresh is not retried before its backoff is over.
+            plan_expires = max(plan_expires, retry)
+        if plan_expires is not None and plan_expires <= time.time():
             print(
-                f"Docker image '{image}' not found locally. Building it...",
+                f"Docker image '{image_name}' is stale; rebuilding it in the background.",
                 file=sys.stderr,
             )
-        b_cmd = build_image_command(
-            image=image,
-            no_cache=no_cache_rebuild_image,
-            fresh_rebuild=fresh_rebuild_image,
+            schedule_prewarm(
+                image, fresh=True, profile=profile, build_cache=build_cache
+            )
+    clock.record("image")
+
+    use_caches = (
+        package_caches
+        if package_caches is not None
+        else current_settings.package_caches
+    )
+    if use_caches:
+        config_mounts = [
+            *config_mounts,
+            *_package_cache_mounts(image_ref, current_settings, dry_run),
+        ]
+        clock.record("package_caches")
+
+    use_cache_proxy = (
+        cache_proxy if cache_proxy is not None else current_settings.cache_proxy
+    )
+    run_env: dict[str, str] = {}
+    if use_cache_proxy:
+        network = network or PROXY_NETWORK
+        if not dry_run:
+            try:
+                ensure_proxy(
+                    network,
+                    current_settings.cache_proxy_image,
+                    current_settings.cache_proxy_max_mb,
+                )
+            except ProxyError as e:
+                print(f"Error: cannot start the cache proxy: {e}", file=sys.stderr)
+                raise typer.Exit(1)
+        run_env = proxy_env()
+        config_mounts = [*config_mounts, cargo_config_mount(get_state_dir())]
+        clock.record("cache_proxy")
+
+    # Keyed by the real workspace, so snapshots of it share its volumes.
+    artifact_dirs = current_settings.artifact_dirs if workspace_path else []
+    if artifact_dirs:
+        try:
+            config_mounts = [
+                *config_mounts,
+                *artifact_mounts(workspace_path, artifact_dirs),
+            ]
+        except ArtifactError as e:
+            print(f"Error: {e}", file=sys.stderr)
+            raise typer.Exit(1)
+        if not dry_run:
+            try:
+                prepare_volumes(
+                    get_state_dir(),
+                    workspace_path,
+                    artifact_dirs,
+                    image_ref,
+                    effective_uid(),
+                )
+            except ArtifactError as e:
+                print(f"Error: cannot create artifact volumes: {e}", file=sys.stderr)
+                raise typer.Exit(1)
+        clock.record("artifacts")
+
+    if snapshot and workspace_path is None:
+        print("Error: --snapshot needs a mounted workspace.", file=sys.stderr)
+        raise typer.Exit(1)
+    if snapshot and session is not None:
+        print("Error: --session cannot be combined with --snapshot.", file=sys.stderr)
+        raise typer.Exit(1)
+    workspace_snapshot: Snapshot | None = None
+    if snapshot and not dry_run:
+        try:
+            workspace_snapshot = create_snapshot(
+                workspace_path, get_state_dir() / "snapshots"
+            )
+        except SnapshotError as e:
+            print(f"Error: cannot snapshot '{workspace_path}': {e}", file=sys.stderr)
+            raise typer.Exit(1)
+        ctx.call_on_close(lambda: _finish_snapshot(workspace_snapshot))
+        workspace_path = workspace_snapshot.workspace
+        config_mounts = [*config_mounts, *workspace_snapshot.mounts()]
+        clock.record("snapshot")
+
+    if sync and (workspace_path is None or snapshot):
+        print(
+            "Error: --sync needs a mounted workspace and cannot be combined with --snapshot.",
+            file=sys.stderr,
         )
-        if dry_run:
-            print(" ".join(shlex.quote(arg) for arg in b_cmd))
+        raise typer.Exit(1)
+    workspace_volume: str | None = None
+    if sync:
+        workspace_volume = volume_name(workspace_path)
+        if not dry_run:
+            synced_path = workspace_path
+            volume_tree = VolumeTree(workspace_volume, image_ref, effective_uid())
+            if not _sync_workspace(synced_path, volume_tree, "local"):
+                raise typer.Exit(1)
+            clock.record("sync_in")
+
+            def _sync_back() -> None:
+                with clock.phase("sync_out"):
+                    _sync_workspace(synced_path, volume_tree, "remote")
+
+            ctx.call_on_close(_sync_back)
+
+    labels: dict[str, str] = {}
+    # A session keeps the limits it was created with, so it gets no auto share.
+    if auto and session is None:
+        share = auto_share()
+        if share is None:
+            print(
+                "Warning: cannot inspect the Docker host; running without automatic limits.",
+                file=sys.stderr,
+            )
+            auto = False
         else:
+            # Explicit limits win; the label lets later containers avoid our cores.
+            cpuset_cpus = cpuset_cpus or share.cpuset_cpus
+            memory = memory or share.memory
+            labels[CPUSET_LABEL] = cpuset_cpus
+        clock.record("resources")
+
+    interactive = sys.stdin.isatty() and not headless
+    login_shell = not _direct_exec(
+        direct_exec, current_settings, command_args, interactive
+    )
+    use_transcript = (
+        transcript if transcript is not None else current_settings.transcript
+    )
+    recorder = (
+        Transcript(
+            transcript_path(get_state_dir()),
+            current_settings.transcript_max_mb * 1024 * 1024,
+        )
+        if use_transcript and not headless
+        else None
+    )
+    use_history = history if history is not None else current_settings.history
+    run_info = (
+        RunInfo(history_path(get_state_dir()), image_ref, workspace_path, command_args)
+        if use_history and not dry_run
+        else None
+    )
+    # Resource usage is sampled by container name, so recorded runs need one.
+    run_name = f"contain-agent-run-{uuid.uuid4().hex[:12]}" if run_info else None
+    if session is not None:
+        run_options = docker_run_options(
+            workspace_path=workspace_path,
+            config_mounts=config_mounts,
+            env_file_path=env_file_path,
+            network=network,
+            workspace_volume=workspace_volume,
+            cpus=cpus,
+            memory=memory,
+            cpuset_cpus=cpuset_cpus,
+            pids_limit=pids_limit,
+            env=run_env,
+        )
+        raise typer.Exit(
+            _run_session(
+                session,
+                image_ref,
+                run_options,
+                command_args,
+                container_workdir(workspace_path),
+                interactive=interactive,
+                headless=headless,
+                dry_run=dry_run,
+                clock=clock,
+                timed=timed,
+                transcript=recorder,
+                history=run_info,
+                login_shell=login_shell,
+            )
+        )
+
+    use_pool = pool if pool is not None else current_settings.pool
+    # Every snapshot has its own mount, and every auto share its own cores, so
+    # neither could reuse a pooled container.
+    if use_pool and not dry_run and workspace_snapshot is None and not auto:
+        warm_pool = Pool(
+            get_state_dir(),
+            image_ref,
+            docker_run_options(
+                workspace_path=workspace_path,
+                config_mounts=config_mounts,
+                env_file_path=env_file_path,
+                network=network,
+                workspace_volume=workspace_volume,
+                cpus=cpus,
+                memory=memory,
+                cpuset_cpus=cpuset_cpus,
+                pids_limit=pids_limit,
+                env=run_env,
+            ),
+            PoolConfig(
+                size=pool_size if pool_size is not None else current_settings.pool_size,
+                max_uses=current_settings.pool_max_uses,
+                max_age=current_settings.pool_max_age,
+                idle_timeout=(
+                    pool_idle_timeout
+                    if pool_idle_timeout is not None
+                    else current_settings.pool_idle_timeout
+                ),
+            ),
+        )
+        warm_pool.reap()
+        container = warm_pool.claim()
+        warm_pool.replenish()
+        clock.record("pool")
+        if container is not None:
+            exec_cmd = build_exec_command(
+                container,
+                command=command_args,
+                workdir=container_workdir(workspace_path),
+                interactive=interactive,
+                login_shell=login_shell,
+            )
+
+            def _exec() -> int:
+                if headless:
+                    with clock.phase("container"):
+                        return stream_events(exec_cmd)
+                return _run_docker(exec_cmd, timed, recorder)
+
             try:
-                build_res = subprocess.run(b_cmd, check=False)
-                if build_res.returncode != 0:
-                    raise typer.Exit(build_res.returncode)
+                raise typer.Exit(tracked_run(run_info, container, _exec, existing=True))
             except FileNotFoundError:
                 print(
                     "Error: 'docker' command not found. Please ensure Docker is installed and in your PATH.",
                     file=sys.stderr,
                 )
                 raise typer.Exit(1)
+            except KeyboardInterrupt:
+                raise typer.Exit(130)
+            finally:
+                warm_pool.release(container)
 
     docker_cmd = build_docker_command(
-        image=image,
+        image=image_ref,
         workspace_path=workspace_path,
         config_mounts=config_mounts,
         env_file_path=env_file_path,
         command=command_args,
         network=network,
         rm=rm,
-        interactive=sys.stdin.isatty(),
+        interactive=interactive,
+        name=run_name,
+        workspace_volume=workspace_volume,
+        cpus=cpus,
+        memory=memory,
+        cpuset_cpus=cpuset_cpus,
+        pids_limit=pids_limit,
+        labels=labels,
+        env=run_env,
+        login_shell=login_shell,
     )
 
     if dry_run:
         print(" ".join(shlex.quote(arg) for arg in docker_cmd))
         raise typer.Exit(0)
 
+    if headless:
+        # The launcher execs cached plans directly, which would bypass the
+        # event stream, so headless runs neither record nor use the Engine API.
+        with clock.phase("container"):
+            raise typer.Exit(
+                tracked_run(run_info, run_name, lambda: stream_events(docker_cmd))
+            )
+
+    # Snapshot and sync runs have setup and teardown a cached exec would skip,
+    # an auto share depends on what else is running, the cache proxy must be
+    # checked to be running, transcripts and history need this process, a
+    # cached exec can only log timings to a file, not print a table, and a
+    # rebuild flag asks for a build on every run.
+    if (
+        launch.active_key
+        and image_id
+        and not build_image
+        and fresh_rebuild_image is None
+        and not no_cache_rebuild_image
+        and workspace_snapshot is None
+        and workspace_volume is None
+        and not auto
+        and not use_cache_proxy
+        and recorder is None
+        and run_info is None
+        and report_to != "table"
+    ):
+        dockerfile_path, context_dir = get_docker_context()
+        plan_inputs = [
+            get_state_dir() / "settings.json",
+            *project_settings_candidates(workspace_path or Path.cwd()),
+            get_state_dir() / ".env",
+            image_cache_path(),
+            dockerfile_path,
+            context_dir / "scripts" / "bin",
+            *config_candidates(share_config, effective_dotfiles_dir),
+        ]
+        if env_file_path:
+            plan_inputs.append(env_file_path)
+        if workspace_path:
+            plan_inputs.append(workspace_path)
+        if artifact_dirs:
+            # Purging volumes rewrites it, so the next run registers them again.
+            plan_inputs.append(registry_path(get_state_dir()))
+        launch.save_plan(
+            launch.active_key,
+            docker_cmd,
+            [str(p) for p in plan_inputs],
+            image_id,
+            expires=plan_expires,
+        )
+
+    if engine is not None and recorder is None:
+        config = container_config(
+            image=image_ref,
+            workspace_path=workspace_path,
+            config_mounts=config_mounts,
+            env_file_path=env_file_path,
+            command=command_args,
+            network=network,
+            rm=rm,
+            interactive=interactive,
+            workspace_volume=workspace_volume,
+            cpus=cpus,
+            memory=memory,
+            cpuset_cpus=cpuset_cpus,
+            pids_limit=pids_limit,
+            labels=labels,
+            env=run_env,
+            login_shell=login_shell,
+        )
+        try:
+            with clock.phase("container"):
+                raise typer.Exit(
+                    tracked_run(
+                        run_info,
+                        run_name,
+                        lambda: run_container(
+                            engine,
+                            config,
+                            run_name,
+                            on_output=lambda: clock.mark("first_output"),
+                        ),
+                    )
+                )
+        except EngineError as e:
+            print(f"Error: {e}", file=sys.stderr)
+            raise typer.Exit(1)
+        except KeyboardInterrupt:
+            raise typer.Exit(130)
+
     try:
-        result = subprocess.run(docker_cmd, check=False)
-        raise typer.Exit(result.returncode)
+        raise typer.Exit(
+            tracked_run(
+                run_info, run_name, lambda: _run_docker(docker_cmd, timed, recorder)
+            )
+        )
     except FileNotFoundError:
         print(
             "Error: 'docker' command not found. Please ensure Docker is installed and in your PATH.",
@@ -228,5 +1285,363 @@ def run(
         raise typer.Exit(130)
 
 
+@app.command()
+def batch(
+    manifest: Annotated[
+        Path,
+        typer.Argument(help="JSON or JSON Lines file of jobs to run"),
+    ],
+    jobs: Annotated[
+        int | None,
+        typer.Option(
+            "-j",
+            "--jobs",
+            help="Number of jobs to run at once (default and maximum: available CPUs)",
+        ),
+    ] = None,
+    output_dir: Annotated[
+        Path | None,
+        typer.Option(
+            "--output-dir",
+            help="Directory for per-job logs and summary.json (default: ~/.contain-agent/batch/<timestamp>)",
+        ),
+    ] = None,
+    timeout: Annotated[
+        float | None,
+        typer.Option("--timeout", help="Seconds after which a job is killed"),
+    ] = None,
+    share_config: Annotated[
+        bool,
+        typer.Option(
+            "--share-config/--no-share-config",
+            help="Mount agent configuration from host home directory",
+        ),
+    ] = True,
+    env_file: Annotated[
+        Path | None,
+        typer.Option(
+            "--env-file",
+            help="Path to .env file to load (default: ~/.contain-agent/.env if present)",
+        ),
+    ] = None,
+    no_env_file: Annotated[
+        bool,
+        typer.Option("--no-env-file", help="Do not load any .env file"),
+    ] = False,
+    profile: Annotated[
+        str | None,
+        typer.Option(
+            "--profile", help=f"Image profile to run (default: {DEFAULT_PROFILE})"
+        ),
+    ] = None,
+    cache_dir: Annotated[
+        Path | None,
+        typer.Option(
+            "--cache-dir",
+            help="Directory to import and export the image build's layer cache",
+        ),
+    ] = None,
+    force: Annotated[
+        bool,
+        typer.Option("-f", "--force", help="Allow mounting sensitive host directories"),
+    ] = False,
+    dry_run: Annotated[
+        bool,
+        typer.Option(
+            "--dry-run", help="Print the docker commands without executing them"
+        ),
+    ] = False,
+) -> None:
+    """Run a manifest of non-interactive agent jobs in parallel."""
+    try:
+        batch_jobs = load_batch_manifest(manifest)
+    except (OSError, TypeError, ValueError) as e:
+        print(f"Error: Cannot load batch manifest '{manifest}': {e}", file=sys.stderr)
+        raise typer.Exit(1)
+    if not batch_jobs:
+        print("No jobs in batch manifest.", file=sys.stderr)
+        raise typer.Exit(0)
+
+    current_settings = load_settings()
+    profile = _check_profile(profile or current_settings.profile)
+    env_file_path = _resolve_env_file(env_file, no_env_file)
+    config_mounts = get_config_mounts(
+        share_config, Path.home() / ".contain-agent" / "dotfiles"
+    )
+
+    # Images are resolved (and built) once up front, so workers never race to
+    # build the same tag.
+    engine = None if dry_run else _connect_engine(current_settings.backend)
+    build_cache = _build_cache(cache_dir, current_settings)
+    image_refs: dict[str, str] = {}
+    for job in batch_jobs:
+        if job.image not in image_refs:
+            image_refs[job.image], _ = _ensure_image(
+                job.image,
+                engine,
+                dry_run=dry_run,
+                profile=profile,
+                build_cache=build_cache,
+            )
+
+    if current_settings.package_caches:
+        config_mounts = [
+            *config_mounts,
+            *_package_cache_mounts(
+                next(iter(image_refs.values())), current_settings, dry_run
+            ),
+        ]
+
+    run_id = f"{os.getpid()}-{int(time.time())}"
+    commands: list[tuple[str, list[str], str]] = []
+    for i, job in enumerate(batch_jobs, 1):
+        workspace_path = (
+            _resolve_workspace(job.workspace, force) if job.workspace else None
+        )
+        command_args = job.command
+        if not command_args and current_settings.default_command:
+            command_args = [
+                current_settings.default_command,
+                *current_settings.default_args,
+            ]
+        container = f"contain-agent-batch-{run_id}-{i}"
+        commands.append(
+            (
+                job_label(i, job),
+                build_docker_command(
+                    image=image_refs[job.image],
+                    workspace_path=workspace_path,
+                    config_mounts=config_mounts,
+                    env_file_path=env_file_path,
+                    command=command_args,
+                    network=job.network,
+                    interactive=False,
+                    name=container,
+                    cpus=current_settings.cpus,
+                    memory=current_settings.memory,
+                    cpuset_cpus=current_settings.cpuset_cpus,
+                    pids_limit=current_settings.pids_limit,
+                    login_shell=not _direct_exec(
+                        None, current_settings, command_args, False
+                    ),
+                ),
+                container,
+            )
+        )
+
+    if dry_run:
+        for _, cmd, _ in commands:
+            print(" ".join(shlex.quote(arg) for arg in cmd))
+        raise typer.Exit(0)
+
+    limit = max_workers()
+    width = min(jobs or limit, limit, len(commands))
+    if jobs is not None and jobs > limit:
+        print(
+            f"Warning: limiting --jobs to {limit} available CPUs.",
+            file=sys.stderr,
+        )
+    if output_dir is None:
+        output_dir = (
+            get_state_dir() / "batch" / time.strftime("%Y%m%d-%H%M%S", time.localtime())
+        )
+
+    results = run_batch(
+        commands,
+        output_dir,
+        width,
+        timeout=timeout,
+        on_result=lambda r: print(
+            f"[{r.index}/{len(commands)}] finished with exit {r.exit_code}",
+            file=sys.stderr,
+        ),
+    )
+    name_width = max(len(r.name) for r in results)
+    print(f"{'JOB':<{name_width}}  {'EXIT':>4}  {'TIME':>8}  LOG")
+    for r in results:
+        print(f"{r.name:<{name_width}}  {r.exit_code:>4}  {r.duration:>7.1f}s  {r.log}")
+    failed = sum(1 for r in results if r.exit_code != 0)
+    print(
+        f"{len(results) - failed}/{len(results)} jobs succeeded; logs in {output_dir}",
+        file=sys.stderr,
+    )
+    raise typer.Exit(1 if failed else 0)
+
+
+def _format_bytes(value: int | None) -> str:
+    if value is None:
+        return "-"
+    return f"{value / (1 << 20):.0f}MiB"
+
+
+@app.command()
+def stats(
+    by: Annotated[
+        list[str] | None,
+        typer.Option(
+            "--by",
+            help="Group runs by command, workspace or image; repeat to combine (default: command)",
+        ),
+    ] = None,
+    days: Annotated[
+        float | None,
+        typer.Option("--days", help="Only include runs from the last DAYS days"),
+    ] = None,
+) -> None:
+    """Summarize recorded runs: wall-time percentiles, CPU time and peak memory."""
+    group_by = by or ["command"]
+    unknown = [key for key in group_by if key not in GROUP_COLUMNS]
+    if unknown:
+        print(
+            f"Error: Cannot group by {', '.join(unknown)} "
+            f"(known: {', '.join(GROUP_COLUMNS)})",
+            file=sys.stderr,
+        )
+        raise typer.Exit(1)
+    since = time.time() - days * 86400 if days is not None else None
+    rows = query_stats(history_path(get_state_dir()), group_by, since)
+    if not rows:
+        print(
+            'No runs recorded; enable with --history or "history": true.',
+            file=sys.stderr,
+        )
+        raise typer.Exit(0)
+
+    headers = [key.upper() for key in group_by]
+    table = [
+        [
+            *(str(row[key]) for key in group_by),
+            str(row["runs"]),
+            str(row["failed"]),
+            *(f"{row[p]:.1f}s" for p in ("p50", "p90", "p99")),
+            f"{row['mean_cpu']:.1f}s" if row["mean_cpu"] is not None else "-",
+            _format_bytes(row["max_memory"]),
+        ]
+        for row in rows
+    ]
+    headers += ["RUNS", "FAILED", "P50", "P90", "P99", "CPU", "PEAK MEM"]
+    _print_table(headers, table)
+
+
+def _print_table(headers: list[str], table: list[list[str]]) -> None:
+    widths = [
+        max(len(cells[i]) for cells in [headers, *table]) for i in range(len(headers))
+    ]
+    for cells in [headers, *table]:
+        print(
+            "  ".join(
+                cell.ljust(width) for cell, width in zip(cells, widths, strict=True)
+            ).rstrip()
+        )
+
+
+@app.command()
+def artifacts(
+    workspace: Annotated[
+        Path | None,
+        typer.Argument(
+            help="Workspace whose volumes to show (default: current directory)"
+        ),
+    ] = None,
+    all_workspaces: Annotated[
+        bool,
+        typer.Option("--all", help="Show the volumes of every workspace"),
+    ] = False,
+    purge: Annotated[
+        bool,
+        typer.Option("--purge", help="Remove the volumes instead of listing them"),
+    ] = False,
+) -> None:
+    """List or purge the build-artifact volumes of a workspace."""
+    state_dir = get_state_dir()
+    try:
+        volumes = list_volumes(
+            state_dir, None if all_workspaces else (workspace or Path.cwd())
+        )
+    except ArtifactError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        raise typer.Exit(1)
+    if not volumes:
+        print("No artifact volumes.", file=sys.stderr)
+        raise typer.Exit(0)
+    if purge:
+        errors = purge_volumes(state_dir, volumes)
+        for error in errors:
+            print(f"Error: {error}", file=sys.stderr)
+        print(
+            f"Removed {len(volumes) - len(errors)} of {len(volumes)} artifact volumes.",
+            file=sys.stderr,
+        )
+        raise typer.Exit(1 if errors else 0)
+    _print_table(
+        ["VOLUME", "WORKSPACE", "PATH"],
+        [[v.name, v.workspace or "-", v.path or "-"] for v in volumes],
+    )
+
+
+@app.command()
+def prewarm(
+    image: Annotated[
+        str | None,
+        typer.Option(
+            "--image", help=f"Docker image to build (default: {DEFAULT_IMAGE})"
+        ),
+    ] = None,
+    profile: Annotated[
+        str | None,
+        typer.Option(
+            "--profile", help=f"Image profile to build (default: {DEFAULT_PROFILE})"
+        ),
+    ] = None,
+    cache_dir: Annotated[
+        Path | None,
+        typer.Option(
+            "--cache-dir",
+            help="Directory to import and export the image build's layer cache",
+        ),
+    ] = None,
+    background: Annotated[
+        bool,
+        typer.Option(
+            "--background",
+            help="Build in a detached process, logging to ~/.contain-agent/prewarm/",
+        ),
+    ] = False,
+    force: Annotated[
+        bool,
+        typer.Option("--force", help="Rebuild even if the image is current"),
+    ] = False,
+) -> None:
+    """Build the image if its inputs changed or it is stale, without running it."""
+    current_settings = load_settings(workspace=Path.cwd())
+    image = image or current_settings.image or DEFAULT_IMAGE
+    profile = _check_profile(profile or current_settings.profile)
+    image_ref = content_image_tag(profile_image(image, profile))
+    missing = get_image_id(image_ref) is None
+    expires = refresh_at(
+        get_state_dir(), profile_image(image, profile), current_settings.image_max_age
+    )
+    stale = expires is not None and expires <= time.time()
+    if not (missing or stale or force):
+        print(f"Docker image '{image_ref}' is up to date.", file=sys.stderr)
+        raise typer.Exit(0)
+    fresh = stale or force
+    build_cache = _build_cache(cache_dir, current_settings)
+    if background:
+        schedule_prewarm(image, fresh=fresh, profile=profile, build_cache=build_cache)
+        print(f"Building '{image_ref}' in the background.", file=sys.stderr)
+        raise typer.Exit(0)
+    try:
+        raise typer.Exit(
+            prewarm_image(image, fresh=fresh, profile=profile, build_cache=build_cache)
+        )
+    except FileNotFoundError:
+        print(
+            "Error: 'docker' command not found. Please ensure Docker is installed and in your PATH.",
+            file=sys.stderr,
+        )
+        raise typer.Exit(1)
+
+
 def main() -> None:
     app()
@@ -2,6 +2,12 @@ from pathlib import Path
 
 DEFAULT_IMAGE = "contain-agent"
 
+# Image profile built under the plain image name; other profiles get their own.
+DEFAULT_PROFILE = "full"
+
+# Value of --fresh-rebuild-image given without an agent list.
+ALL_AGENTS = "all"
+
 KNOWN_CONFIG_NAMES = [
     ".claude",
     ".claude.json",
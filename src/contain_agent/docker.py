@@ -1,11 +1,20 @@
+import hashlib
 import os
 import shlex
 import subprocess
 import time
+from dataclasses import dataclass, field
 from importlib.resources import files
 from pathlib import Path
 
-from contain_agent.constants import DEFAULT_IMAGE
+from contain_agent.constants import DEFAULT_IMAGE, DEFAULT_PROFILE
+from contain_agent.dockerfile import (
+    cache_bust_arg,
+    generated_dockerfile_path,
+    load_manifest,
+    render_dockerfile,
+    write_dockerfile,
+)
 
 
 def get_docker_cmd() -> str:
@@ -30,35 +39,170 @@ def get_docker_context() -> tuple[Path, Path]:
     raise FileNotFoundError("Could not find Dockerfile for contain-agent.")
 
 
+def effective_uid(uid: int | None = None) -> int:
+    """UID the in-container `agent` user is built with."""
+    if uid is not None:
+        return uid
+    return os.getuid() if hasattr(os, "getuid") else 1000
+
+
+def image_inputs_digest(uid: int | None = None) -> str:
+    """Hash the generated Dockerfile, the wrapper scripts and the UID build arg."""
+    _, context_dir = get_docker_context()
+    digest = hashlib.sha256()
+    dockerfile = render_dockerfile(load_manifest())
+    digest.update(b"Dockerfile\0" + dockerfile.encode())
+    for script in sorted((context_dir / "scripts" / "bin").glob("*")):
+        digest.update(f"\0scripts/bin/{script.name}\0".encode())
+        digest.update(script.read_bytes())
+    digest.update(f"\0UID={effective_uid(uid)}".encode())
+    return digest.hexdigest()[:12]
+
+
+def has_explicit_tag(image: str) -> bool:
+    """Whether `image` pins a tag or digest (a registry port is not a tag)."""
+    return "@" in image or ":" in image.rsplit("/", 1)[-1]
+
+
+def profile_image(image: str, profile: str | None) -> str:
+    """The image name a profile is built under: `<image>-<profile>`.
+
+    The default profile keeps the plain name; an explicit tag is kept.
+    """
+    if profile is None or profile == DEFAULT_PROFILE:
+        return image
+    repo, at, pin = image.partition("@")
+    if not at and has_explicit_tag(image):
+        repo, at, pin = image.rpartition(":")
+    return f"{repo}-{profile}{at}{pin}"
+
+
+def content_image_tag(image: str, uid: int | None = None) -> str:
+    """Return the content-addressed tag for `image`.
+
+    Images named with an explicit tag are treated as pinned and used as-is.
+    """
+    if has_explicit_tag(image):
+        return image
+    return f"{image}:{image_inputs_digest(uid)}"
+
+
+@dataclass
+class BuildSpec:
+    """Everything needed to build the contain-agent image."""
+
+    tags: list[str]
+    dockerfile: Path
+    context_dir: Path
+    build_args: dict[str, str] = field(default_factory=dict)
+    no_cache: bool = False
+    target: str | None = None
+    # A buildx builder, and the --cache-from/--cache-to specs to use on it.
+    builder: str | None = None
+    cache_from: str | None = None
+    cache_to: str | None = None
+    # Rendered Dockerfile, written to `dockerfile` only when the build runs.
+    dockerfile_content: str | None = None
+
+
+def image_build_spec(
+    image: str,
+    no_cache: bool = False,
+    fresh_rebuild: bool = False,
+    cache_bust_value: str | None = None,
+    uid: int | None = None,
+    rebuild_agents: list[str] | None = None,
+    profile: str | None = None,
+) -> BuildSpec:
+    """Resolve the tags, Dockerfile, context and build args for an image build.
+
+    A fresh rebuild busts the install layer of every agent in `rebuild_agents`
+    (all agents when None) and leaves the other agents cached. A `profile`
+    builds that profile's stage, tagged under its own image name.
+    """
+    _, context_dir = get_docker_context()
+    image = profile_image(image, profile)
+    build_uid = effective_uid(uid)
+    tags = [image]
+    content_tag = content_image_tag(image, build_uid)
+    if content_tag != image:
+        tags.append(content_tag)
+    build_args = {"UID": str(build_uid)}
+    if not no_cache and fresh_rebuild:
+        val = cache_bust_value or str(int(time.time()))
+        build_args["CACHE_BUST"] = val
+        agents = (
+            rebuild_agents
+            if rebuild_agents is not None
+            else [a.name for a in load_manifest().agents]
+        )
+        for agent in agents:
+            build_args[cache_bust_arg(agent)] = val
+    return BuildSpec(
+        tags=tags,
+        dockerfile=generated_dockerfile_path().resolve(),
+        context_dir=context_dir.resolve(),
+        build_args=build_args,
+        no_cache=no_cache,
+        target=profile,
+        dockerfile_content=render_dockerfile(load_manifest()),
+    )
+
+
 def build_image_command(
     image: str,
     no_cache: bool = False,
     fresh_rebuild: bool = False,
     cache_bust_value: str | None = None,
     uid: int | None = None,
+    rebuild_agents: list[str] | None = None,
+    profile: str | None = None,
 ) -> list[str]:
-    """Build the docker build command line."""
-    dockerfile_path, context_dir = get_docker_context()
-    effective_uid = (
-        uid if uid is not None else (os.getuid() if hasattr(os, "getuid") else 1000)
-    )
-    cmd = [
-        get_docker_cmd(),
-        "build",
-        "-t",
+    """Build the docker build command line, writing the Dockerfile it reads."""
+    spec = image_build_spec(
         image,
-        "-f",
-        str(dockerfile_path.resolve()),
-        "--build-arg",
-        f"UID={effective_uid}",
-    ]
-    if no_cache:
-        cmd.append("--no-cache")
-    elif fresh_rebuild:
-        val = cache_bust_value or str(int(time.time()))
-        cmd.extend(["--build-arg", f"CACHE_BUST={val}"])
+        no_cache,
+        fresh_rebuild,
+        cache_bust_value,
+        uid,
+        rebuild_agents,
+        profile,
+    )
+    write_build_files(spec)
+    return build_spec_command(spec)
+
+
+def write_build_files(spec: BuildSpec) -> None:
+    """Write the generated files a build of `spec` reads.
+
+    Kept apart from resolving the spec, so that dry runs write nothing.
+    """
+    if spec.dockerfile_content is not None:
+        write_dockerfile(spec.dockerfile, spec.dockerfile_content)
+
 
-    cmd.append(str(context_dir.resolve()))
+def build_spec_command(spec: BuildSpec) -> list[str]:
+    """The docker build command line for a resolved build spec."""
+    if spec.builder is None:
+        cmd = [get_docker_cmd(), "build"]
+    else:
+        cmd = [get_docker_cmd(), "buildx", "build", "--builder", spec.builder]
+        # Builders other than the daemon's own keep the image to themselves.
+        cmd.append("--load")
+    if spec.cache_from:
+        cmd.extend(["--cache-from", spec.cache_from])
+    if spec.cache_to:
+        cmd.extend(["--cache-to", spec.cache_to])
+    for tag in spec.tags:
+        cmd.extend(["-t", tag])
+    cmd.extend(["-f", str(spec.dockerfile)])
+    if spec.target:
+        cmd.extend(["--target", spec.target])
+    for key, value in spec.build_args.items():
+        cmd.extend(["--build-arg", f"{key}={value}"])
+    if spec.no_cache:
+        cmd.append("--no-cache")
+    cmd.append(str(spec.context_dir))
     return cmd
 
 
@@ -76,6 +220,92 @@ def check_image_exists(image: str) -> bool:
         return True
 
 
+def container_workdir(workspace_path: Path | None) -> str:
+    """Return the working directory used inside the container."""
+    if workspace_path:
+        return f"/workspace/{workspace_path.resolve().name}"
+    return "/workspace"
+
+
+def docker_run_options(
+    workspace_path: Path | None = None,
+    config_mounts: list[tuple[str, str]] | None = None,
+    env_file_path: Path | None = None,
+    network: str | None = None,
+    workspace_volume: str | None = None,
+    cpus: float | None = None,
+    memory: str | None = None,
+    cpuset_cpus: str | None = None,
+    pids_limit: int | None = None,
+    env: dict[str, str] | None = None,
+) -> list[str]:
+    """Build the network, limit, env, mount and workdir options shared by every container.
+
+    With `workspace_volume`, the workspace is served from that named volume
+    instead of being bind-mounted from the host.
+    """
+    opts: list[str] = []
+
+    if network:
+        opts.extend(["--network", network])
+
+    if cpus:
+        opts.extend(["--cpus", f"{cpus:g}"])
+    if memory:
+        opts.extend(["--memory", memory])
+    if cpuset_cpus:
+        opts.extend(["--cpuset-cpus", cpuset_cpus])
+    if pids_limit:
+        opts.extend(["--pids-limit", str(pids_limit)])
+
+    if env_file_path and env_file_path.exists():
+        opts.extend(["--env-file", str(env_file_path.resolve())])
+    for key, value in (env or {}).items():
+        opts.extend(["-e", f"{key}={value}"])
+
+    if config_mounts:
+        for host_path, container_path in config_mounts:
+            opts.extend(["-v", f"{host_path}:{container_path}"])
+
+    if workspace_path:
+        source = workspace_volume or workspace_path.resolve()
+        opts.extend(["-v", f"{source}:{container_workdir(workspace_path)}"])
+
+    opts.extend(["-w", container_workdir(workspace_path)])
+    return opts
+
+
+def shell_command(command: list[str] | None, login: bool = True) -> list[str]:
+    """Wrap a command in the login shell used inside the container.
+
+    Without `login`, a command runs directly, with only the environment baked
+    into the image; there is no shell to start without a command.
+    """
+    if command and not login:
+        return list(command)
+    if command:
+        quoted_command = " ".join(shlex.quote(arg) for arg in command)
+        return ["bash", "-l", "-i", "-c", quoted_command]
+    return ["bash", "-l", "-i"]
+
+
+def get_image_id(image: str) -> str | None:
+    """Return the local image ID for `image`, or None if it cannot be resolved."""
+    try:
+        res = subprocess.run(
+            [get_docker_cmd(), "image", "inspect", "--format", "{{.Id}}", image],
+            capture_output=True,
+            text=True,
+            check=False,
+        )
+    except FileNotFoundError, OSError:
+        return None
+    image_id = res.stdout.strip()
+    if res.returncode != 0 or not image_id:
+        return None
+    return image_id
+
+
 def build_docker_command(
     image: str = DEFAULT_IMAGE,
     workspace_path: Path | None = None,
@@ -85,6 +315,15 @@ def build_docker_command(
     network: str | None = None,
     rm: bool = True,
     interactive: bool = True,
+    name: str | None = None,
+    workspace_volume: str | None = None,
+    cpus: float | None = None,
+    memory: str | None = None,
+    cpuset_cpus: str | None = None,
+    pids_limit: int | None = None,
+    labels: dict[str, str] | None = None,
+    env: dict[str, str] | None = None,
+    login_shell: bool = True,
 ) -> list[str]:
     """Build the docker run command line."""
     cmd = [get_docker_cmd(), "run"]
@@ -92,36 +331,49 @@ def build_docker_command(
     if rm:
         cmd.append("--rm")
 
+    if name:
+        cmd.extend(["--name", name])
+
     if interactive:
         cmd.append("-it")
     else:
         cmd.append("-i")
 
-    if network:
-        cmd.extend(["--network", network])
-
-    if env_file_path and env_file_path.exists():
-        cmd.extend(["--env-file", str(env_file_path.resolve())])
-
-    if config_mounts:
-        for host_path, container_path in config_mounts:
-            cmd.extend(["-v", f"{host_path}:{container_path}"])
-
-    if workspace_path:
-        workspace_resolved = workspace_path.resolve()
-        basename = workspace_resolved.name
-        container_workspace = f"/workspace/{basename}"
-        cmd.extend(["-v", f"{workspace_resolved}:{container_workspace}"])
-        cmd.extend(["-w", container_workspace])
-    else:
-        cmd.extend(["-w", "/workspace"])
+    for key, value in (labels or {}).items():
+        cmd.extend(["--label", f"{key}={value}"])
 
+    cmd.extend(
+        docker_run_options(
+            workspace_path=workspace_path,
+            config_mounts=config_mounts,
+            env_file_path=env_file_path,
+            network=network,
+            workspace_volume=workspace_volume,
+            cpus=cpus,
+            memory=memory,
+            cpuset_cpus=cpuset_cpus,
+            pids_limit=pids_limit,
+            env=env,
+        )
+    )
     cmd.append(image)
+    cmd.extend(shell_command(command, login_shell))
+    return cmd
 
-    if command:
-        quoted_command = " ".join(shlex.quote(arg) for arg in command)
-        cmd.extend(["bash", "-l", "-i", "-c", quoted_command])
-    else:
-        cmd.extend(["bash", "-l", "-i"])
 
+def build_exec_command(
+    container: str,
+    command: list[str] | None = None,
+    workdir: str = "/workspace",
+    interactive: bool = True,
+    env: dict[str, str] | None = None,
+    login_shell: bool = True,
+) -> list[str]:
+    """Build the docker exec command line for an already running container."""
+    cmd = [get_docker_cmd(), "exec"]
+    cmd.append("-it" if interactive else "-i")
+    for key, value in (env or {}).items():
+        cmd.extend(["-e", f"{key}={value}"])
+    cmd.extend(["-w", workdir, container])
+    cmd.extend(shell_command(command, login_shell))
     return cmd
@@ -0,0 +1,341 @@
+"""Generate the image Dockerfile from the declarative toolchain manifest.
+
+Every toolchain and agent is installed in its own stage on top of a shared
+`base` stage, so BuildKit builds them concurrently; the final stage merges
+their results with COPY --from.
+
+Each image profile gets a final stage of its own, built with `--target`. A
+profile's extra packages are installed in a `packages-<name>` stage on top
+of its parent profile's, so profiles share every layer below their own.
+"""
+
+import re
+import shlex
+import sys
+import tomllib
+from dataclasses import dataclass, field
+from importlib.resources import files
+from pathlib import Path
+
+from contain_agent.constants import DEFAULT_PROFILE
+from contain_agent.paths import get_state_dir
+
+# Where each agent stage records the version it installed.
+AGENT_VERSIONS_DIR = "/home/agent/.agent-versions"
+
+HEADER = (
+    "# syntax=docker/dockerfile:1\n"
+    "# Generated from toolchains.toml by `python -m contain_agent.dockerfile`;"
+    " do not edit.\n"
+)
+
+
+@dataclass
+class Stage:
+    name: str
+    run: list[str]
+    copy: list[str]
+    parent: str | None = None
+    agent: bool = False
+    version: str | None = None
+    caches: dict[str, str] = field(default_factory=dict)
+
+    @property
+    def stage_name(self) -> str:
+        return f"{'agent' if self.agent else 'toolchain'}-{self.name}"
+
+    @property
+    def cache_bust_arg(self) -> str:
+        return cache_bust_arg(self.name)
+
+    @property
+    def version_file(self) -> str:
+        return f"{AGENT_VERSIONS_DIR}/{self.name}"
+
+
+def cache_bust_arg(agent: str) -> str:
+    """Build arg that invalidates only the given agent's install layer."""
+    return "CACHE_BUST_" + agent.upper().replace("-", "_")
+
+
+@dataclass
+class Profile:
+    name: str
+    packages: list[str] = field(default_factory=list)
+    parent: str | None = None
+    # Toolchains merged into the image; None means all of them.
+    toolchains: list[str] | None = None
+
+    @property
+    def packages_stage(self) -> str:
+        return f"packages-{self.name}"
+
+
+@dataclass
+class Manifest:
+    base_image: str
+    packages: list[str]
+    stages: list[Stage]
+    bashrc: list[str] = field(default_factory=list)
+    path: list[str] = field(default_factory=list)
+    env: dict[str, str] = field(default_factory=dict)
+    profiles: list[Profile] = field(
+        default_factory=lambda: [Profile(name=DEFAULT_PROFILE)]
+    )
+
+    @property
+    def toolchains(self) -> list[Stage]:
+        return [s for s in self.stages if not s.agent]
+
+    @property
+    def agents(self) -> list[Stage]:
+        return [s for s in self.stages if s.agent]
+
+    @property
+    def caches(self) -> dict[str, str]:
+        """Package-manager cache directories of every stage, by cache name."""
+        return {name: path for s in self.stages for name, path in s.caches.items()}
+
+
+def manifest_path() -> Path:
+    return Path(str(files("contain_agent") / "toolchains.toml"))
+
+
+def parse_manifest(text: str) -> Manifest:
+    """Parse toolchains.toml, validating stage names and `from` references."""
+    data = tomllib.loads(text)
+    stages: list[Stage] = []
+    for kind in ("toolchain", "agent"):
+        for entry in data.get(kind, []):
+            stages.append(
+                Stage(
+                    name=entry["name"],
+                    run=list(entry["run"]),
+                    copy=list(entry.get("copy", [])),
+                    parent=entry.get("from"),
+                    agent=kind == "agent",
+                    version=entry.get("version"),
+                    caches=dict(entry.get("caches", {})),
+                )
+            )
+    names = [s.name for s in stages]
+    if len(set(names)) != len(names):
+        raise ValueError("Duplicate stage name in toolchain manifest")
+    for stage in stages:
+        if stage.parent is not None and stage.parent not in names:
+            raise ValueError(f"Stage {stage.name!r} builds on unknown {stage.parent!r}")
+    cache_names = [name for s in stages for name in s.caches]
+    if len(set(cache_names)) != len(cache_names):
+        raise ValueError("Duplicate cache name in toolchain manifest")
+    profiles = [
+        Profile(
+            name=entry["name"],
+            packages=list(entry.get("packages", [])),
+            parent=entry.get("from"),
+            toolchains=entry.get("toolchains"),
+        )
+        for entry in data.get("profile", [])
+    ] or [Profile(name=DEFAULT_PROFILE)]
+    _check_profiles(profiles, [s.name for s in stages if not s.agent])
+    return Manifest(
+        base_image=data["base_image"],
+        packages=list(data["packages"]),
+        stages=stages,
+        bashrc=list(data.get("bashrc", [])),
+        path=list(data.get("path", [])),
+        env=dict(data.get("env", {})),
+        profiles=profiles,
+    )
+
+
+def _check_profiles(profiles: list[Profile], toolchains: list[str]) -> None:
+    names = [p.name for p in profiles]
+    if len(set(names)) != len(names):
+        raise ValueError("Duplicate profile name in toolchain manifest")
+    if DEFAULT_PROFILE not in names:
+        raise ValueError(f"Toolchain manifest has no {DEFAULT_PROFILE!r} profile")
+    for profile in profiles:
+        if not re.fullmatch(r"[a-z][a-z0-9-]*", profile.name):
+            raise ValueError(f"Invalid profile name {profile.name!r}")
+        if profile.parent is not None and profile.parent not in names:
+            raise ValueError(
+                f"Profile {profile.name!r} builds on unknown {profile.parent!r}"
+            )
+        unknown = set(profile.toolchains or []) - set(toolchains)
+        if unknown:
+            raise ValueError(
+                f"Profile {profile.name!r} names unknown toolchain(s): "
+                + ", ".join(sorted(unknown))
+            )
+    # A profile can only build on one declared before it, so there are no cycles.
+    for i, profile in enumerate(profiles):
+        if profile.parent is not None and profile.parent not in names[:i]:
+            raise ValueError(
+                f"Profile {profile.name!r} must be declared after {profile.parent!r}"
+            )
+
+
+def load_manifest(path: Path | None = None) -> Manifest:
+    return parse_manifest((path or manifest_path()).read_text(encoding="utf-8"))
+
+
+def _stage_block(stage: Stage, by_name: dict[str, Stage]) -> list[str]:
+    parent = by_name[stage.parent].stage_name if stage.parent else "base"
+    lines = [f"FROM {parent} AS {stage.stage_name}"]
+    if stage.agent:
+        lines.append(f"ARG {stage.cache_bust_arg}")
+    lines.extend(f"RUN {cmd}" for cmd in stage.run)
+    if stage.version:
+        lines.append(
+            f"RUN mkdir -p {AGENT_VERSIONS_DIR} && "
+            f"({stage.version} || echo unknown) > {stage.version_file}"
+        )
+    return lines
+
+
+def _copies(stage: Stage, stages: list[Stage]) -> list[str]:
+    # A stage built on top of this one already contains (and supersedes) any
+    # path both of them copy, so only the descendant's copy is kept.
+    superseded = {
+        path for child in stages if child.parent == stage.name for path in child.copy
+    }
+    paths = [path for path in stage.copy if path not in superseded]
+    if stage.version:
+        paths.append(stage.version_file)
+    return [
+        f"COPY --from={stage.stage_name} --chown=agent:agent {path} {path}"
+        for path in paths
+    ]
+
+
+def _apt_install(packages: list[str]) -> str:
+    lines = "".join(f"    {pkg} \\\n" for pkg in packages)
+    return (
+        "RUN apt-get update && apt-get install -y \\\n"
+        f"{lines}"
+        "    && rm -rf /var/lib/apt/lists/*\n"
+    )
+
+
+def _profile_base(profile: Profile, by_name: dict[str, Profile]) -> str:
+    """The stage holding every package of `profile`."""
+    current: Profile | None = profile
+    while current is not None:
+        if current.packages:
+            return current.packages_stage
+        current = by_name[current.parent] if current.parent else None
+    return "base"
+
+
+def _packages_block(profile: Profile, by_name: dict[str, Profile]) -> str:
+    parent = (
+        _profile_base(by_name[profile.parent], by_name) if profile.parent else "base"
+    )
+    return (
+        f"FROM {parent} AS {profile.packages_stage}\n"
+        "USER root\n"
+        f"{_apt_install(profile.packages)}"
+        "USER agent\n"
+    )
+
+
+def _final_block(
+    manifest: Manifest, profile: Profile, by_name: dict[str, Profile]
+) -> str:
+    final = [f"FROM {_profile_base(profile, by_name)} AS {profile.name}"]
+    for stage in manifest.toolchains:
+        if profile.toolchains is None or stage.name in profile.toolchains:
+            final.extend(_copies(stage, manifest.stages))
+    if manifest.caches:
+        # Cache volumes are seeded from these, so they start out owned by agent.
+        final.append(f"RUN mkdir -p {' '.join(manifest.caches.values())}")
+    final.append("")
+    final.append("ARG CACHE_BUST")
+    final.append("RUN date > /home/agent/.image-creation-date")
+    final.append("")
+    for stage in manifest.agents:
+        final.extend(_copies(stage, manifest.stages))
+    if manifest.bashrc:
+        final.append("")
+        appends = [
+            f"echo {shlex.quote(line)} >> /home/agent/.bashrc"
+            for line in manifest.bashrc
+        ]
+        final.append("RUN " + " && \\\n    ".join(appends))
+    final.extend(
+        [
+            "",
+            "COPY --chown=agent:agent scripts/bin/* /home/agent/.local/bin/",
+            "RUN chmod +x /home/agent/.local/bin/*",
+            "",
+            f'ENV PATH="{":".join([*manifest.path, "${PATH}"])}"',
+            *(f'ENV {key}="{value}"' for key, value in manifest.env.items()),
+            "",
+            'SHELL ["/bin/bash", "-c"]',
+            "WORKDIR /workspace",
+            'CMD ["/bin/bash"]',
+        ]
+    )
+    return "\n".join(final) + "\n"
+
+
+def render_dockerfile(manifest: Manifest) -> str:
+    """Render the multi-stage Dockerfile for `manifest`.
+
+    The default profile's stage comes last, so a build without `--target`
+    produces it.
+    """
+    by_name = {s.name: s for s in manifest.stages}
+    base = (
+        f"FROM {manifest.base_image} AS base\n"
+        "\n"
+        "ENV DEBIAN_FRONTEND=noninteractive \\\n"
+        "    NODE_ENV=production\n"
+        f"{_apt_install(manifest.packages)}"
+        "\n"
+        "ARG UID=1000\n"
+        "RUN (userdel -r ubuntu || true) && useradd -m -s /bin/bash -u ${UID} agent\n"
+        "\n"
+        "RUN mkdir -p /workspace && chown agent:agent /workspace\n"
+        "\n"
+        "USER agent\n"
+    )
+    blocks = [base]
+    for stage in manifest.stages:
+        blocks.append("\n".join(_stage_block(stage, by_name)) + "\n")
+
+    profiles = {p.name: p for p in manifest.profiles}
+    for profile in manifest.profiles:
+        if profile.packages:
+            blocks.append(_packages_block(profile, profiles))
+    ordered = sorted(manifest.profiles, key=lambda p: p.name == DEFAULT_PROFILE)
+    for profile in ordered:
+        blocks.append(_final_block(manifest, profile, profiles))
+    return HEADER + "\n" + "\n".join(blocks)
+
+
+def generated_dockerfile_path() -> Path:
+    """Where builds read the rendered Dockerfile from."""
+    return get_state_dir() / "build" / "Dockerfile"
+
+
+def write_dockerfile(path: Path, content: str) -> None:
+    """Write a rendered Dockerfile to `path`, unless it already holds `content`."""
+    try:
+        if path.read_text(encoding="utf-8") == content:
+            return
+    except OSError:
+        pass
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(content, encoding="utf-8")
+
+
+def generated_dockerfile(manifest: Manifest | None = None) -> Path:
+    """Write the rendered Dockerfile under ~/.contain-agent/build/ and return it."""
+    path = generated_dockerfile_path()
+    write_dockerfile(path, render_dockerfile(manifest or load_manifest()))
+    return path
+
+
+if __name__ == "__main__":
+    sys.stdout.write(render_dockerfile(load_manifest()))
@@ -0,0 +1,457 @@
+"""Minimal Docker Engine API client speaking HTTP over the daemon socket.
+
+This avoids forking the `docker` CLI for every inspect and run. One
+keep-alive connection is reused for regular requests; attaching to a
+container hijacks a dedicated connection, as the API requires. Images are
+still built with the CLI: the API's classic builder would ignore the
+parallel multi-stage layout and profile targets BuildKit builds.
+"""
+
+import http.client
+import json
+import os
+import select
+import shutil
+import signal
+import socket
+import struct
+import sys
+import urllib.parse
+from collections.abc import Callable, Iterator
+from pathlib import Path
+
+from contain_agent.docker import container_workdir, shell_command
+
+API_VERSION = "v1.41"
+DEFAULT_SOCKET = "/var/run/docker.sock"
+
+
+class EngineError(Exception):
+    """The Engine API returned an error or could not be reached."""
+
+    def __init__(self, message: str, status: int | None = None) -> None:
+        super().__init__(message)
+        self.status = status
+
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    """HTTPConnection that connects to a unix domain socket."""
+
+    def __init__(self, socket_path: str, timeout: float | None = None) -> None:
+        super().__init__("localhost", timeout=timeout)
+        self.socket_path = socket_path
+
+    def connect(self) -> None:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        if self.timeout is not None:
+            sock.settimeout(self.timeout)
+        sock.connect(self.socket_path)
+        self.sock = sock
+
+
+def engine_address(docker_host: str | None = None) -> tuple[str, str, int]:
+    """Parse DOCKER_HOST into ("unix", path, 0) or ("tcp", host, port)."""
+    host = docker_host if docker_host is not None else os.environ.get("DOCKER_HOST")
+    if not host:
+        return ("unix", DEFAULT_SOCKET, 0)
+    parsed = urllib.parse.urlsplit(host)
+    if parsed.scheme == "unix":
+        return ("unix", parsed.path, 0)
+    if parsed.scheme in ("tcp", "http"):
+        if os.environ.get("DOCKER_TLS_VERIFY"):
+            raise EngineError("TLS connections to the Docker daemon are not supported")
+        return ("tcp", parsed.hostname or "localhost", parsed.port or 2375)
+    raise EngineError(f"Unsupported DOCKER_HOST scheme: {parsed.scheme!r}")
+
+
+def parse_env_file(path: Path) -> list[str]:
+    """Parse a docker --env-file into KEY=VALUE entries."""
+    env: list[str] = []
+    for raw in path.read_text(encoding="utf-8").splitlines():
+        line = raw.strip()
+        if not line or line.startswith("#"):
+            continue
+        if "=" in line:
+            env.append(line)
+        elif line in os.environ:
+            env.append(f"{line}={os.environ[line]}")
+    return env
+
+
+def memory_bytes(memory: str) -> int:
+    """Convert a docker --memory value such as "512m" or "4g" to bytes."""
+    units = {"b": 1, "k": 1 << 10, "m": 1 << 20, "g": 1 << 30}
+    value = memory.strip().lower()
+    if value and value[-1] in units:
+        return int(float(value[:-1]) * units[value[-1]])
+    return int(value)
+
+
+def container_config(
+    image: str,
+    workspace_path: Path | None = None,
+    config_mounts: list[tuple[str, str]] | None = None,
+    env_file_path: Path | None = None,
+    command: list[str] | None = None,
+    network: str | None = None,
+    rm: bool = True,
+    interactive: bool = True,
+    workspace_volume: str | None = None,
+    cpus: float | None = None,
+    memory: str | None = None,
+    cpuset_cpus: str | None = None,
+    pids_limit: int | None = None,
+    labels: dict[str, str] | None = None,
+    env: dict[str, str] | None = None,
+    login_shell: bool = True,
+) -> dict:
+    """Create-container JSON equivalent to `build_docker_command` options."""
+    binds = [f"{host}:{container}" for host, container in config_mounts or []]
+    if workspace_path:
+        source = workspace_volume or workspace_path.resolve()
+        binds.append(f"{source}:{container_workdir(workspace_path)}")
+
+    host_config: dict = {"Binds": binds, "AutoRemove": rm}
+    if network:
+        host_config["NetworkMode"] = network
+    if cpus:
+        host_config["NanoCpus"] = int(cpus * 1e9)
+    if memory:
+        host_config["Memory"] = memory_bytes(memory)
+    if cpuset_cpus:
+        host_config["CpusetCpus"] = cpuset_cpus
+    if pids_limit:
+        host_config["PidsLimit"] = pids_limit
+
+    env_list: list[str] = []
+    if env_file_path and env_file_path.exists():
+        env_list = parse_env_file(env_file_path)
+    env_list.extend(f"{key}={value}" for key, value in (env or {}).items())
+
+    return {
+        "Image": image,
+        "Cmd": shell_command(command, login_shell),
+        "WorkingDir": container_workdir(workspace_path),
+        "Env": env_list,
+        "Labels": labels or {},
+        "Tty": interactive,
+        "OpenStdin": True,
+        "StdinOnce": True,
+        "AttachStdin": True,
+        "AttachStdout": True,
+        "AttachStderr": True,
+        "HostConfig": host_config,
+    }
+
+
+class EngineClient:
+    """Docker Engine API client with a single reused keep-alive connection."""
+
+    def __init__(self, docker_host: str | None = None, timeout: float | None = None):
+        self.address = engine_address(docker_host)
+        self.timeout = timeout
+        self._conn: http.client.HTTPConnection | None = None
+
+    def _new_connection(self) -> http.client.HTTPConnection:
+        kind, host, port = self.address
+        if kind == "unix":
+            return UnixHTTPConnection(host, timeout=self.timeout)
+        return http.client.HTTPConnection(host, port, timeout=self.timeout)
+
+    def _new_socket(self) -> socket.socket:
+        kind, host, port = self.address
+        if kind == "unix":
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.connect(host)
+            return sock
+        return socket.create_connection((host, port))
+
+    def close(self) -> None:
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def _url(self, path: str, params: dict | None = None) -> str:
+        url = f"/{API_VERSION}{path}"
+        if params:
+            url += "?" + urllib.parse.urlencode(params)
+        return url
+
+    def _send(
+        self,
+        method: str,
+        path: str,
+        params: dict | None = None,
+        body: object = None,
+        headers: dict[str, str] | None = None,
+    ) -> http.client.HTTPResponse:
+        url = self._url(path, params)
+        hdrs = dict(headers or {})
+        payload = body
+        if isinstance(body, (dict, list)):
+            payload = json.dumps(body).encode()
+            hdrs["Content-Type"] = "application/json"
+        # Retry once on a fresh connection if the daemon dropped the idle one.
+        for attempt in range(2):
+            if self._conn is None:
+                self._conn = self._new_connection()
+            try:
+                self._conn.request(
+                    method,
+                    url,
+                    body=payload,
+                    headers=hdrs,
+                    encode_chunked=isinstance(payload, Iterator),
+                )
+                return self._conn.getresponse()
+            except (ConnectionError, http.client.HTTPException) as e:
+                self.close()
+                if attempt or isinstance(payload, Iterator):
+                    raise EngineError(f"Docker daemon connection failed: {e}") from e
+            except OSError as e:
+                self.close()
+                raise EngineError(f"Cannot connect to the Docker daemon: {e}") from e
+        raise AssertionError("unreachable")
+
+    def request(
+        self,
+        method: str,
+        path: str,
+        params: dict | None = None,
+        body: object = None,
+    ) -> tuple[int, bytes]:
+        """Perform a request and return its status and fully read body."""
+        resp = self._send(method, path, params, body)
+        data = resp.read()
+        if resp.will_close:
+            self.close()
+        return resp.status, data
+
+    def _check(self, status: int, data: bytes) -> None:
+        if status >= 400:
+            try:
+                message = json.loads(data).get("message", "")
+            except ValueError, AttributeError:
+                message = data.decode(errors="replace")
+            raise EngineError(message or f"HTTP {status}", status)
+
+    def ping(self) -> bool:
+        try:
+            status, _ = self.request("GET", "/_ping")
+        except EngineError:
+            return False
+        return status == 200
+
+    def inspect_image(self, name: str) -> dict | None:
+        status, data = self.request("GET", f"/images/{urllib.parse.quote(name)}/json")
+        if status == 404:
+            return None
+        self._check(status, data)
+        return json.loads(data)
+
+    def create_container(self, config: dict, name: str | None = None) -> str:
+        params = {"name": name} if name else None
+        status, data = self.request("POST", "/containers/create", params, config)
+        self._check(status, data)
+        return json.loads(data)["Id"]
+
+    def container_stats(self, container: str) -> dict | None:
+        """One resource usage sample of a container, or None if it does not exist."""
+        params = {"stream": "false", "one-shot": "true"}
+        status, data = self.request(
+            "GET", f"/containers/{urllib.parse.quote(container)}/stats", params
+        )
+        if status == 404:
+            return None
+        self._check(status, data)
+        return json.loads(data)
+
+    def start_container(self, container_id: str) -> None:
+        status, data = self.request("POST", f"/containers/{container_id}/start")
+        if status != 304:
+            self._check(status, data)
+
+    def resize_container(self, container_id: str, rows: int, cols: int) -> None:
+        params = {"h": rows, "w": cols}
+        status, data = self.request(
+            "POST", f"/containers/{container_id}/resize", params
+        )
+        self._check(status, data)
+
+    def begin_wait(
+        self, container_id: str, condition: str = "next-exit"
+    ) -> Callable[[], int]:
+        """Register a wait for the container to exit on a dedicated connection.
+
+        The request is sent before returning, so a container started afterwards
+        cannot exit unobserved. Call the returned function to block for the
+        exit code.
+        """
+        conn = self._new_connection()
+        try:
+            conn.request(
+                "POST",
+                self._url(f"/containers/{container_id}/wait", {"condition": condition}),
+            )
+        except OSError as e:
+            conn.close()
+            raise EngineError(f"Cannot connect to the Docker daemon: {e}") from e
+
+        def result() -> int:
+            try:
+                resp = conn.getresponse()
+                data = resp.read()
+            except (OSError, http.client.HTTPException) as e:
+                raise EngineError(f"Docker daemon connection failed: {e}") from e
+            finally:
+                conn.close()
+            self._check(resp.status, data)
+            return int(json.loads(data).get("StatusCode", 1))
+
+        return result
+
+    def wait_container(self, container_id: str, condition: str = "next-exit") -> int:
+        """Block until the container exits and return its exit code."""
+        return self.begin_wait(container_id, condition)()
+
+    def remove_container(self, container_id: str, force: bool = True) -> None:
+        params = {"force": "1" if force else "0"}
+        status, data = self.request("DELETE", f"/containers/{container_id}", params)
+        if status != 404:
+            self._check(status, data)
+
+    def attach(self, container_id: str) -> tuple[socket.socket, bytes]:
+        """Hijack a connection attached to the container's stdio.
+
+        Returns the raw socket and any stream bytes read past the headers.
+        """
+        sock = self._new_socket()
+        url = self._url(
+            f"/containers/{container_id}/attach",
+            {"stream": 1, "stdin": 1, "stdout": 1, "stderr": 1},
+        )
+        sock.sendall(
+            f"POST {url} HTTP/1.1\r\nHost: docker\r\nContent-Length: 0\r\n"
+            "Connection: Upgrade\r\nUpgrade: tcp\r\n\r\n".encode()
+        )
+        buf = b""
+        while b"\r\n\r\n" not in buf:
+            chunk = sock.recv(4096)
+            if not chunk:
+                sock.close()
+                raise EngineError("Docker daemon closed the attach connection")
+            buf += chunk
+        head, rest = buf.split(b"\r\n\r\n", 1)
+        status = int(head.split(b" ", 2)[1])
+        if status not in (101, 200):
+            sock.close()
+            raise EngineError(f"Attach failed with HTTP {status}", status)
+        return sock, rest
+
+
+def _relay_tty(
+    sock: socket.socket,
+    pending: bytes,
+    on_output: Callable[[], None] | None = None,
+) -> None:
+    """Copy raw bytes between the local terminal and a TTY container stream."""
+    import termios
+    import tty
+
+    stdin_fd, stdout_fd = sys.stdin.fileno(), sys.stdout.fileno()
+
+    def on_data(data: bytes) -> None:
+        if on_output is not None:
+            on_output()
+        os.write(stdout_fd, data)
+
+    if pending:
+        on_data(pending)
+    saved = termios.tcgetattr(stdin_fd)
+    tty.setraw(stdin_fd)
+    try:
+        _pump(sock, stdin_fd, on_data)
+    finally:
+        termios.tcsetattr(stdin_fd, termios.TCSADRAIN, saved)
+
+
+def _relay_multiplexed(
+    sock: socket.socket,
+    pending: bytes,
+    on_output: Callable[[], None] | None = None,
+) -> None:
+    """Demultiplex a non-TTY attach stream into stdout and stderr."""
+    outputs = {1: sys.stdout.fileno(), 2: sys.stderr.fileno()}
+    buf = bytearray(pending)
+
+    def on_data(data: bytes) -> None:
+        buf.extend(data)
+        while len(buf) >= 8:
+            stream, size = struct.unpack(">BxxxL", buf[:8])
+            if len(buf) < 8 + size:
+                break
+            if size and on_output is not None:
+                on_output()
+            os.write(outputs.get(stream, outputs[1]), buf[8 : 8 + size])
+            del buf[: 8 + size]
+
+    on_data(b"")
+    try:
+        stdin_fd: int | None = sys.stdin.fileno()
+    except AttributeError, ValueError, OSError:
+        stdin_fd = None
+    _pump(sock, stdin_fd, on_data)
+
+
+def _pump(sock: socket.socket, stdin_fd: int | None, on_data) -> None:
+    readers = [sock] + ([stdin_fd] if stdin_fd is not None else [])
+    while True:
+        ready, _, _ = select.select(readers, [], [])
+        if sock in ready:
+            data = sock.recv(65536)
+            if not data:
+                return
+            on_data(data)
+        if stdin_fd is not None and stdin_fd in ready:
+            data = os.read(stdin_fd, 65536)
+            if data:
+                sock.sendall(data)
+            else:
+                readers.remove(stdin_fd)
+                try:
+                    sock.shutdown(socket.SHUT_WR)
+                except OSError:
+                    pass
+
+
+def run_container(
+    client: EngineClient,
+    config: dict,
+    name: str | None = None,
+    on_output: Callable[[], None] | None = None,
+) -> int:
+    """Create, attach to, start and wait for a container; return its exit code.
+
+    `on_output` is called whenever output from the container arrives.
+    """
+    container_id = client.create_container(config, name)
+    sock, pending = client.attach(container_id)
+    wait = client.begin_wait(container_id)
+    try:
+        client.start_container(container_id)
+        if config.get("Tty"):
+            size = shutil.get_terminal_size()
+            client.resize_container(container_id, size.lines, size.columns)
+            if hasattr(signal, "SIGWINCH"):
+                signal.signal(
+                    signal.SIGWINCH,
+                    lambda *_: client.resize_container(
+                        container_id, *reversed(shutil.get_terminal_size())
+                    ),
+                )
+            _relay_tty(sock, pending, on_output)
+        else:
+            _relay_multiplexed(sock, pending, on_output)
+    finally:
+        sock.close()
+    return wait()
@@ -0,0 +1,103 @@
+"""Headless runs that report progress as a stream of JSON events.
+
+Each event is one JSON object per line on stdout, flushed as soon as it
+happens:
+
+    {"event": "start", "time": 1760000000.12, "pid": 4242}
+    {"event": "stdout", "time": 1760000001.5, "line": "hello"}
+    {"event": "stderr", "time": 1760000001.6, "line": "warning: ..."}
+    {"event": "exit", "time": 1760000002.0, "exit_code": 0, "duration": 1.88}
+
+`time` is seconds since the epoch and `duration` is measured from `start`.
+Output lines have their trailing newline stripped and are decoded as UTF-8
+with invalid bytes replaced.
+
+`exit` is reported as soon as the process is reaped, once its remaining
+output is drained. A process it left behind may keep the pipes open; its
+output is only awaited for DRAIN_TIMEOUT seconds and dropped after `exit`,
+which is always the last event.
+"""
+
+import json
+import subprocess
+import sys
+import threading
+import time
+from typing import IO, Any
+
+# Exit code reported when docker itself could not be started.
+NOT_FOUND_EXIT = 127
+
+# Seconds to wait for buffered output once the process has exited.
+DRAIN_TIMEOUT = 1.0
+
+
+class EventWriter:
+    """Serialises events from several threads onto one text stream."""
+
+    def __init__(self, out: IO[str] | None = None):
+        self.out = out if out is not None else sys.stdout
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def emit(self, event: str, **fields: Any) -> None:
+        line = json.dumps({"event": event, "time": time.time(), **fields})
+        with self._lock:
+            if self._closed:
+                return
+            self.out.write(line + "\n")
+            self.out.flush()
+
+    def close(self) -> None:
+        """Drop any later events, such as output racing the final `exit`."""
+        with self._lock:
+            self._closed = True
+
+
+def _pump(stream: IO[bytes], name: str, writer: EventWriter) -> None:
+    for raw in iter(stream.readline, b""):
+        writer.emit(name, line=raw.decode("utf-8", "replace").rstrip("\r\n"))
+    stream.close()
+
+
+def stream_events(cmd: list[str], writer: EventWriter | None = None) -> int:
+    """Run `cmd` without a TTY, reporting its lifecycle and output as events.
+
+    Returns the command's exit code.
+    """
+    writer = writer or EventWriter()
+    start = time.monotonic()
+    try:
+        proc = subprocess.Popen(
+            cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, bufsize=0
+        )
+    except OSError as e:
+        writer.emit("error", message=f"cannot start {cmd[0]}: {e}")
+        writer.emit("exit", exit_code=NOT_FOUND_EXIT, duration=0.0)
+        return NOT_FOUND_EXIT
+    writer.emit("start", pid=proc.pid)
+
+    pumps = [
+        threading.Thread(
+            target=_pump, args=(proc.stdout, "stdout", writer), daemon=True
+        ),
+        threading.Thread(
+            target=_pump, args=(proc.stderr, "stderr", writer), daemon=True
+        ),
+    ]
+    for pump in pumps:
+        pump.start()
+    try:
+        exit_code = proc.wait()
+    except KeyboardInterrupt:
+        proc.terminate()
+        exit_code = proc.wait()
+    duration = time.monotonic() - start
+    # Drain whatever output is still buffered before reporting the exit, but
+    # not the output of anything the process left running.
+    deadline = time.monotonic() + DRAIN_TIMEOUT
+    for pump in pumps:
+        pump.join(max(0.0, deadline - time.monotonic()))
+    writer.emit("exit", exit_code=exit_code, duration=duration)
+    writer.close()
+    return exit_code
@@ -0,0 +1,261 @@
+"""Run history in a local SQLite database, with per-container resource usage.
+
+Each recorded run stores its image, workspace, command, exit code and wall
+time in ~/.contain-agent/history.sqlite. While the container runs, a thread
+samples the Engine API stats endpoint. The last sample gives the CPU time
+and block I/O, and the largest memory reading gives the peak. Samples must be
+taken before the container exits, since `--rm` removes it and its cgroup.
+For an exec into a container that already existed (pool, session), CPU and
+I/O are the growth since the first sample.
+
+Usage is approximate: anything after the last sample is missed, and very
+short runs may finish before the first one. Without a reachable Engine API,
+runs are recorded without usage.
+"""
+
+import json
+import math
+import sqlite3
+import sys
+import threading
+import time
+from collections.abc import Callable
+from dataclasses import dataclass
+from pathlib import Path
+
+from contain_agent.engine import EngineClient, EngineError
+
+SAMPLE_INTERVAL = 1.0
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    started REAL NOT NULL,
+    image TEXT NOT NULL,
+    workspace TEXT,
+    command TEXT NOT NULL,
+    exit_code INTEGER,
+    wall_seconds REAL NOT NULL,
+    cpu_seconds REAL,
+    peak_memory INTEGER,
+    read_bytes INTEGER,
+    write_bytes INTEGER
+)
+"""
+
+# What `stats` can group runs by; commands are grouped by their program.
+GROUP_COLUMNS = {
+    "command": "program(command)",
+    "workspace": "workspace",
+    "image": "image",
+}
+
+
+def history_path(state_dir: Path) -> Path:
+    return state_dir / "history.sqlite"
+
+
+@dataclass
+class Usage:
+    cpu_seconds: float | None = None
+    peak_memory: int | None = None
+    read_bytes: int | None = None
+    write_bytes: int | None = None
+
+
+def usage_from_stats(stats: dict) -> Usage:
+    """Cumulative usage in one Engine API stats sample."""
+    cpu = stats.get("cpu_stats", {}).get("cpu_usage", {}).get("total_usage")
+    memory = stats.get("memory_stats", {})
+    read = write = 0
+    # cgroup v1 reports "Read"/"Write", v2 "read"/"write".
+    for entry in stats.get("blkio_stats", {}).get("io_service_bytes_recursive") or []:
+        op = entry.get("op", "").lower()
+        if op == "read":
+            read += entry.get("value", 0)
+        elif op == "write":
+            write += entry.get("value", 0)
+    return Usage(
+        cpu_seconds=cpu / 1e9 if cpu is not None else None,
+        peak_memory=memory.get("max_usage") or memory.get("usage"),
+        read_bytes=read,
+        write_bytes=write,
+    )
+
+
+class UsageSampler:
+    """Samples a container's stats in a background thread until stopped."""
+
+    def __init__(self, container: str, existing: bool = False) -> None:
+        self.container = container
+        self.existing = existing
+        self._first: Usage | None = None
+        self._last: Usage | None = None
+        self._peak: int | None = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def _run(self) -> None:
+        try:
+            client = EngineClient(timeout=5)
+        except EngineError:
+            return
+        # Poll quickly until the container exists, then once per interval.
+        delay = 0.1
+        while not self._stop.is_set():
+            try:
+                stats = client.container_stats(self.container)
+            except EngineError:
+                break
+            if stats is not None and stats.get("read", "").startswith("0001"):
+                stats = None  # a stopped container's all-zero sample
+            if stats is not None:
+                usage = usage_from_stats(stats)
+                self._first = self._first or usage
+                self._last = usage
+                if usage.peak_memory is not None:
+                    self._peak = max(self._peak or 0, usage.peak_memory)
+                delay = SAMPLE_INTERVAL
+            self._stop.wait(delay)
+        client.close()
+
+    def stop(self) -> Usage:
+        self._stop.set()
+        self._thread.join(timeout=SAMPLE_INTERVAL + 5)
+        if self._last is None:
+            return Usage()
+        usage = Usage(
+            cpu_seconds=self._last.cpu_seconds,
+            peak_memory=self._peak,
+            read_bytes=self._last.read_bytes,
+            write_bytes=self._last.write_bytes,
+        )
+        if self.existing and self._first is not None:
+            for name in ("cpu_seconds", "read_bytes", "write_bytes"):
+                before, after = getattr(self._first, name), getattr(usage, name)
+                if before is not None and after is not None:
+                    setattr(usage, name, after - before)
+        return usage
+
+
+def _connect(db_path: Path) -> sqlite3.Connection:
+    db_path.parent.mkdir(parents=True, exist_ok=True)
+    db = sqlite3.connect(db_path, timeout=10)
+    db.execute(SCHEMA)
+    return db
+
+
+@dataclass
+class RunInfo:
+    """What is recorded about a run besides its outcome and usage."""
+
+    db_path: Path
+    image: str
+    workspace: Path | None
+    command: list[str]
+
+
+def record_run(
+    info: RunInfo,
+    started: float,
+    exit_code: int | None,
+    wall_seconds: float,
+    usage: Usage,
+) -> None:
+    with _connect(info.db_path) as db:
+        db.execute(
+            "INSERT INTO runs (started, image, workspace, command, exit_code,"
+            " wall_seconds, cpu_seconds, peak_memory, read_bytes, write_bytes)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                started,
+                info.image,
+                str(info.workspace) if info.workspace else None,
+                json.dumps(info.command),
+                exit_code,
+                wall_seconds,
+                usage.cpu_seconds,
+                usage.peak_memory,
+                usage.read_bytes,
+                usage.write_bytes,
+            ),
+        )
+    db.close()
+
+
+def tracked_run(
+    info: RunInfo | None,
+    container: str,
+    run: Callable[[], int],
+    existing: bool = False,
+) -> int:
+    """Call `run`, recording it and the usage of `container` unless `info` is None.
+
+    `existing` marks a container that was running before, whose cumulative
+    counters must be measured from the first sample.
+    """
+    if info is None:
+        return run()
+    sampler = UsageSampler(container, existing)
+    sampler.start()
+    started = time.time()
+    begin = time.monotonic()
+    exit_code = None
+    try:
+        exit_code = run()
+        return exit_code
+    finally:
+        wall = time.monotonic() - begin
+        try:
+            record_run(info, started, exit_code, wall, sampler.stop())
+        except (sqlite3.Error, OSError) as e:
+            print(f"Warning: cannot record run history: {e}", file=sys.stderr)
+
+
+def _percentile(ordered: list[float], pct: float) -> float:
+    """Nearest-rank percentile of a sorted, non-empty list."""
+    return ordered[max(0, math.ceil(pct / 100 * len(ordered)) - 1)]
+
+
+def query_stats(
+    db_path: Path, group_by: list[str], since: float | None = None
+) -> list[dict]:
+    """Per-group run counts, failures, wall-time percentiles and usage."""
+    if not db_path.exists():
+        return []
+    db = _connect(db_path)
+    db.create_function(
+        "program", 1, lambda command: (json.loads(command) or ["(shell)"])[0]
+    )
+    columns = [GROUP_COLUMNS[key] for key in group_by]
+    rows = db.execute(
+        f"SELECT {', '.join(columns)}, exit_code, wall_seconds, cpu_seconds,"
+        " peak_memory FROM runs WHERE started >= ? ORDER BY wall_seconds",
+        (since or 0,),
+    ).fetchall()
+    db.close()
+
+    groups: dict[tuple, list[tuple]] = {}
+    for row in rows:
+        groups.setdefault(row[: len(group_by)], []).append(row[len(group_by) :])
+    result = []
+    for key, runs in sorted(groups.items(), key=lambda item: -len(item[1])):
+        walls = [wall for _, wall, _, _ in runs]
+        cpus = [cpu for _, _, cpu, _ in runs if cpu is not None]
+        peaks = [peak for _, _, _, peak in runs if peak is not None]
+        result.append(
+            {
+                **dict(zip(group_by, key, strict=True)),
+                "runs": len(runs),
+                "failed": sum(1 for code, _, _, _ in runs if code != 0),
+                "p50": _percentile(walls, 50),
+                "p90": _percentile(walls, 90),
+                "p99": _percentile(walls, 99),
+                "mean_cpu": sum(cpus) / len(cpus) if cpus else None,
+                "max_memory": max(peaks) if peaks else None,
+            }
+        )
+    return result
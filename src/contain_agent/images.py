@@ -0,0 +1,86 @@
+"""Local cache mapping content-addressed image tags to image IDs.
+
+The cache lives in ~/.contain-agent/images.json. A hit means the image built
+from the current Dockerfile and scripts exists, so `run` needs no docker call.
+Its stat signature is part of every launch plan, so recording a new build
+invalidates cached plans.
+"""
+
+import json
+import os
+import subprocess
+from pathlib import Path
+
+from contain_agent.docker import get_docker_cmd
+from contain_agent.dockerfile import AGENT_VERSIONS_DIR
+from contain_agent.paths import get_state_dir
+
+
+def image_cache_path() -> Path:
+    return get_state_dir() / "images.json"
+
+
+def load_image_cache() -> dict[str, str]:
+    """Load the image tag -> image ID mapping."""
+    try:
+        data = json.loads(image_cache_path().read_text(encoding="utf-8"))
+    except json.JSONDecodeError, OSError:
+        return {}
+    return data if isinstance(data, dict) else {}
+
+
+def _write_json(path: Path, data: dict) -> None:
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        tmp.write_text(json.dumps(data, indent=2), encoding="utf-8")
+        os.replace(tmp, path)
+    except OSError:
+        pass
+
+
+def record_image_id(image: str, image_id: str) -> None:
+    """Remember the ID `image` resolved to, rewriting the record only on change."""
+    cache = load_image_cache()
+    if cache.get(image) == image_id:
+        return
+    cache[image] = image_id
+    _write_json(image_cache_path(), cache)
+
+
+def read_agent_versions(image: str) -> dict[str, str]:
+    """Read the versions each agent layer recorded in `image`."""
+    script = (
+        f'for f in {AGENT_VERSIONS_DIR}/*; do [ -f "$f" ] && '
+        'printf "%s\\t%s\\n" "${f##*/}" "$(head -n 1 "$f")"; done'
+    )
+    try:
+        res = subprocess.run(
+            [get_docker_cmd(), "run", "--rm", image, "sh", "-c", script],
+            capture_output=True,
+            text=True,
+            check=False,
+        )
+    except OSError:
+        return {}
+    versions: dict[str, str] = {}
+    for line in res.stdout.splitlines():
+        agent, sep, version = line.partition("\t")
+        if sep:
+            versions[agent] = version.strip()
+    return versions
+
+
+def record_agent_versions(image: str, versions: dict[str, str]) -> dict[str, str]:
+    """Store the agent versions of the latest `image` build; return the previous ones."""
+    path = get_state_dir() / "agent-versions.json"
+    try:
+        data = json.loads(path.read_text(encoding="utf-8"))
+    except json.JSONDecodeError, OSError:
+        data = {}
+    previous = data.get(image, {})
+    if not versions:
+        return previous
+    data[image] = versions
+    _write_json(path, data)
+    return previous
@@ -0,0 +1,142 @@
+"""Fast launcher that execs a cached docker command line.
+
+A launch plan is the fully resolved docker argv for one invocation, stored
+under ~/.contain-agent/plans/ and keyed by the raw CLI arguments, the working
+directory, the contain-agent environment and whether stdin is a TTY. The plan
+also records the stat signature of every file that influenced it (settings,
+env file, agent configs, the local image record). When all of those still
+match, the launcher execs docker directly without importing typer, pydantic
+or the rest of the package; otherwise it falls back to the full `cli.run`
+path, which records a fresh plan.
+
+This module must stay stdlib-only and cheap to import.
+"""
+
+import hashlib
+import json
+import os
+import sys
+import time
+
+# When the package was first imported; the baseline for `--timings`.
+STARTED = time.monotonic()
+
+PLAN_VERSION = 1
+
+# Set by main() so `cli.run` knows which plan to record for this invocation.
+active_key: str | None = None
+
+
+def plans_dir() -> str:
+    return os.path.join(os.path.expanduser("~"), ".contain-agent", "plans")
+
+
+def plan_key(argv: list[str], cwd: str, interactive: bool) -> str:
+    """Hash everything outside the filesystem that shapes the docker argv."""
+    env = sorted(
+        (k, v)
+        for k, v in os.environ.items()
+        if k.startswith("CONTAIN_AGENT_") or k == "HOME"
+    )
+    payload = json.dumps([PLAN_VERSION, argv, cwd, env, interactive])
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def stamp(path: str) -> list[int] | None:
+    """Cheap change signature for a path, or None if it does not exist."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return [st.st_mtime_ns, st.st_size, st.st_ino]
+
+
+def load_plan(key: str) -> list[str] | None:
+    """Return the cached docker argv for `key` if none of its inputs changed."""
+    try:
+        with open(os.path.join(plans_dir(), f"{key}.json"), encoding="utf-8") as f:
+            plan = json.load(f)
+    except OSError, ValueError:
+        return None
+    if plan.get("version") != PLAN_VERSION:
+        return None
+    expires = plan.get("expires")
+    if expires is not None and time.time() >= expires:
+        return None
+    for path, expected in plan.get("stamps", {}).items():
+        if stamp(path) != expected:
+            return None
+    return plan.get("argv") or None
+
+
+def save_plan(
+    key: str,
+    argv: list[str],
+    paths: list[str],
+    image_id: str,
+    expires: float | None = None,
+) -> None:
+    """Record the docker argv for `key` along with the stats of its inputs.
+
+    A plan with `expires` is ignored from that time on, so the full path runs
+    again, for instance to refresh a stale image.
+    """
+    plan = {
+        "version": PLAN_VERSION,
+        "argv": argv,
+        "image_id": image_id,
+        "expires": expires,
+        "stamps": {path: stamp(path) for path in paths},
+    }
+    directory = plans_dir()
+    try:
+        os.makedirs(directory, exist_ok=True)
+        tmp = os.path.join(directory, f"{key}.{os.getpid()}.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(plan, f)
+        os.replace(tmp, os.path.join(directory, f"{key}.json"))
+    except OSError:
+        pass
+
+
+def _log_plan_timing() -> None:
+    """Append a timings line for a cached launch when timings go to a file."""
+    target = os.environ.get("CONTAIN_AGENT_TIMINGS")
+    if not target or target in ("0", "1"):
+        return
+    took = round((time.monotonic() - STARTED) * 1000, 3)
+    line = {
+        "time": time.time(),
+        "argv": sys.argv[1:],
+        "total_ms": took,
+        "phases": [{"name": "plan", "start_ms": 0.0, "ms": took}],
+        "markers": {},
+    }
+    try:
+        with open(os.path.expanduser(target), "a", encoding="utf-8") as f:
+            f.write(json.dumps(line) + "\n")
+    except OSError:
+        pass
+
+
+def main() -> None:
+    global active_key
+
+    if not os.environ.get("CONTAIN_AGENT_NO_PLAN_CACHE"):
+        try:
+            cwd = os.getcwd()
+        except OSError:
+            cwd = None
+        if cwd is not None:
+            active_key = plan_key(sys.argv[1:], cwd, sys.stdin.isatty())
+            argv = load_plan(active_key)
+            if argv:
+                _log_plan_timing()
+                try:
+                    os.execvp(argv[0], argv)
+                except OSError:
+                    pass
+
+    from contain_agent.cli import app
+
+    app()
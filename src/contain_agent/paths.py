@@ -19,6 +19,14 @@ def is_sensitive_directory(path: Path) -> bool:
     return False
 
 
+def config_candidates(share_config: bool, dotfiles_dir: Path) -> list[Path]:
+    """Paths whose presence or contents determine the result of get_config_mounts."""
+    if share_config:
+        home = Path.home()
+        return [home / name for name in KNOWN_CONFIG_NAMES]
+    return [dotfiles_dir]
+
+
 def get_config_mounts(share_config: bool, dotfiles_dir: Path) -> list[tuple[str, str]]:
     """Determine volume mounts for agent configuration / dotfiles."""
     mounts: list[tuple[str, str]] = []
@@ -35,3 +43,8 @@ def get_config_mounts(share_config: bool, dotfiles_dir: Path) -> list[tuple[str,
                 mounts.append((str(item.resolve()), f"/home/agent/{item.name}"))
 
     return mounts
+
+
+def get_state_dir() -> Path:
+    """Directory holding contain-agent settings and local state (~/.contain-agent)."""
+    return Path.home() / ".contain-agent"
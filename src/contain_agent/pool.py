@@ -0,0 +1,292 @@
+"""Warm pool of pre-started idle containers that `run` can exec commands into.
+
+Pool state lives under ~/.contain-agent/pool/<signature>/, one file per
+container named ``<container>.<state>`` where state is ``starting``, ``idle``
+or ``busy``. Claiming a container is an atomic rename from ``idle`` to
+``busy``, so concurrent invocations never share one. A busy entry records
+the pid of the process using it; while it is claimed or released the entry
+briefly has no pid, so such an entry only counts as abandoned once it is
+older than STARTING_TIMEOUT.
+"""
+
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import time
+import uuid
+from dataclasses import dataclass
+from pathlib import Path
+
+from contain_agent.docker import get_docker_cmd
+
+POOL_LABEL = "contain-agent.pool"
+
+# A container still "starting" after this long is assumed to have failed.
+STARTING_TIMEOUT = 300
+
+
+@dataclass
+class PoolConfig:
+    size: int = 2
+    max_uses: int = 10
+    max_age: int = 3600
+    idle_timeout: int = 600
+
+
+def pool_signature(image: str, run_options: list[str]) -> str:
+    """Hash the image and container options that pooled containers must share."""
+    payload = [image, *run_options]
+    for i, opt in enumerate(run_options[:-1]):
+        if opt == "--env-file":
+            # Edits to the env file must rotate the pool, not just renames.
+            try:
+                payload.append(str(Path(run_options[i + 1]).stat().st_mtime_ns))
+            except OSError:
+                pass
+    return hashlib.sha256(json.dumps(payload).encode()).hexdigest()[:16]
+
+
+def _pid_alive(pid: int) -> bool:
+    # Signalling pid 0 (or a negative pid) targets a whole process group.
+    if pid <= 0:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class Pool:
+    """Pre-started containers sharing one image/network/mount signature."""
+
+    def __init__(
+        self,
+        state_dir: Path,
+        image: str,
+        run_options: list[str],
+        config: PoolConfig,
+    ) -> None:
+        self.image = image
+        self.run_options = run_options
+        self.config = config
+        self.signature = pool_signature(image, run_options)
+        self.dir = state_dir / "pool" / self.signature
+
+    def _entries(self, state: str) -> list[Path]:
+        try:
+            return sorted(
+                self.dir.glob(f"*.{state}"),
+                key=lambda p: p.stat().st_mtime,
+                reverse=True,
+            )
+        except OSError:
+            return []
+
+    def _read(self, path: Path) -> dict:
+        try:
+            return json.loads(path.read_text(encoding="utf-8"))
+        except json.JSONDecodeError, OSError:
+            return {}
+
+    def _write(self, path: Path, info: dict) -> None:
+        tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        tmp.write_text(json.dumps(info), encoding="utf-8")
+        os.replace(tmp, path)
+
+    def _remove_container(self, name: str) -> None:
+        try:
+            subprocess.Popen(
+                [get_docker_cmd(), "rm", "-f", name],
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+                start_new_session=True,
+            )
+        except OSError:
+            pass
+
+    def _running_containers(self) -> set[str] | None:
+        try:
+            res = subprocess.run(
+                [
+                    get_docker_cmd(),
+                    "ps",
+                    "--filter",
+                    f"label={POOL_LABEL}={self.signature}",
+                    "--format",
+                    "{{.Names}}",
+                ],
+                capture_output=True,
+                text=True,
+                check=False,
+            )
+        except OSError:
+            return None
+        if res.returncode != 0:
+            return None
+        return set(res.stdout.split())
+
+    def _expired(self, info: dict, now: float) -> bool:
+        if info.get("uses", 0) >= self.config.max_uses:
+            return True
+        return now - info.get("created", 0) >= self.config.max_age
+
+    def reap(self) -> None:
+        """Drop dead, expired, long-idle, orphaned and surplus pool entries."""
+        now = time.time()
+        running = self._running_containers()
+
+        for path in self._entries("busy"):
+            pid = self._read(path).get("pid", 0)
+            if pid:
+                abandoned = not _pid_alive(pid)
+            else:
+                try:
+                    abandoned = now - path.stat().st_mtime > STARTING_TIMEOUT
+                except OSError:
+                    continue
+            if abandoned:
+                path.unlink(missing_ok=True)
+                self._remove_container(path.stem)
+
+        for path in self._entries("starting"):
+            try:
+                if now - path.stat().st_mtime > STARTING_TIMEOUT:
+                    path.unlink(missing_ok=True)
+                    self._remove_container(path.stem)
+            except OSError:
+                continue
+
+        for i, path in enumerate(self._entries("idle")):
+            name = path.stem
+            if running is not None and name not in running:
+                path.unlink(missing_ok=True)
+                continue
+            info = self._read(path)
+            try:
+                idle_for = now - path.stat().st_mtime
+            except OSError:
+                continue
+            if (
+                i >= self.config.size
+                or self._expired(info, now)
+                or idle_for >= self.config.idle_timeout
+            ):
+                try:
+                    path.rename(path.with_suffix(".reaped"))
+                except OSError:
+                    continue
+                path.with_suffix(".reaped").unlink(missing_ok=True)
+                self._remove_container(name)
+
+    def claim(self) -> str | None:
+        """Take an idle container for exclusive use, returning its name."""
+        for path in self._entries("idle"):
+            busy = path.with_suffix(".busy")
+            try:
+                # A rename keeps the idle entry's age, which would make the busy
+                # entry look abandoned until its pid is written.
+                os.utime(path)
+                path.rename(busy)
+            except OSError:
+                continue
+            info = self._read(busy)
+            info["pid"] = os.getpid()
+            self._write(busy, info)
+            return path.stem
+        return None
+
+    def release(self, name: str) -> None:
+        """Return a claimed container to the pool, or recycle it if it is used up."""
+        busy = self.dir / f"{name}.busy"
+        info = self._read(busy)
+        info["uses"] = info.get("uses", 0) + 1
+        info.pop("pid", None)
+        if (
+            self._expired(info, time.time())
+            or len(self._entries("idle")) >= self.config.size
+        ):
+            busy.unlink(missing_ok=True)
+            self._remove_container(name)
+            return
+        self._write(busy, info)
+        try:
+            os.replace(busy, self.dir / f"{name}.idle")
+        except FileNotFoundError:
+            # Reaped meanwhile, together with its container.
+            pass
+
+    def start_command(self, name: str) -> list[str]:
+        """Build the docker run command for a new idle pool container."""
+        return [
+            get_docker_cmd(),
+            "run",
+            "-d",
+            "--rm",
+            "--name",
+            name,
+            "--label",
+            f"{POOL_LABEL}={self.signature}",
+            *self.run_options,
+            self.image,
+            "sleep",
+            "infinity",
+        ]
+
+    def replenish(self) -> None:
+        """Start idle containers in the background until the pool is full."""
+        missing = self.config.size - len(self._entries("idle"))
+        missing -= len(self._entries("starting"))
+        if missing <= 0:
+            return
+        self.dir.mkdir(parents=True, exist_ok=True)
+        for _ in range(missing):
+            name = f"contain-agent-pool-{self.signature[:8]}-{uuid.uuid4().hex[:8]}"
+            marker = self.dir / f"{name}.starting"
+            self._write(marker, {"created": time.time(), "uses": 0})
+            try:
+                subprocess.Popen(
+                    [
+                        sys.executable,
+                        "-m",
+                        "contain_agent.pool",
+                        str(marker),
+                        *self.start_command(name),
+                    ],
+                    stdin=subprocess.DEVNULL,
+                    stdout=subprocess.DEVNULL,
+                    stderr=subprocess.DEVNULL,
+                    start_new_session=True,
+                )
+            except OSError:
+                marker.unlink(missing_ok=True)
+
+
+def _start_pooled_container(marker: Path, docker_cmd: list[str]) -> int:
+    """Run `docker run -d` for a pool container and publish it as idle on success."""
+    try:
+        res = subprocess.run(docker_cmd, capture_output=True, check=False)
+    except OSError:
+        marker.unlink(missing_ok=True)
+        return 1
+    if res.returncode != 0:
+        marker.unlink(missing_ok=True)
+        return res.returncode
+    try:
+        os.replace(marker, marker.with_suffix(".idle"))
+    except FileNotFoundError:
+        # Reaped while starting; don't leak the container.
+        subprocess.run(
+            [get_docker_cmd(), "rm", "-f", marker.stem],
+            capture_output=True,
+            check=False,
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(_start_pooled_container(Path(sys.argv[1]), sys.argv[2:]))
@@ -0,0 +1,278 @@
+"""Background image builds, so that launches never wait for one.
+
+When the image's build inputs change, `run` keeps using the last good image
+(the plain image name, which every build also tags) and builds the new
+content-addressed tag in a detached process. Images older than the configured
+maximum age are rebuilt the same way, with fresh agent layers. A build goes to
+a temporary tag and is retagged only once it succeeded, so the last good
+image is never replaced by a broken one.
+
+State lives under ~/.contain-agent/prewarm/: a stamp per image recording when
+it was last built, one recording when a build of it last failed (background
+builds are not retried until RETRY_AFTER seconds later), the log of the last
+background build, and a lock held
+around every build of the image, foreground or background, so concurrent
+launches never build it twice: one builds while the others wait and reuse
+the result. The lock is a flock, which the kernel releases when its holder
+exits, so a builder that dies never leaves it stale.
+
+    python -m contain_agent.prewarm IMAGE [--fresh] [--profile NAME]
+        [--cache-dir PATH [--cache-max-mb N]]
+"""
+
+import argparse
+import fcntl
+import os
+import re
+import subprocess
+import sys
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from pathlib import Path
+
+from contain_agent.buildcache import (
+    BuildCache,
+    BuildCacheError,
+    finish_export,
+    prepare_export,
+    use_build_cache,
+)
+from contain_agent.docker import (
+    BuildSpec,
+    build_spec_command,
+    content_image_tag,
+    get_docker_cmd,
+    get_image_id,
+    image_build_spec,
+    profile_image,
+    write_build_files,
+)
+from contain_agent.images import record_image_id
+from contain_agent.paths import get_state_dir
+
+# Seconds after a failed build before a launch starts another in the background.
+RETRY_AFTER = 3600
+
+
+class BuildInProgress(Exception):
+    """Another process holds the build lock of the image."""
+
+
+def _state_path(state_dir: Path, image: str, suffix: str) -> Path:
+    name = re.sub(r"[^a-zA-Z0-9_.-]", "-", image)
+    return state_dir / "prewarm" / f"{name}.{suffix}"
+
+
+@contextmanager
+def build_lock(state_dir: Path, image: str, wait: bool = True) -> Iterator[bool]:
+    """Hold the host-wide lock on building `image`.
+
+    Yields whether another process held the lock first, in which case it may
+    have built the image meanwhile. Without `wait`, raises BuildInProgress
+    instead of waiting for it.
+    """
+    lock_path = _state_path(state_dir, image, "lock")
+    lock_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(lock_path, "a+") as lock:
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            waited = False
+        except BlockingIOError:
+            if not wait:
+                raise BuildInProgress(image)
+            lock.seek(0)
+            holder = lock.read().strip()
+            by = f" by process {holder}" if holder.isdigit() else ""
+            print(
+                f"Waiting for another build of '{image}'{by} to finish...",
+                file=sys.stderr,
+            )
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            waited = True
+        lock.seek(0)
+        lock.truncate()
+        lock.write(str(os.getpid()))
+        lock.flush()
+        try:
+            yield waited
+        finally:
+            lock.truncate(0)
+
+
+def _touch(stamp: Path, now: float | None) -> None:
+    now = time.time() if now is None else now
+    try:
+        stamp.parent.mkdir(parents=True, exist_ok=True)
+        stamp.touch()
+        os.utime(stamp, (now, now))
+    except OSError:
+        pass
+
+
+def mark_built(state_dir: Path, image: str, now: float | None = None) -> None:
+    """Record that `image` was just built, clearing any earlier failure."""
+    _touch(_state_path(state_dir, image, "built"), now)
+    _state_path(state_dir, image, "failed").unlink(missing_ok=True)
+
+
+def mark_failed(state_dir: Path, image: str, now: float | None = None) -> None:
+    """Record that a build of `image` just failed."""
+    _touch(_state_path(state_dir, image, "failed"), now)
+
+
+def retry_at(state_dir: Path, image: str) -> float | None:
+    """When a background build of `image` may start again after a failed one.
+
+    None if its last build did not fail.
+    """
+    try:
+        return _state_path(state_dir, image, "failed").stat().st_mtime + RETRY_AFTER
+    except OSError:
+        return None
+
+
+def refresh_at(state_dir: Path, image: str, max_age: int) -> float | None:
+    """When `image` becomes due for a refresh, or None if never.
+
+    An image with no build recorded starts its clock now rather than being
+    rebuilt straight away.
+    """
+    if max_age <= 0:
+        return None
+    stamp = _state_path(state_dir, image, "built")
+    try:
+        return stamp.stat().st_mtime + max_age
+    except FileNotFoundError:
+        mark_built(state_dir, image)
+    except OSError:
+        return None
+    # Read the new stamp back, so later calls give the very same answer.
+    try:
+        return stamp.stat().st_mtime + max_age
+    except OSError:
+        return time.time() + max_age
+
+
+def schedule_prewarm(
+    image: str,
+    fresh: bool = False,
+    profile: str | None = None,
+    build_cache: BuildCache | None = None,
+) -> None:
+    """Build `image` in a detached process, logging to the prewarm directory."""
+    log_path = _state_path(get_state_dir(), profile_image(image, profile), "log")
+    cmd = [sys.executable, "-m", "contain_agent.prewarm", image]
+    if fresh:
+        cmd.append("--fresh")
+    if profile:
+        cmd.extend(["--profile", profile])
+    if build_cache is not None:
+        cmd.extend(["--cache-dir", str(build_cache.root)])
+        cmd.extend(["--cache-max-mb", str(build_cache.max_mb)])
+    try:
+        log_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(log_path, "ab") as log:
+            subprocess.Popen(
+                cmd,
+                stdin=subprocess.DEVNULL,
+                stdout=log,
+                stderr=subprocess.STDOUT,
+                start_new_session=True,
+            )
+    except OSError:
+        pass
+
+
+def _docker(*args: str) -> int:
+    return subprocess.run([get_docker_cmd(), *args], check=False).returncode
+
+
+def prewarm_image(
+    image: str,
+    fresh: bool = False,
+    profile: str | None = None,
+    build_cache: BuildCache | None = None,
+) -> int:
+    """Build `image` (or its `profile`) under a temporary tag and retag it on success.
+
+    Returns the docker exit status; 0 without building when another build
+    of the same image is already running. With a `build_cache`, the build
+    imports and exports its layer cache there. A failure is recorded, so that
+    launches back off from building the image again.
+    """
+    state_dir = get_state_dir()
+    spec = image_build_spec(image, fresh_rebuild=fresh, profile=profile)
+    image = profile_image(image, profile)
+    if build_cache is not None:
+        use_build_cache(spec, build_cache, image)
+    try:
+        with build_lock(state_dir, image, wait=False):
+            if build_cache is None:
+                status = _prewarm(spec, image, state_dir)
+            else:
+                try:
+                    prepare_export(build_cache, image)
+                except BuildCacheError as e:
+                    print(f"Cannot export the build cache: {e}", file=sys.stderr)
+                    status = 1
+                else:
+                    status = _prewarm(spec, image, state_dir)
+                    finish_export(build_cache, image, ok=status == 0)
+    except BuildInProgress:
+        print(f"A build of '{image}' is already running.", file=sys.stderr)
+        return 0
+    if status != 0:
+        mark_failed(state_dir, image)
+    return status
+
+
+def _prewarm(spec: BuildSpec, image: str, state_dir: Path) -> int:
+    final_tags = spec.tags
+    repo = image.rsplit(":", 1)[0] if ":" in image.rsplit("/", 1)[-1] else image
+    spec.tags = [f"{repo}:prewarm-{os.getpid()}"]
+    try:
+        write_build_files(spec)
+    except OSError as e:
+        print(f"Cannot write the Dockerfile: {e}", file=sys.stderr)
+        return 1
+    status = subprocess.run(build_spec_command(spec), check=False).returncode
+    if status == 0:
+        for tag in final_tags:
+            status = status or _docker("tag", spec.tags[0], tag)
+    # Only untags: the image itself is kept by its final tags.
+    _docker("rmi", spec.tags[0])
+    if status != 0:
+        return status
+
+    image_ref = content_image_tag(image)
+    image_id = get_image_id(image_ref)
+    if image_id:
+        record_image_id(image_ref, image_id)
+        record_image_id(image, image_id)
+    mark_built(state_dir, image)
+    return 0
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m contain_agent.prewarm")
+    parser.add_argument("image")
+    parser.add_argument(
+        "--fresh", action="store_true", help="Rebuild the agent layers too"
+    )
+    parser.add_argument("--profile", help="Image profile to build")
+    parser.add_argument("--cache-dir", type=Path, help="Layer cache directory")
+    parser.add_argument("--cache-max-mb", type=int, default=0)
+    args = parser.parse_args(argv)
+    name = profile_image(args.image, args.profile)
+    print(f"[{time.strftime('%Y-%m-%d %H:%M:%S')}] building {name}", flush=True)
+    build_cache = (
+        BuildCache(args.cache_dir, args.cache_max_mb) if args.cache_dir else None
+    )
+    return prewarm_image(
+        args.image, fresh=args.fresh, profile=args.profile, build_cache=build_cache
+    )
+
+
+if __name__ == "__main__":
+    sys.exit(main())
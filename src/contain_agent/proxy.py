@@ -0,0 +1,168 @@
+"""Shared caching proxy sidecar for package and toolchain downloads.
+
+With `--cache-proxy`, one long-lived container, contain-agent-cache-proxy,
+runs proxy_server.py on the contain-agent network, storing downloaded
+artifacts in the contain-agent-cache-proxy volume. Runs join that network
+(or the proxy joins theirs, given `--network`) and get environment variables
+pointing pip, uv, npm and bun at it; cargo, which has no environment
+variable for a registry mirror, gets a mounted config file instead.
+
+The sidecar is labelled with a hash of its image, size budget and server
+code, and is recreated when any of them changes; its cache volume is kept.
+"""
+
+import hashlib
+import subprocess
+from importlib.resources import files
+from pathlib import Path
+
+from contain_agent.docker import get_docker_cmd
+
+PROXY_CONTAINER = "contain-agent-cache-proxy"
+PROXY_NETWORK = "contain-agent"
+PROXY_VOLUME = "contain-agent-cache-proxy"
+PROXY_PORT = 3128
+SPEC_LABEL = "contain-agent.cache-proxy-spec"
+
+CARGO_CONFIG_PATH = "/home/agent/.cargo/config.toml"
+
+# Networks a sidecar cannot be reached on by name.
+UNSUPPORTED_NETWORKS = ("host", "none")
+
+
+class ProxyError(Exception):
+    """The cache proxy sidecar could not be started or reached."""
+
+
+def proxy_url() -> str:
+    return f"http://{PROXY_CONTAINER}:{PROXY_PORT}"
+
+
+def proxy_env() -> dict[str, str]:
+    """Environment variables that route package downloads through the proxy."""
+    base = proxy_url()
+    return {
+        "PIP_INDEX_URL": f"{base}/pypi/simple/",
+        "PIP_TRUSTED_HOST": PROXY_CONTAINER,
+        "UV_DEFAULT_INDEX": f"{base}/pypi/simple/",
+        "npm_config_registry": f"{base}/npm/",
+        "BUN_CONFIG_REGISTRY": f"{base}/npm/",
+    }
+
+
+def cargo_config() -> str:
+    return (
+        "[source.crates-io]\n"
+        'replace-with = "contain-agent-cache-proxy"\n'
+        "\n"
+        "[source.contain-agent-cache-proxy]\n"
+        f'registry = "sparse+{proxy_url()}/crates-index/"\n'
+    )
+
+
+def cargo_config_mount(state_dir: Path) -> tuple[str, str]:
+    """Write the cargo mirror config under `state_dir` and return its mount."""
+    path = state_dir / "cache-proxy" / "cargo-config.toml"
+    content = cargo_config()
+    try:
+        current = path.read_text(encoding="utf-8")
+    except OSError:
+        current = None
+    if current != content:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(content, encoding="utf-8")
+    return str(path), f"{CARGO_CONFIG_PATH}:ro"
+
+
+def server_path() -> Path:
+    return Path(str(files("contain_agent") / "proxy_server.py"))
+
+
+def proxy_spec(image: str, max_mb: int) -> str:
+    digest = hashlib.sha256(server_path().read_bytes())
+    digest.update(f"\0{image}\0{max_mb}".encode())
+    return digest.hexdigest()[:16]
+
+
+def create_command(image: str, max_mb: int, spec: str) -> list[str]:
+    """Build the docker run command for the proxy sidecar."""
+    return [
+        get_docker_cmd(),
+        "run",
+        "-d",
+        "--name",
+        PROXY_CONTAINER,
+        "--label",
+        f"{SPEC_LABEL}={spec}",
+        "--network",
+        PROXY_NETWORK,
+        "--restart",
+        "unless-stopped",
+        "-v",
+        f"{PROXY_VOLUME}:/cache",
+        "-v",
+        f"{server_path()}:/proxy_server.py:ro",
+        image,
+        "python",
+        "/proxy_server.py",
+        "--cache-dir",
+        "/cache",
+        "--max-mb",
+        str(max_mb),
+        "--port",
+        str(PROXY_PORT),
+        "--public-url",
+        proxy_url(),
+    ]
+
+
+def _docker(args: list[str]) -> subprocess.CompletedProcess:
+    try:
+        return subprocess.run(
+            [get_docker_cmd(), *args], capture_output=True, text=True, check=False
+        )
+    except OSError as e:
+        raise ProxyError(f"cannot run docker: {e}")
+
+
+def _inspect() -> tuple[bool, str] | None:
+    """Whether the sidecar is running and its spec label, or None if absent."""
+    res = _docker(
+        [
+            "container",
+            "inspect",
+            "--format",
+            f'{{{{.State.Running}}}} {{{{index .Config.Labels "{SPEC_LABEL}"}}}}',
+            PROXY_CONTAINER,
+        ]
+    )
+    if res.returncode != 0:
+        return None
+    running, _, spec = res.stdout.strip().partition(" ")
+    return running == "true", spec
+
+
+def _check(res: subprocess.CompletedProcess, what: str) -> None:
+    if res.returncode != 0:
+        raise ProxyError(res.stderr.strip() or f"docker {what} failed")
+
+
+def ensure_proxy(network: str, image: str, max_mb: int) -> None:
+    """Make the sidecar run and reachable from containers on `network`."""
+    if network in UNSUPPORTED_NETWORKS or network.startswith("container:"):
+        raise ProxyError(f"the cache proxy cannot be reached on network '{network}'")
+    spec = proxy_spec(image, max_mb)
+    state = _inspect()
+    if state is not None and state[1] != spec:
+        _check(_docker(["rm", "-f", PROXY_CONTAINER]), "rm")
+        state = None
+    if state is None:
+        if _docker(["network", "inspect", PROXY_NETWORK]).returncode != 0:
+            _check(_docker(["network", "create", PROXY_NETWORK]), "network create")
+        _check(_docker(create_command(image, max_mb, spec)[1:]), "run")
+    elif not state[0]:
+        _check(_docker(["start", PROXY_CONTAINER]), "start")
+    if network != PROXY_NETWORK:
+        res = _docker(["network", "connect", network, PROXY_CONTAINER])
+        if res.returncode != 0 and "already exists" not in res.stderr:
+            _check(res, "network connect")
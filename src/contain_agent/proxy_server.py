@@ -0,0 +1,277 @@
+"""Caching HTTP proxy for package downloads, run inside the cache-proxy sidecar.
+
+A request for /<route>/<path> is forwarded to the route's upstream registry.
+Index and metadata responses are passed through with every upstream URL
+rewritten to point back at the proxy, so the artifacts they link to are
+fetched through it too. Artifacts (wheels, sdists, npm tarballs, crates)
+never change once published: they are written to disk while being streamed
+to the client and served from there afterwards. When the cache grows past its
+size budget, the least recently used artifacts are deleted.
+
+The sidecar runs this file on its own, so it uses only the standard library:
+
+    python proxy_server.py --cache-dir DIR --max-mb N --public-url URL
+        [--port PORT] [--upstream ROUTE=URL]...
+"""
+
+import argparse
+import hashlib
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import urllib.error
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import IO
+
+DEFAULT_PORT = 3128
+
+UPSTREAMS = {
+    "pypi": "https://pypi.org",
+    "pythonhosted": "https://files.pythonhosted.org",
+    "npm": "https://registry.npmjs.org",
+    "crates-index": "https://index.crates.io",
+    "crates": "https://static.crates.io",
+}
+
+# Paths of immutable artifacts; cargo downloads crates as <name>/<version>/download.
+ARTIFACT_SUFFIXES = (
+    ".whl",
+    ".tar.gz",
+    ".tar.bz2",
+    ".zip",
+    ".tgz",
+    ".crate",
+    "/download",
+)
+
+# Request headers passed on upstream. Accept-Encoding is not: metadata is
+# rewritten, and artifacts are stored, as plain bytes.
+FORWARDED_HEADERS = ("Accept", "User-Agent", "Npm-Command")
+
+CHUNK_SIZE = 1 << 16
+UPSTREAM_TIMEOUT = 60
+
+
+class ArtifactCache:
+    """Files on disk keyed by URL, evicted least recently used first.
+
+    Serving an artifact bumps its mtime, which is what eviction orders by.
+    """
+
+    def __init__(self, root: Path, max_bytes: int) -> None:
+        self.root = root
+        self.max_bytes = max_bytes
+        self.root.mkdir(parents=True, exist_ok=True)
+        # Downloads cut short by a restart.
+        for stale in self.root.glob("tmp-*"):
+            stale.unlink(missing_ok=True)
+        self._lock = threading.Lock()
+        self._size = sum(size for _, _, size in self._entries())
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+    def _path(self, key: str) -> Path:
+        digest = hashlib.sha256(key.encode()).hexdigest()
+        return self.root / digest[:2] / digest
+
+    def _entries(self) -> list[tuple[float, Path, int]]:
+        entries = []
+        for path in self.root.glob("??/*"):
+            try:
+                st = path.stat()
+            except OSError:
+                continue
+            entries.append((st.st_mtime, path, st.st_size))
+        return entries
+
+    def open(self, key: str) -> IO[bytes] | None:
+        """The cached file for `key`, opened for reading, or None on a miss."""
+        path = self._path(key)
+        try:
+            f = open(path, "rb")  # noqa: SIM115 - the caller closes it
+        except OSError:
+            return None
+        os.utime(f.fileno())
+        return f
+
+    def writer(self) -> IO[bytes]:
+        """A temporary file to fill and then hand to `commit`."""
+        return tempfile.NamedTemporaryFile(dir=self.root, prefix="tmp-", delete=False)
+
+    def commit(self, key: str, tmp_path: Path) -> None:
+        """Move a filled temporary file into place, evicting as needed."""
+        path = self._path(key)
+        path.parent.mkdir(exist_ok=True)
+        size = tmp_path.stat().st_size
+        with self._lock:
+            replaced = path.stat().st_size if path.exists() else 0
+            os.replace(tmp_path, path)
+            self._size += size - replaced
+        self.evict()
+
+    def evict(self) -> None:
+        with self._lock:
+            if self._size <= self.max_bytes:
+                return
+            for _, path, size in sorted(self._entries()):
+                try:
+                    path.unlink()
+                except OSError:
+                    continue
+                self._size -= size
+                if self._size <= self.max_bytes:
+                    break
+
+
+class ProxyServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(
+        self,
+        address: tuple[str, int],
+        cache: ArtifactCache,
+        public_url: str,
+        upstreams: dict[str, str],
+    ) -> None:
+        super().__init__(address, ProxyHandler)
+        self.cache = cache
+        self.upstreams = upstreams
+        # Longest first, so an upstream nested in another's URL space wins.
+        self.rewrites = [
+            (upstream.encode(), f"{public_url.rstrip('/')}/{route}".encode())
+            for route, upstream in sorted(
+                upstreams.items(), key=lambda item: -len(item[1])
+            )
+        ]
+
+    def rewrite(self, body: bytes) -> bytes:
+        for upstream, local in self.rewrites:
+            body = body.replace(upstream, local)
+        return body
+
+
+class ProxyHandler(BaseHTTPRequestHandler):
+    server: ProxyServer
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format: str, *args: object) -> None:
+        sys.stderr.write(f"{self.address_string()} {format % args}\n")
+
+    def do_GET(self) -> None:
+        route, _, rest = self.path.lstrip("/").partition("/")
+        upstream = self.server.upstreams.get(route)
+        if upstream is None:
+            self._send_body(404, b"unknown route\n", "text/plain")
+            return
+        url = f"{upstream.rstrip('/')}/{rest}"
+        artifact = url.split("?", 1)[0].endswith(ARTIFACT_SUFFIXES)
+        if artifact:
+            cached = self.server.cache.open(url)
+            if cached is not None:
+                self._send_file(cached)
+                return
+        headers = {k: v for k in FORWARDED_HEADERS if (v := self.headers.get(k))}
+        try:
+            resp = urllib.request.urlopen(
+                urllib.request.Request(url, headers=headers), timeout=UPSTREAM_TIMEOUT
+            )
+        except urllib.error.HTTPError as e:
+            self._send_body(e.code, e.read(), e.headers.get("Content-Type"))
+            return
+        except (urllib.error.URLError, OSError) as e:
+            self._send_body(502, f"upstream error: {e}\n".encode(), "text/plain")
+            return
+        with resp:
+            content_type = resp.headers.get("Content-Type")
+            if artifact:
+                self._relay_artifact(url, resp, content_type)
+            else:
+                self._send_body(200, self.server.rewrite(resp.read()), content_type)
+
+    def _send_body(self, status: int, body: bytes, content_type: str | None) -> None:
+        self.send_response(status)
+        if content_type:
+            self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_file(self, f: IO[bytes]) -> None:
+        with f:
+            self.send_response(200)
+            self.send_header("Content-Type", "application/octet-stream")
+            self.send_header("Content-Length", str(os.fstat(f.fileno()).st_size))
+            self.send_header("X-Cache", "HIT")
+            self.end_headers()
+            shutil.copyfileobj(f, self.wfile, CHUNK_SIZE)
+
+    def _relay_artifact(self, url: str, resp, content_type: str | None) -> None:
+        """Stream an upstream artifact to the client and into the cache."""
+        length = resp.headers.get("Content-Length")
+        self.send_response(200)
+        self.send_header("Content-Type", content_type or "application/octet-stream")
+        if length is not None:
+            self.send_header("Content-Length", length)
+        else:
+            self.close_connection = True
+        self.send_header("X-Cache", "MISS")
+        self.end_headers()
+        tmp = self.server.cache.writer()
+        tmp_path = Path(tmp.name)
+        received = 0
+        try:
+            with tmp:
+                while chunk := resp.read(CHUNK_SIZE):
+                    tmp.write(chunk)
+                    received += len(chunk)
+                    self.wfile.write(chunk)
+            complete = length is None or received == int(length)
+        except OSError:
+            complete = False
+        if complete:
+            self.server.cache.commit(url, tmp_path)
+        else:
+            tmp_path.unlink(missing_ok=True)
+
+
+def _upstream(value: str) -> tuple[str, str]:
+    route, sep, url = value.partition("=")
+    if not sep or not route or not url:
+        raise argparse.ArgumentTypeError(f"expected ROUTE=URL, got {value!r}")
+    return route, url
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(prog="proxy_server.py")
+    parser.add_argument("--cache-dir", type=Path, required=True)
+    parser.add_argument("--max-mb", type=int, required=True)
+    parser.add_argument("--public-url", required=True)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument(
+        "--upstream",
+        type=_upstream,
+        action="append",
+        default=[],
+        help="Add or override a route, e.g. pypi=https://pypi.example",
+    )
+    args = parser.parse_args(argv)
+    cache = ArtifactCache(args.cache_dir, args.max_mb * 1024 * 1024)
+    server = ProxyServer(
+        ("", args.port), cache, args.public_url, {**UPSTREAMS, **dict(args.upstream)}
+    )
+    print(f"Caching proxy listening on port {args.port}", file=sys.stderr, flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
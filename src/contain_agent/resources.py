@@ -0,0 +1,116 @@
+"""Automatic partitioning of the Docker host between concurrent agents.
+
+In auto mode a new container gets an even share of the host: with N
+auto-partitioned containers already running, it gets 1/(N+1) of the cores as
+a pinned cpuset and the same share of memory. The cpuset is the contiguous
+run of cores that overlaps the running containers' cpusets least, so
+concurrent builds keep their caches warm and one runaway agent cannot starve
+the rest. Running containers keep the slice they started with; they are
+found by CPUSET_LABEL, which records each one's cpuset.
+"""
+
+import subprocess
+from dataclasses import dataclass
+
+from contain_agent.docker import get_docker_cmd
+
+CPUSET_LABEL = "contain-agent.cpuset"
+
+
+@dataclass
+class Share:
+    cpuset_cpus: str
+    memory: str
+
+
+def parse_cpuset(spec: str) -> set[int]:
+    """Parse a docker --cpuset-cpus value such as "0-3,6" into core numbers."""
+    cores: set[int] = set()
+    for part in spec.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        first, _, last = part.partition("-")
+        cores.update(range(int(first), int(last or first) + 1))
+    return cores
+
+
+def format_cpuset(cores: list[int]) -> str:
+    """The shortest --cpuset-cpus value for the given core numbers."""
+    ranges: list[str] = []
+    ordered = sorted(cores)
+    start = prev = ordered[0] if ordered else 0
+    for core in [*ordered[1:], None]:
+        if core is not None and core == prev + 1:
+            prev = core
+            continue
+        ranges.append(str(start) if start == prev else f"{start}-{prev}")
+        if core is not None:
+            start = prev = core
+    return ",".join(ranges) if ordered else ""
+
+
+def partition(ncpu: int, mem_total: int, running: list[set[int]]) -> Share:
+    """The share of an `ncpu`-core, `mem_total`-byte host for one more container."""
+    share = len(running) + 1
+    width = max(1, ncpu // share)
+    load = [0] * ncpu
+    for cores in running:
+        for core in cores:
+            if 0 <= core < ncpu:
+                load[core] += 1
+    start = min(range(ncpu - width + 1), key=lambda i: (sum(load[i : i + width]), i))
+    # Docker refuses memory limits below 6 MB.
+    memory_mb = max(6, mem_total // share // (1 << 20))
+    return Share(
+        cpuset_cpus=format_cpuset(list(range(start, start + width))),
+        memory=f"{memory_mb}m",
+    )
+
+
+def _docker_output(args: list[str]) -> str | None:
+    try:
+        res = subprocess.run(
+            [get_docker_cmd(), *args], capture_output=True, text=True, check=False
+        )
+    except OSError:
+        return None
+    return res.stdout if res.returncode == 0 else None
+
+
+def host_capacity() -> tuple[int, int] | None:
+    """Cores and bytes of memory of the Docker host (which may be a VM)."""
+    out = _docker_output(["info", "--format", "{{.NCPU}} {{.MemTotal}}"])
+    try:
+        ncpu, mem_total = (int(v) for v in (out or "").split())
+    except ValueError:
+        return None
+    return (ncpu, mem_total) if ncpu > 0 and mem_total > 0 else None
+
+
+def running_cpusets() -> list[set[int]] | None:
+    """Cpusets of the running auto-partitioned containers."""
+    out = _docker_output(
+        [
+            "ps",
+            "--filter",
+            f"label={CPUSET_LABEL}",
+            "--format",
+            f'{{{{.Label "{CPUSET_LABEL}"}}}}',
+        ]
+    )
+    if out is None:
+        return None
+    try:
+        return [parse_cpuset(line) for line in out.splitlines() if line.strip()]
+    except ValueError:
+        return None
+
+
+def auto_share() -> Share | None:
+    """This container's share of the host, or None if Docker cannot say."""
+    capacity = host_capacity()
+    running = running_cpusets()
+    if capacity is None or running is None:
+        return None
+    return partition(*capacity, running)
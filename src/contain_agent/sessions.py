@@ -0,0 +1,136 @@
+"""Named sessions: one long-lived container per name, reused across runs.
+
+A session container idles (`sleep infinity`) and each run execs into it, so
+tools the agent installed and warmed build directories survive between runs.
+It is labelled with a hash of the image and container options it was created
+with; a later run with a different spec is refused rather than silently
+getting the old image or mounts.
+
+Runs of the same session hold a shared lock on
+~/.contain-agent/sessions/<name>.lock. The last one to finish stops the
+container, which keeps its filesystem until it is removed with
+`docker rm -f contain-agent-session-<name>`.
+"""
+
+import fcntl
+import re
+import subprocess
+from collections.abc import Iterator
+from contextlib import contextmanager
+from pathlib import Path
+
+from contain_agent.docker import get_docker_cmd
+from contain_agent.pool import pool_signature
+
+SESSION_LABEL = "contain-agent.session"
+SPEC_LABEL = "contain-agent.session-spec"
+
+_NAME_RE = re.compile(r"[a-zA-Z0-9][a-zA-Z0-9_.-]*")
+
+
+class SessionError(Exception):
+    """A session container could not be created, started or reused."""
+
+
+def container_name(name: str) -> str:
+    if not _NAME_RE.fullmatch(name):
+        raise SessionError(
+            f"invalid session name '{name}' (use letters, digits, '_', '.' and '-')"
+        )
+    return f"contain-agent-session-{name}"
+
+
+def create_command(
+    name: str, image: str, run_options: list[str], spec: str
+) -> list[str]:
+    """Build the docker run command for a new, idle session container."""
+    return [
+        get_docker_cmd(),
+        "run",
+        "-d",
+        "--name",
+        container_name(name),
+        "--label",
+        f"{SESSION_LABEL}={name}",
+        "--label",
+        f"{SPEC_LABEL}={spec}",
+        *run_options,
+        image,
+        "sleep",
+        "infinity",
+    ]
+
+
+def _docker(args: list[str]) -> subprocess.CompletedProcess:
+    try:
+        return subprocess.run(
+            [get_docker_cmd(), *args], capture_output=True, text=True, check=False
+        )
+    except OSError as e:
+        raise SessionError(f"cannot run docker: {e}")
+
+
+def _inspect(container: str) -> tuple[bool, str] | None:
+    """Whether the container is running and its spec label, or None if absent."""
+    res = _docker(
+        [
+            "container",
+            "inspect",
+            "--format",
+            f'{{{{.State.Running}}}} {{{{index .Config.Labels "{SPEC_LABEL}"}}}}',
+            container,
+        ]
+    )
+    if res.returncode != 0:
+        return None
+    running, _, spec = res.stdout.strip().partition(" ")
+    return running == "true", spec
+
+
+def ensure_session(name: str, image: str, run_options: list[str]) -> tuple[str, bool]:
+    """Make the session's container run, creating it if needed.
+
+    Returns the container name and whether an existing container was resumed.
+    """
+    container = container_name(name)
+    spec = pool_signature(image, run_options)
+    state = _inspect(container)
+    if state is None:
+        res = _docker(create_command(name, image, run_options, spec)[1:])
+        if res.returncode != 0:
+            raise SessionError(res.stderr.strip() or "docker run failed")
+        return container, False
+    running, existing_spec = state
+    if existing_spec != spec:
+        raise SessionError(
+            f"session '{name}' was created with a different image or options; "
+            f"remove it with `docker rm -f {container}` or pick another name"
+        )
+    if not running:
+        res = _docker(["start", container])
+        if res.returncode != 0:
+            raise SessionError(res.stderr.strip() or "docker start failed")
+    return container, True
+
+
+@contextmanager
+def session_run(state_dir: Path, name: str) -> Iterator[None]:
+    """Register a run of the session; the last run to finish stops its container."""
+    path = state_dir / "sessions" / f"{name}.lock"
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "a") as lock:
+        fcntl.flock(lock, fcntl.LOCK_SH)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+            try:
+                fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                pass
+            else:
+                # `sleep` as PID 1 ignores SIGTERM, so there is nothing to wait for.
+                try:
+                    _docker(["stop", "--time", "0", container_name(name)])
+                except SessionError:
+                    pass
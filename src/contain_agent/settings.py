@@ -1,29 +1,134 @@
+"""Layered settings: ~/.contain-agent/settings.json, then a per-project file.
+
+The project file is the nearest `.contain-agent.json` found by walking up from
+the workspace; its keys override the global ones. Nothing is read at import
+time. Merged settings are memoized on the stat signatures of both layers, so
+repeated lookups cost a few stats.
+"""
+
 import json
 from pathlib import Path
+from typing import Literal
 
 from pydantic import BaseModel, Field, ValidationError
 
+from contain_agent.launch import stamp
+
+PROJECT_SETTINGS_NAME = ".contain-agent.json"
+
 
 class Settings(BaseModel):
     default_command: str | None = None
     default_args: list[str] = Field(default_factory=list)
+    image: str | None = None
+    profile: str | None = None
+    network: str | None = None
+    mounts: list[str] = Field(default_factory=list)
+    artifact_dirs: list[str] = Field(default_factory=list)
+    cpus: float | None = None
+    memory: str | None = None
+    cpuset_cpus: str | None = None
+    pids_limit: int | None = None
+    auto_resources: bool = False
+    prewarm: bool = False
+    image_max_age: int = 7 * 24 * 3600
+    transcript: bool = False
+    history: bool = False
+    transcript_max_mb: int = 16
+    backend: Literal["cli", "engine"] = "cli"
+    direct_exec: Literal["never", "auto", "always"] = "never"
+    pool: bool = False
+    pool_size: int = 2
+    pool_max_uses: int = 10
+    pool_max_age: int = 3600
+    pool_idle_timeout: int = 600
+    package_caches: bool = True
+    cache_proxy: bool = False
+    cache_proxy_max_mb: int = 20480
+    cache_proxy_image: str = "python:3.13-alpine"
+    cache_max_mb: int = 10240
+    cache_limits_mb: dict[str, int] = Field(default_factory=dict)
+    build_cache_dir: str | None = None
+    build_cache_max_mb: int = 10240
+
+
+_memo: dict[tuple, Settings] = {}
+
+
+def global_settings_path() -> Path:
+    return Path.home() / ".contain-agent" / "settings.json"
+
+
+def project_settings_candidates(workspace: Path) -> list[Path]:
+    """Every path a project settings file for `workspace` may live at, nearest first."""
+    start = workspace.absolute()
+    return [d / PROJECT_SETTINGS_NAME for d in (start, *start.parents)]
+
+
+def find_project_settings(workspace: Path) -> Path | None:
+    for candidate in project_settings_candidates(workspace):
+        if candidate.is_file():
+            return candidate
+    return None
+
+
+def _read_layer(path: Path | None) -> dict:
+    """Validated, explicitly set keys of one settings file; {} if unusable."""
+    if path is None or not path.is_file():
+        return {}
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        layer = Settings.model_validate(data).model_dump(exclude_unset=True)
+    except json.JSONDecodeError, ValidationError, OSError:
+        return {}
+    if "mounts" in layer:
+        # Relative host paths are relative to the file that names them.
+        layer["mounts"] = [
+            _resolve_mount(spec, path.parent) for spec in layer["mounts"]
+        ]
+    if layer.get("build_cache_dir"):
+        cache_dir = Path(layer["build_cache_dir"]).expanduser()
+        layer["build_cache_dir"] = str((path.parent / cache_dir).resolve())
+    return layer
+
+
+def _resolve_mount(spec: str, base: Path) -> str:
+    host, _, target = spec.partition(":")
+    host_path = Path(host).expanduser()
+    if not host_path.is_absolute():
+        host_path = base / host_path
+    host_path = host_path.resolve()
+    return f"{host_path}:{target or host_path}"
+
+
+def _signature(path: Path | None) -> tuple[int, ...] | None:
+    # stamp() returns a list, as launch plans store it in JSON; keys need a tuple.
+    sig = stamp(str(path)) if path is not None else None
+    return tuple(sig) if sig is not None else None
+
+
+def load_settings(
+    settings_path: Path | None = None, workspace: Path | None = None
+) -> Settings:
+    """Load global settings, overlaid with the project settings for `workspace`."""
+    path = settings_path if settings_path is not None else global_settings_path()
+    project = find_project_settings(workspace) if workspace is not None else None
+    key = (str(path), _signature(path), str(project), _signature(project))
+    cached = _memo.get(key)
+    if cached is None:
+        cached = Settings.model_validate({**_read_layer(path), **_read_layer(project)})
+        _memo[key] = cached
+    return cached.model_copy(deep=True)
+
+
+def clear_settings_cache() -> None:
+    """Forget memoized settings, so the next load reads the files again."""
+    _memo.clear()
 
 
-def load_settings(settings_path: Path | None = None) -> Settings:
-    """Load settings from ~/.contain-agent/settings.json if it exists."""
-    path = (
-        settings_path
-        if settings_path is not None
-        else (Path.home() / ".contain-agent" / "settings.json")
-    )
-    if path.is_file():
-        try:
-            with open(path, "r", encoding="utf-8") as f:
-                data = json.load(f)
-            return Settings.model_validate(data)
-        except json.JSONDecodeError, ValidationError, OSError:
-            return Settings()
-    return Settings()
-
-
-settings: Settings = load_settings()
+def __getattr__(name: str) -> object:
+    # `settings` used to be loaded at import; it is now resolved on access.
+    if name == "settings":
+        return load_settings()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
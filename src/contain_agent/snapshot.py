@@ -0,0 +1,132 @@
+"""Copy-on-write workspace snapshots backed by git worktrees.
+
+A snapshot is a detached worktree of the workspace's repository under
+~/.contain-agent/snapshots/<id>/, sharing the repository's object store.
+The host's uncommitted changes (tracked edits and untracked, non-ignored
+files) are carried over, so creating one costs a checkout plus work
+proportional to the changed files. The repository's common git directory is
+mounted at its host path so git keeps working inside the container.
+
+When the run ends, everything that differs from the snapshot's starting
+point, including commits the agent made, is written out as a binary patch
+that applies to the host workspace with `git apply`.
+"""
+
+import shutil
+import subprocess
+import uuid
+from dataclasses import dataclass
+from pathlib import Path
+
+
+class SnapshotError(Exception):
+    """The workspace could not be snapshotted or its changes collected."""
+
+
+@dataclass
+class Snapshot:
+    id: str
+    source: Path
+    worktree: Path
+    workspace: Path
+    git_dir: Path
+    base_tree: str
+
+    def mounts(self) -> list[tuple[str, str]]:
+        """Extra bind mounts needed for git to work inside the container."""
+        return [(str(self.git_dir), str(self.git_dir))]
+
+
+def _git(cwd: Path, *args: str, input: bytes | None = None) -> bytes:
+    try:
+        res = subprocess.run(
+            ["git", *args], cwd=cwd, input=input, capture_output=True, check=False
+        )
+    except FileNotFoundError:
+        raise SnapshotError("'git' command not found")
+    if res.returncode != 0:
+        message = res.stderr.decode(errors="replace").strip()
+        raise SnapshotError(f"git {args[0]} failed: {message}")
+    return res.stdout
+
+
+def _stage_tree(worktree: Path) -> str:
+    """Hash the worktree's current contents as a tree, leaving the index alone."""
+    _git(worktree, "add", "-A")
+    tree = _git(worktree, "write-tree").decode().strip()
+    _git(worktree, "reset", "-q")
+    return tree
+
+
+def create_snapshot(workspace: Path, root: Path) -> Snapshot:
+    """Create a writable snapshot of `workspace` under `root`."""
+    workspace = workspace.resolve()
+    toplevel = Path(_git(workspace, "rev-parse", "--show-toplevel").decode().strip())
+    git_dir = Path(
+        _git(workspace, "rev-parse", "--path-format=absolute", "--git-common-dir")
+        .decode()
+        .strip()
+    )
+    snapshot_id = uuid.uuid4().hex[:12]
+    # The worktree keeps the repository's name so the container workdir matches
+    # the one an ordinary run of the same workspace would get.
+    worktree = root / snapshot_id / toplevel.name
+    worktree.parent.mkdir(parents=True, exist_ok=True)
+    _git(toplevel, "worktree", "add", "--detach", "--quiet", str(worktree), "HEAD")
+    snapshot = Snapshot(
+        id=snapshot_id,
+        source=toplevel,
+        worktree=worktree,
+        workspace=worktree / workspace.relative_to(toplevel),
+        git_dir=git_dir,
+        base_tree="",
+    )
+    try:
+        diff = _git(toplevel, "diff", "--binary", "HEAD")
+        if diff:
+            _git(worktree, "apply", "--binary", "--whitespace=nowarn", input=diff)
+        untracked = _git(
+            toplevel, "ls-files", "--others", "--exclude-standard", "-z"
+        ).split(b"\0")
+        for raw in untracked:
+            # Nested repositories are listed as directories; skip them.
+            if not raw or raw.endswith(b"/"):
+                continue
+            rel = raw.decode()
+            dest = worktree / rel
+            dest.parent.mkdir(parents=True, exist_ok=True)
+            shutil.copy2(toplevel / rel, dest, follow_symlinks=False)
+        snapshot.base_tree = _stage_tree(worktree)
+    except BaseException:
+        remove_snapshot(snapshot)
+        raise
+    return snapshot
+
+
+def collect_snapshot(snapshot: Snapshot, patch_path: Path) -> Path | None:
+    """Write the snapshot's changes to `patch_path`; None if nothing changed."""
+    _git(snapshot.worktree, "add", "-A")
+    patch = _git(snapshot.worktree, "diff", "--cached", "--binary", snapshot.base_tree)
+    _git(snapshot.worktree, "reset", "-q")
+    if not patch:
+        return None
+    patch_path.parent.mkdir(parents=True, exist_ok=True)
+    patch_path.write_bytes(patch)
+    return patch_path
+
+
+def remove_snapshot(snapshot: Snapshot) -> None:
+    """Delete the snapshot's worktree and its registration in the repository."""
+    subprocess.run(
+        ["git", "worktree", "remove", "--force", str(snapshot.worktree)],
+        cwd=snapshot.source,
+        capture_output=True,
+        check=False,
+    )
+    shutil.rmtree(snapshot.worktree.parent, ignore_errors=True)
+    subprocess.run(
+        ["git", "worktree", "prune"],
+        cwd=snapshot.source,
+        capture_output=True,
+        check=False,
+    )
@@ -0,0 +1,348 @@
+"""Incremental two-way sync between a host workspace and a Docker volume.
+
+Bind mounts are slow on VM-backed or remote Docker daemons. In sync mode the
+workspace lives in a named volume instead, and is reconciled with the host
+before and after each run. A manifest under ~/.contain-agent/sync/ records,
+for every file, its content hash and the stat signature it had on each side
+at the last sync. Only files whose stat changed are hashed, and only files
+whose hash changed cross the boundary, in either direction.
+
+Both sides implement the small `Tree` interface. `LocalTree` is a plain
+directory (the host, or a stand-in for the volume in tests); `VolumeTree`
+drives short-lived helper containers with `find`, `sha256sum` and `tar`.
+"""
+
+import hashlib
+import io
+import json
+import os
+import re
+import subprocess
+import tarfile
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Literal, Protocol
+
+from contain_agent.docker import get_docker_cmd
+
+MANIFEST_VERSION = 1
+
+# Stat signature of one file: (size, modification time), compared for equality.
+Stat = tuple[int, str]
+
+
+class SyncError(Exception):
+    """A side of the sync could not be read or written."""
+
+
+class Tree(Protocol):
+    def identity(self) -> str:
+        """Changes whenever the tree is recreated from scratch."""
+        ...
+
+    def stats(self) -> dict[str, Stat]:
+        """Stat signatures of every file, keyed by POSIX relative path."""
+        ...
+
+    def hashes(self, paths: list[str]) -> dict[str, str]:
+        """SHA-256 hex digests of the given files."""
+        ...
+
+    def export(self, paths: list[str]) -> bytes:
+        """A tar archive of the given files."""
+        ...
+
+    def extract(self, archive: bytes) -> None:
+        """Unpack a tar archive produced by `export` on the other side."""
+        ...
+
+    def delete(self, paths: list[str]) -> None: ...
+
+
+class LocalTree:
+    """A directory on the local filesystem."""
+
+    def __init__(self, root: Path) -> None:
+        self.root = root
+
+    def identity(self) -> str:
+        try:
+            return str(self.root.stat().st_ino)
+        except OSError:
+            return ""
+
+    def stats(self) -> dict[str, Stat]:
+        result: dict[str, Stat] = {}
+        for dirpath, dirnames, filenames in os.walk(self.root):
+            base = Path(dirpath)
+            # Symlinked directories are synced as links, not followed.
+            for name in [d for d in dirnames if (base / d).is_symlink()]:
+                dirnames.remove(name)
+                filenames.append(name)
+            for name in filenames:
+                path = base / name
+                st = path.lstat()
+                rel = path.relative_to(self.root).as_posix()
+                result[rel] = (st.st_size, str(st.st_mtime_ns))
+        return result
+
+    def hashes(self, paths: list[str]) -> dict[str, str]:
+        result: dict[str, str] = {}
+        for rel in paths:
+            path = self.root / rel
+            if path.is_symlink():
+                data = os.readlink(path).encode()
+            else:
+                data = path.read_bytes()
+            result[rel] = hashlib.sha256(data).hexdigest()
+        return result
+
+    def export(self, paths: list[str]) -> bytes:
+        # Parent directories go in too, so they get our owner on the far side.
+        parents = sorted(
+            {p.as_posix() for rel in paths for p in Path(rel).parents if p != Path(".")}
+        )
+        buf = io.BytesIO()
+        with tarfile.open(fileobj=buf, mode="w") as tar:
+            for rel in [*parents, *paths]:
+                tar.add(self.root / rel, arcname=rel, recursive=False)
+        return buf.getvalue()
+
+    def extract(self, archive: bytes) -> None:
+        self.root.mkdir(parents=True, exist_ok=True)
+        with tarfile.open(fileobj=io.BytesIO(archive)) as tar:
+            for member in tar.getmembers():
+                # Replace rather than write through an existing file or link.
+                target = self.root / member.name
+                if target.is_symlink() or target.is_file():
+                    target.unlink()
+            tar.extractall(self.root, filter="tar")
+
+    def delete(self, paths: list[str]) -> None:
+        for rel in paths:
+            (self.root / rel).unlink(missing_ok=True)
+
+
+class VolumeTree:
+    """A named Docker volume, accessed through helper containers."""
+
+    MOUNT = "/sync"
+
+    def __init__(self, volume: str, image: str, uid: int) -> None:
+        self.volume = volume
+        self.image = image
+        self.uid = uid
+
+    def _run(self, script: str, input: bytes = b"") -> bytes:
+        cmd = [
+            get_docker_cmd(),
+            "run",
+            "--rm",
+            "-i",
+            "--user",
+            "root",
+            "--entrypoint",
+            "sh",
+            "-v",
+            f"{self.volume}:{self.MOUNT}",
+            "-w",
+            self.MOUNT,
+            self.image,
+            "-c",
+            script,
+        ]
+        try:
+            res = subprocess.run(cmd, input=input, capture_output=True, check=False)
+        except OSError as e:
+            raise SyncError(f"cannot run docker: {e}")
+        if res.returncode != 0:
+            message = res.stderr.decode(errors="replace").strip()
+            raise SyncError(f"volume {self.volume}: {message}")
+        return res.stdout
+
+    def identity(self) -> str:
+        try:
+            res = subprocess.run(
+                [
+                    get_docker_cmd(),
+                    "volume",
+                    "inspect",
+                    "--format",
+                    "{{.CreatedAt}}",
+                    self.volume,
+                ],
+                capture_output=True,
+                text=True,
+                check=False,
+            )
+        except OSError:
+            return ""
+        return res.stdout.strip() if res.returncode == 0 else ""
+
+    def stats(self) -> dict[str, Stat]:
+        out = self._run(r"find . \( -type f -o -type l \) -printf '%s %T@ %P\0'")
+        result: dict[str, Stat] = {}
+        for entry in filter(None, out.split(b"\0")):
+            size, mtime, rel = entry.decode().split(" ", 2)
+            result[rel] = (int(size), mtime)
+        return result
+
+    def hashes(self, paths: list[str]) -> dict[str, str]:
+        if not paths:
+            return {}
+        # sha256sum follows symlinks, so hash link targets the way LocalTree does.
+        script = (
+            "xargs -0 -n 1 sh -c "
+            '\'if [ -L "$0" ]; then printf %s "$(readlink "$0")" | sha256sum; '
+            'else sha256sum < "$0"; fi\''
+        )
+        out = self._run(script, "\0".join(paths).encode())
+        digests = [line.split()[0] for line in out.decode().splitlines()]
+        return dict(zip(paths, digests, strict=True))
+
+    def export(self, paths: list[str]) -> bytes:
+        return self._run("tar -cf - --null -T -", "\0".join(paths).encode())
+
+    def extract(self, archive: bytes) -> None:
+        self._run(
+            f"chown {self.uid} . && tar --unlink-first -xf -",
+            archive,
+        )
+
+    def delete(self, paths: list[str]) -> None:
+        self._run("xargs -0 rm -f --", "\0".join(paths).encode())
+
+
+@dataclass
+class SyncResult:
+    pushed: list[str] = field(default_factory=list)
+    pulled: list[str] = field(default_factory=list)
+    deleted_local: list[str] = field(default_factory=list)
+    deleted_remote: list[str] = field(default_factory=list)
+    conflicts: list[str] = field(default_factory=list)
+
+
+def load_manifest(path: Path) -> dict:
+    try:
+        data = json.loads(path.read_text(encoding="utf-8"))
+    except OSError, ValueError:
+        return {}
+    return data if data.get("version") == MANIFEST_VERSION else {}
+
+
+def _save_manifest(path: Path, manifest: dict) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(f".{os.getpid()}.tmp")
+    tmp.write_text(json.dumps(manifest), encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def _current_hashes(
+    tree: Tree, stats: dict[str, Stat], known: dict[str, dict], side: str
+) -> dict[str, str]:
+    """Hash only the files whose stat differs from the last sync."""
+    changed = [
+        rel
+        for rel, st in stats.items()
+        if rel not in known or tuple(known[rel][side]) != st
+    ]
+    hashes = {rel: known[rel]["hash"] for rel in stats if rel not in changed}
+    hashes.update(tree.hashes(changed))
+    return hashes
+
+
+def sync_trees(
+    local: Tree,
+    remote: Tree,
+    manifest_path: Path,
+    prefer: Literal["local", "remote"] = "local",
+) -> SyncResult:
+    """Reconcile `local` and `remote`, copying only what changed since last time.
+
+    A file changed on one side since the last sync is copied to (or deleted
+    from) the other. A file changed differently on both sides is a conflict,
+    resolved in favour of `prefer`.
+    """
+    manifest = load_manifest(manifest_path)
+    if manifest.get("identity") != [local.identity(), remote.identity()]:
+        # A recreated volume must not read as "every file was deleted".
+        manifest = {}
+    known: dict[str, dict] = manifest.get("files", {})
+
+    local_stats = local.stats()
+    remote_stats = remote.stats()
+    local_hashes = _current_hashes(local, local_stats, known, "local")
+    remote_hashes = _current_hashes(remote, remote_stats, known, "remote")
+
+    result = SyncResult()
+    for rel in sorted(local_hashes.keys() | remote_hashes.keys() | known.keys()):
+        base = known.get(rel, {}).get("hash")
+        ours = local_hashes.get(rel)
+        theirs = remote_hashes.get(rel)
+        if ours == theirs:
+            continue
+        local_changed = ours != base
+        remote_changed = theirs != base
+        if local_changed and remote_changed:
+            result.conflicts.append(rel)
+            take_local = prefer == "local"
+        else:
+            take_local = local_changed
+        if take_local:
+            (result.pushed if ours else result.deleted_remote).append(rel)
+        else:
+            (result.pulled if theirs else result.deleted_local).append(rel)
+
+    if result.pushed:
+        remote.extract(local.export(result.pushed))
+    if result.pulled:
+        local.extract(remote.export(result.pulled))
+    if result.deleted_remote:
+        remote.delete(result.deleted_remote)
+    if result.deleted_local:
+        local.delete(result.deleted_local)
+
+    if result.pushed or result.deleted_remote:
+        remote_stats = remote.stats()
+    if result.pulled or result.deleted_local:
+        local_stats = local.stats()
+    files: dict[str, dict] = {}
+    for rel in local_stats.keys() & remote_stats.keys():
+        hashes = remote_hashes if rel in result.pulled else local_hashes
+        files[rel] = {
+            "hash": hashes[rel],
+            "local": list(local_stats[rel]),
+            "remote": list(remote_stats[rel]),
+        }
+    # Recorded after syncing, since the first write may have created the tree.
+    identity = [local.identity(), remote.identity()]
+    _save_manifest(
+        manifest_path,
+        {"version": MANIFEST_VERSION, "identity": identity, "files": files},
+    )
+    return result
+
+
+def volume_name(workspace: Path) -> str:
+    """Name of the volume holding the synced copy of `workspace`."""
+    resolved = workspace.resolve()
+    digest = hashlib.sha256(str(resolved).encode()).hexdigest()[:12]
+    name = re.sub(r"[^a-zA-Z0-9_.-]", "-", resolved.name)
+    return f"contain-agent-sync-{name}-{digest}"
+
+
+def manifest_path(state_dir: Path, volume: str) -> Path:
+    """Where the sync manifest for `volume` is kept."""
+    return state_dir / "sync" / f"{volume}.json"
+
+
+def describe(result: SyncResult) -> str:
+    """One-line summary of a sync, for progress messages."""
+    parts = [
+        f"{len(result.pushed)} pushed",
+        f"{len(result.pulled)} pulled",
+        f"{len(result.deleted_remote) + len(result.deleted_local)} deleted",
+    ]
+    if result.conflicts:
+        parts.append(f"{len(result.conflicts)} conflicts")
+    return ", ".join(parts)
@@ -0,0 +1,113 @@
+"""Per-phase latency breakdown of a launch.
+
+Phases are measured with the monotonic clock, relative to the import of the
+launcher module (`launch.STARTED`). For the `contain-agent` entry point that
+is the first thing to run, so loading the CLI shows up as the first phase.
+
+Markers are instants rather than intervals, such as the container's first
+byte of output.
+
+The report is either a table on stderr or one JSON line appended to a file:
+
+    {"time": 1760000000.0, "argv": [...], "total_ms": 812.4,
+     "phases": [{"name": "image", "start_ms": 90.1, "ms": 3.2}, ...],
+     "markers": {"first_output": 640.7}}
+"""
+
+import json
+import os
+import sys
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from pathlib import Path
+from typing import IO
+
+from contain_agent import launch
+
+ENV_VAR = "CONTAIN_AGENT_TIMINGS"
+
+
+class Timings:
+    def __init__(self, start: float | None = None) -> None:
+        self.start = launch.STARTED if start is None else start
+        self.phases: list[tuple[str, float, float]] = []
+        self.markers: dict[str, float] = {}
+        self._last = self.start
+
+    def _ms(self, t: float) -> float:
+        return round((t - self.start) * 1000, 3)
+
+    def record(self, name: str) -> None:
+        """Close a phase that began where the previous one ended."""
+        now = time.monotonic()
+        self.phases.append((name, self._last, now))
+        self._last = now
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        """Time the enclosed block, even when it exits by raising."""
+        begin = time.monotonic()
+        try:
+            yield
+        finally:
+            end = time.monotonic()
+            self.phases.append((name, begin, end))
+            self._last = end
+
+    def mark(self, name: str) -> None:
+        """Record an instant; only the first occurrence of a marker counts."""
+        self.markers.setdefault(name, time.monotonic())
+
+    def as_dict(self) -> dict:
+        return {
+            "time": time.time(),
+            "argv": sys.argv[1:],
+            "total_ms": self._ms(time.monotonic()),
+            "phases": [
+                {
+                    "name": name,
+                    "start_ms": self._ms(begin),
+                    "ms": round((end - begin) * 1000, 3),
+                }
+                for name, begin, end in self.phases
+            ],
+            "markers": {name: self._ms(t) for name, t in self.markers.items()},
+        }
+
+    def print_table(self, out: IO[str] | None = None) -> None:
+        out = out if out is not None else sys.stderr
+        data = self.as_dict()
+        rows = [(p["name"], p["start_ms"], p["ms"]) for p in data["phases"]]
+        rows.extend((name, at, None) for name, at in data["markers"].items())
+        rows.sort(key=lambda row: row[1])
+        width = max([len("PHASE"), *(len(row[0]) for row in rows)])
+        print(f"{'PHASE':<{width}}  {'START':>9}  {'TOOK':>9}", file=out)
+        for name, at, took in rows:
+            took_s = f"{took:7.1f}ms" if took is not None else f"{'-':>9}"
+            print(f"{name:<{width}}  {at:7.1f}ms  {took_s}", file=out)
+        print(f"{'total':<{width}}  {'':>9}  {data['total_ms']:7.1f}ms", file=out)
+
+    def append_jsonl(self, path: Path) -> None:
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            with open(path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(self.as_dict()) + "\n")
+        except OSError as e:
+            print(f"Warning: cannot write timings to '{path}': {e}", file=sys.stderr)
+
+
+def timings_target(flag: bool, path: Path | None) -> Path | str | None:
+    """Where to report: a JSONL file, "table" for stderr, or None for nowhere.
+
+    The CONTAIN_AGENT_TIMINGS variable enables reporting without the flags;
+    "1" selects the table, anything else is a JSONL file path.
+    """
+    if path is not None:
+        return path
+    if flag:
+        return "table"
+    env = os.environ.get(ENV_VAR)
+    if not env or env == "0":
+        return None
+    return "table" if env == "1" else Path(env).expanduser()
@@ -0,0 +1,218 @@
+"""Terminal relay that records a compressed, size-capped transcript of a run.
+
+With a transcript, the docker client gets a pseudo-terminal of its own
+instead of ours. The relay copies keystrokes to it and its output to our
+terminal, and tees the output into a gzip file under
+~/.contain-agent/transcripts/. Output is read into one preallocated buffer
+and handed on as memoryviews, never decoded. The transcript side is a
+fixed-size ring that is compressed and written in batches, when it is half
+full or the output goes quiet, so keystroke echo never waits on zlib or the
+disk.
+
+Once the compressed transcript reaches its cap, further output only cycles
+through the ring; the file ends with a note of how much was skipped and the
+last RING_SIZE bytes of output.
+
+`--timings` uses the same relay, with or without a transcript, to see the
+container's first output while the docker client keeps a terminal.
+"""
+
+import errno
+import fcntl
+import os
+import select
+import signal
+import subprocess
+import sys
+import termios
+import time
+import tty
+import zlib
+from collections.abc import Callable
+from pathlib import Path
+
+RING_SIZE = 1 << 20
+READ_SIZE = 1 << 16
+# Seconds without output after which pending output is written out.
+IDLE_FLUSH = 0.5
+
+
+def transcript_path(state_dir: Path) -> Path:
+    stamp = time.strftime("%Y%m%d-%H%M%S", time.localtime())
+    return state_dir / "transcripts" / f"{stamp}-{os.getpid()}.log.gz"
+
+
+class Transcript:
+    """Gzip transcript fed through a fixed-size ring buffer.
+
+    Nothing touches the filesystem until the first batch is written.
+    """
+
+    def __init__(self, path: Path, max_bytes: int) -> None:
+        self.path = path
+        self.max_bytes = max_bytes
+        self.written = 0
+        self.skipped = 0
+        self._ring = memoryview(bytearray(RING_SIZE))
+        self._start = 0
+        self._len = 0
+        self._capped = False
+        self._zlib = zlib.compressobj(6, zlib.DEFLATED, 31)  # 31: gzip framing
+        self._file = None
+
+    def feed(self, data: memoryview) -> None:
+        """Append output; may write a batch when the ring is half full."""
+        if len(data) > RING_SIZE:
+            self._drop(len(data) - RING_SIZE)
+            data = data[-RING_SIZE:]
+        end = (self._start + self._len) % RING_SIZE
+        first = min(len(data), RING_SIZE - end)
+        self._ring[end : end + first] = data[:first]
+        self._ring[: len(data) - first] = data[first:]
+        self._len += len(data)
+        if self._len > RING_SIZE:
+            self._drop(self._len - RING_SIZE)
+        if not self._capped and self._len >= RING_SIZE // 2:
+            self.flush()
+
+    def _drop(self, count: int) -> None:
+        """Forget the oldest `count` pending bytes."""
+        dropped = min(count, self._len)
+        self._start = (self._start + dropped) % RING_SIZE
+        self._len -= dropped
+        self.skipped += count
+
+    def _segments(self) -> list[memoryview]:
+        end = self._start + self._len
+        if end <= RING_SIZE:
+            return [self._ring[self._start : end]]
+        return [self._ring[self._start :], self._ring[: end - RING_SIZE]]
+
+    def _write(self, data: bytes) -> None:
+        if not data:
+            return
+        if self._file is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._file = open(self.path, "wb")  # noqa: SIM115 - closed in close()
+        self._file.write(data)
+        self.written += len(data)
+
+    def flush(self) -> None:
+        """Compress and write pending output, unless the cap was reached."""
+        if self._capped or not self._len:
+            return
+        for segment in self._segments():
+            self._write(self._zlib.compress(segment))
+        self._start = self._len = 0
+        if self.written >= self.max_bytes:
+            self._capped = True
+
+    def close(self) -> None:
+        """Write the retained tail and finish the gzip stream."""
+        if self._capped:
+            if self.skipped:
+                note = f"\n[contain-agent: {self.skipped} bytes of output omitted]\n"
+                self._write(self._zlib.compress(note.encode()))
+            for segment in self._segments():
+                self._write(self._zlib.compress(segment))
+            self._len = 0
+        else:
+            self.flush()
+        if self._file is not None:
+            self._write(self._zlib.flush())
+            self._file.close()
+
+
+def _write_all(fd: int, data: memoryview) -> None:
+    while data:
+        data = data[os.write(fd, data) :]
+
+
+def _copy_winsize(src: int, dst: int) -> None:
+    try:
+        size = fcntl.ioctl(src, termios.TIOCGWINSZ, b"\0" * 8)
+        fcntl.ioctl(dst, termios.TIOCSWINSZ, size)
+    except OSError:
+        pass
+
+
+def relay(
+    cmd: list[str],
+    transcript: Transcript | None,
+    on_output: Callable[[], None] | None = None,
+) -> int:
+    """Run `cmd`, relaying our terminal to it and recording its output, if asked.
+
+    When stdin is a terminal, `cmd` gets a pseudo-terminal and ours is put in
+    raw mode for the duration; otherwise its stdout is a pipe.
+    """
+    stdin_fd = sys.stdin.fileno()
+    stdout_fd = sys.stdout.fileno()
+    sys.stdout.flush()
+    interactive = os.isatty(stdin_fd)
+    saved_attrs = None
+    saved_winch = None
+    if interactive:
+        master, slave = os.openpty()
+        _copy_winsize(stdin_fd, master)
+        try:
+            proc = subprocess.Popen(cmd, stdin=slave, stdout=slave, stderr=slave)
+        finally:
+            os.close(slave)
+        saved_attrs = termios.tcgetattr(stdin_fd)
+        tty.setraw(stdin_fd)
+
+        def _on_winch(signum: int, frame: object) -> None:
+            _copy_winsize(stdin_fd, master)
+            proc.send_signal(signal.SIGWINCH)
+
+        saved_winch = signal.signal(signal.SIGWINCH, _on_winch)
+        sources = [master, stdin_fd]
+    else:
+        proc = subprocess.Popen(cmd, stdout=subprocess.PIPE)
+        master = proc.stdout.fileno()
+        sources = [master]
+
+    buf = bytearray(READ_SIZE)
+    view = memoryview(buf)
+    try:
+        while True:
+            try:
+                ready, _, _ = select.select(sources, [], [], IDLE_FLUSH)
+            except InterruptedError:
+                continue
+            if not ready:
+                if transcript is not None:
+                    transcript.flush()
+                continue
+            if stdin_fd in ready:
+                data = os.read(stdin_fd, READ_SIZE)
+                if data:
+                    _write_all(master, memoryview(data))
+                else:
+                    sources.remove(stdin_fd)
+            if master in ready:
+                try:
+                    n = os.readv(master, [buf])
+                except OSError as e:
+                    # The pty reports EIO once the child closed its side.
+                    if e.errno != errno.EIO:
+                        raise
+                    n = 0
+                if not n:
+                    break
+                if on_output is not None:
+                    on_output()
+                _write_all(stdout_fd, view[:n])
+                if transcript is not None:
+                    transcript.feed(view[:n])
+        return proc.wait()
+    finally:
+        if saved_attrs is not None:
+            termios.tcsetattr(stdin_fd, termios.TCSAFLUSH, saved_attrs)
+            signal.signal(signal.SIGWINCH, saved_winch)
+            os.close(master)
+        elif proc.stdout is not None:
+            proc.stdout.close()
+        if transcript is not None:
+            transcript.close()
@@ -0,0 +1,95 @@
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+CLI_CMD = [sys.executable, "-c", "from contain_agent import app; app()"]
+
+
+@pytest.fixture(scope="session")
+def fake_docker(tmp_path_factory):
+    docker_bin = tmp_path_factory.mktemp("bin") / "docker"
+    docker_bin.write_text(f"""#!{sys.executable}
+import json, os, sys, time
+
+log_file = os.environ.get("FAKE_DOCKER_LOG")
+args = sys.argv[1:]
+if log_file:
+    with open(log_file, "a") as f:
+        f.write(json.dumps(args) + "\\n")
+
+if args and args[0] == "ps":
+    print(os.environ.get("FAKE_DOCKER_PS", ""))
+
+if args and args[0] == "info":
+    print(os.environ.get("FAKE_DOCKER_INFO", ""))
+
+if args[:2] == ["volume", "ls"]:
+    print(os.environ.get("FAKE_DOCKER_VOLUMES", ""))
+
+if args[:2] == ["container", "inspect"]:
+    state = os.environ.get("FAKE_DOCKER_CONTAINER")
+    if state is None:
+        sys.exit(1)
+    print(state)
+    sys.exit(0)
+
+if any("missing" in a for a in args) and "inspect" in args:
+    sys.exit(1)
+
+if "inspect" in args and "--format" in args:
+    print("sha256:" + args[-1])
+
+if any("fail_build" in a for a in args) and "build" in args:
+    sys.exit(2)
+
+if any("fail_42" in a for a in args):
+    sys.exit(42)
+
+if any("emit_output" in a for a in args) and "run" in args:
+    print("out line", flush=True)
+    print("err line", file=sys.stderr, flush=True)
+
+if any("slow_job" in a for a in args):
+    time.sleep(30)
+
+sys.exit(0)
+""")
+    docker_bin.chmod(0o755)
+    return docker_bin
+
+
+@pytest.fixture
+def run_cli(fake_docker, tmp_path):
+    def _run(*args, home=None, cwd=None, fake_docker=None, env=None, cmd=CLI_CMD):
+        log_file = tmp_path / "docker_calls.log"
+        env = {
+            **os.environ,
+            "HOME": str(home or tmp_path / "home"),
+            "CONTAIN_AGENT_DOCKER_CMD": str(
+                fake_docker if fake_docker is not None else fake_docker_fixture
+            ),
+            "FAKE_DOCKER_LOG": str(log_file),
+            **(env or {}),
+        }
+        Path(env["HOME"]).mkdir(parents=True, exist_ok=True)
+        res = subprocess.run(
+            [*cmd, *args],
+            env=env,
+            cwd=str(cwd) if cwd else None,
+            capture_output=True,
+            text=True,
+            check=False,
+        )
+        calls = []
+        if log_file.exists():
+            for line in log_file.read_text().splitlines():
+                if line.strip():
+                    calls.append(json.loads(line))
+        return res, calls
+
+    fake_docker_fixture = fake_docker
+    return _run
@@ -0,0 +1,70 @@
+import json
+import os
+
+from contain_agent.artifacts import artifact_mounts, artifact_volume
+
+
+def test_volumes_keyed_by_workspace_and_path(tmp_path):
+    a, b = tmp_path / "a" / "ws", tmp_path / "b" / "ws"
+    assert artifact_volume(a, "node_modules") != artifact_volume(b, "node_modules")
+    assert artifact_volume(a, "node_modules").startswith("contain-agent-artifacts-ws-")
+    assert artifact_mounts(a, ["target/", "web/node_modules"]) == [
+        (artifact_volume(a, "target"), "/workspace/ws/target"),
+        (artifact_volume(a, "web/node_modules"), "/workspace/ws/web/node_modules"),
+    ]
+
+
+def test_artifact_dirs_overlaid_with_volumes(run_cli, tmp_path):
+    ws = tmp_path / "ws"
+    ws.mkdir()
+    (ws / ".contain-agent.json").write_text(
+        json.dumps({"artifact_dirs": ["node_modules", ".venv"]})
+    )
+    res, calls = run_cli(str(ws))
+    assert res.returncode == 0, res.stderr
+    run = calls[-1]
+    volume = artifact_volume(ws, "node_modules")
+    assert f"{volume}:/workspace/ws/node_modules" in run
+    assert f"{artifact_volume(ws, '.venv')}:/workspace/ws/.venv" in run
+    registry = json.loads(
+        (tmp_path / "home" / ".contain-agent" / "artifacts.json").read_text()
+    )
+    assert registry[volume] == {"workspace": str(ws.resolve()), "path": "node_modules"}
+    # New volumes are handed to the agent user before the run mounts them.
+    chown = next(c for c in calls if "chown" in c)
+    assert chown[chown.index("--user") + 1] == "root"
+    assert f"{volume}:/artifacts/0" in chown
+    assert chown[-3:] == [str(os.getuid()), "/artifacts/0", "/artifacts/1"]
+    before = len(calls)
+    res, calls = run_cli(str(ws))
+    assert res.returncode == 0, res.stderr
+    assert not any("chown" in c for c in calls[before:])
+
+    res, calls = run_cli(
+        "artifacts",
+        cwd=ws,
+        env={"FAKE_DOCKER_VOLUMES": f"{volume}\ncontain-agent-artifacts-other-1-x"},
+    )
+    assert res.returncode == 0, res.stderr
+    assert volume in res.stdout
+    assert "other" not in res.stdout
+
+    res, calls = run_cli(
+        "artifacts", "--all", "--purge", env={"FAKE_DOCKER_VOLUMES": volume}
+    )
+    assert res.returncode == 0, res.stderr
+    assert ["volume", "rm", volume] in calls
+    registry = json.loads(
+        (tmp_path / "home" / ".contain-agent" / "artifacts.json").read_text()
+    )
+    assert volume not in registry
+
+
+def test_artifact_dir_outside_workspace_rejected(run_cli, tmp_path):
+    ws = tmp_path / "ws"
+    ws.mkdir()
+    (ws / ".contain-agent.json").write_text(json.dumps({"artifact_dirs": ["../x"]}))
+    res, calls = run_cli(str(ws))
+    assert res.returncode == 1
+    assert "must be a path inside the workspace" in res.stderr
+    assert not any(c[0] == "run" for c in calls)
@@ -0,0 +1,73 @@
+import json
+
+from contain_agent.batch import load_batch_manifest
+
+
+def test_load_batch_manifest_jsonl(tmp_path):
+    manifest = tmp_path / "jobs.jsonl"
+    manifest.write_text(
+        '{"workspace": "a", "command": "yclaude -p \'fix it\'"}\n'
+        "\n"
+        '{"command": ["ls", "-la"], "image": "img", "network": "net", "name": "n"}\n'
+    )
+    jobs = load_batch_manifest(manifest)
+    assert jobs[0].workspace == tmp_path / "a"
+    assert jobs[0].command == ["yclaude", "-p", "fix it"]
+    assert jobs[1].workspace is None
+    assert (jobs[1].image, jobs[1].network, jobs[1].name) == ("img", "net", "n")
+
+
+def test_batch_runs_jobs_and_reports(run_cli, tmp_path):
+    for name in ("one", "two"):
+        (tmp_path / name).mkdir()
+    manifest = tmp_path / "jobs.json"
+    manifest.write_text(
+        json.dumps(
+            [
+                {"workspace": "one", "command": "echo hi"},
+                {"workspace": "two", "command": ["fail_42"], "network": "net"},
+            ]
+        )
+    )
+    out = tmp_path / "out"
+    res, calls = run_cli("batch", str(manifest), "--output-dir", str(out), "-j", "2")
+    assert res.returncode == 1
+    assert "1/2 jobs succeeded" in res.stderr
+
+    summary = json.loads((out / "summary.json").read_text())
+    assert [(r["name"], r["exit_code"]) for r in summary] == [
+        ("1-one", 0),
+        ("2-two", 42),
+    ]
+    assert (out / "1-one.log").exists()
+
+    runs = [c for c in calls if c[0] == "run"]
+    assert len(runs) == 2
+    for call in runs:
+        assert "-i" in call and "-it" not in call
+        assert call[call.index("--name") + 1].startswith("contain-agent-batch-")
+    failing = next(c for c in runs if "fail_42" in c[-1])
+    assert failing[failing.index("--network") + 1] == "net"
+
+
+def test_batch_timeout_removes_container(run_cli, tmp_path):
+    manifest = tmp_path / "jobs.json"
+    manifest.write_text(json.dumps([{"command": "slow_job"}]))
+    out = tmp_path / "out"
+    res, calls = run_cli(
+        "batch", str(manifest), "--output-dir", str(out), "--timeout", "0.5"
+    )
+    assert res.returncode == 1
+    summary = json.loads((out / "summary.json").read_text())
+    assert summary[0]["exit_code"] == 124
+    run = next(c for c in calls if c[0] == "run")
+    container = run[run.index("--name") + 1]
+    assert ["rm", "-f", container] in calls
+
+
+def test_batch_bad_manifest(run_cli, tmp_path):
+    manifest = tmp_path / "jobs.json"
+    manifest.write_text(json.dumps([{"command": 3}]))
+    res, _ = run_cli("batch", str(manifest))
+    assert res.returncode == 1
+    assert "Cannot load batch manifest" in res.stderr
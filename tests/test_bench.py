@@ -0,0 +1,45 @@
+import json
+import sys
+
+import pytest
+
+from contain_agent.bench import BenchmarkError, _run_quiet, compare, main
+
+
+def _results(**medians):
+    return {"metrics": {k: {"median_ms": v} for k, v in medians.items()}}
+
+
+def test_compare_flags_only_real_regressions():
+    baseline = _results(launch=100.0, argv=0.01, gone=5.0)
+    current = _results(launch=140.0, argv=0.05, new=1.0)
+    assert compare(baseline, current, 0.25) == ["launch: 100.00ms -> 140.00ms (+40%)"]
+    assert compare(baseline, current, 0.5) == []
+
+
+def test_run_and_compare_cli(tmp_path, capsys):
+    out = tmp_path / "results.json"
+    assert main(["run", "--no-daemon", "-n", "1", "-o", str(out)]) == 0
+    metrics = json.loads(out.read_text())["metrics"]
+    assert {
+        "import_cli",
+        "launch_full",
+        "launch_plan",
+        "settings_and_config_discovery",
+        "argv_construction",
+    } <= metrics.keys()
+
+    assert main(["compare", str(out), str(out)]) == 0
+    slower = tmp_path / "slower.json"
+    data = json.loads(out.read_text())
+    data["metrics"]["launch_full"]["median_ms"] *= 10
+    slower.write_text(json.dumps(data))
+    assert main(["compare", str(out), str(slower)]) == 1
+    assert "REGRESSION launch_full" in capsys.readouterr().err
+
+
+def test_failing_command_aborts_benchmark():
+    crash = [sys.executable, "-c", "import sys; sys.exit('boom')"]
+    with pytest.raises(BenchmarkError, match="exited with status 1: boom"):
+        _run_quiet(crash)
+    _run_quiet(crash, check=False)
@@ -0,0 +1,72 @@
+import os
+
+from contain_agent.buildcache import (
+    BuildCache,
+    finish_export,
+    image_cache_dir,
+    prune_caches,
+    use_build_cache,
+)
+from contain_agent.docker import build_spec_command, image_build_spec
+
+
+def _export(path, size, mtime):
+    path.mkdir(parents=True)
+    (path / "index.json").write_text("{}")
+    (path / "blob").write_bytes(b"x" * size)
+    os.utime(path, (mtime, mtime))
+
+
+def test_cached_build_imports_and_exports(tmp_path):
+    cache = BuildCache(tmp_path / "cache")
+    spec = image_build_spec("img")
+    use_build_cache(spec, cache, "img")
+    cmd = build_spec_command(spec)
+    assert cmd[1:6] == ["buildx", "build", "--builder", "contain-agent", "--load"]
+    assert "--cache-from" not in cmd
+    staging = cmd[cmd.index("--cache-to") + 1]
+    assert staging == f"type=local,dest={tmp_path / 'cache' / '.img.new'},mode=max"
+
+    _export(tmp_path / "cache" / ".img.new", 10, 1000)
+    finish_export(cache, "img", ok=True)
+    cache_dir = image_cache_dir(cache, "img")
+    assert (cache_dir / "index.json").is_file()
+    assert not (tmp_path / "cache" / ".img.new").exists()
+
+    spec = image_build_spec("img")
+    use_build_cache(spec, cache, "img")
+    cmd = build_spec_command(spec)
+    assert cmd[cmd.index("--cache-from") + 1] == f"type=local,src={cache_dir}"
+
+
+def test_failed_build_keeps_previous_cache(tmp_path):
+    cache = BuildCache(tmp_path)
+    _export(tmp_path / "img", 10, 1000)
+    _export(tmp_path / ".img.new", 20, 2000)
+    finish_export(cache, "img", ok=False)
+    assert (tmp_path / "img" / "blob").stat().st_size == 10
+    assert not (tmp_path / ".img.new").exists()
+
+
+def test_prune_removes_least_recently_built(tmp_path):
+    cache = BuildCache(tmp_path, max_mb=1)
+    _export(tmp_path / "old", 400_000, 1000)
+    _export(tmp_path / "newer", 400_000, 2000)
+    _export(tmp_path / "kept", 400_000, 500)
+    assert prune_caches(cache, keep=tmp_path / "kept") == [tmp_path / "old"]
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["kept", "newer"]
+    assert prune_caches(BuildCache(tmp_path, max_mb=0)) == []
+
+
+def test_run_builds_with_cache_dir(run_cli, tmp_path):
+    ws = tmp_path / "ws"
+    ws.mkdir()
+    cache_dir = tmp_path / "layers"
+    res, calls = run_cli(
+        "--cache-dir", str(cache_dir), "--image", "missing-img", str(ws)
+    )
+    assert res.returncode == 0, res.stderr
+    assert ["buildx", "inspect", "contain-agent"] in calls
+    build = next(c for c in calls if c[:2] == ["buildx", "build"])
+    assert f"type=local,dest={cache_dir / '.missing-img.new'},mode=max" in build
+    assert cache_dir.is_dir()
@@ -0,0 +1,34 @@
+from contain_agent.caches import (
+    PRUNE_INTERVAL,
+    cache_limits,
+    prune_command,
+    prune_due,
+)
+
+
+def test_prune_due_starts_clock_then_waits_interval(tmp_path):
+    assert not prune_due(tmp_path, now=1000.0)
+    assert not prune_due(tmp_path, now=1000.0 + PRUNE_INTERVAL - 1)
+    assert prune_due(tmp_path, now=1000.0 + PRUNE_INTERVAL)
+    assert not prune_due(tmp_path, now=1000.0 + PRUNE_INTERVAL + 1)
+
+
+def test_cache_limits_and_prune_command():
+    limits = cache_limits({"uv": "/a", "npm": "/b"}, 100, {"npm": 0})
+    assert limits == {"uv": 100 * 1024 * 1024}
+    cmd = prune_command("img:abc", limits)
+    assert "contain-agent-cache-uv:/caches/uv" in cmd
+    assert cmd[cmd.index("img:abc") + 1 :][0] == "-c"
+    assert cmd[-1].endswith(f"trim /caches/uv {100 * 1024 * 1024}")
+
+
+def test_run_mounts_cache_volumes(run_cli, tmp_path):
+    ws = tmp_path / "ws"
+    ws.mkdir()
+    res, calls = run_cli(str(ws))
+    assert res.returncode == 0
+    assert "contain-agent-cache-uv:/home/agent/.cache/uv" in calls[-1]
+    assert "contain-agent-cache-npm:/home/agent/.npm" in calls[-1]
+
+    res, calls = run_cli("--no-package-caches", str(ws))
+    assert not any("contain-agent-cache-" in arg for arg in calls[-1])
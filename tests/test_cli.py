@@ -2,70 +2,6 @@ import json
 import os
 import subprocess
 import sys
-from pathlib import Path
-
-import pytest
-
-CLI_CMD = [sys.executable, "-c", "from contain_agent import app; app()"]
-
-
-@pytest.fixture(scope="session")
-def fake_docker(tmp_path_factory):
-    docker_bin = tmp_path_factory.mktemp("bin") / "docker"
-    docker_bin.write_text(f"""#!{sys.executable}
-import json, os, sys
-
-log_file = os.environ.get("FAKE_DOCKER_LOG")
-args = sys.argv[1:]
-if log_file:
-    with open(log_file, "a") as f:
-        f.write(json.dumps(args) + "\\n")
-
-if any("missing" in a for a in args) and "inspect" in args:
-    sys.exit(1)
-
-if any("fail_build" in a for a in args) and "build" in args:
-    sys.exit(2)
-
-if any("fail_42" in a for a in args):
-    sys.exit(42)
-
-sys.exit(0)
-""")
-    docker_bin.chmod(0o755)
-    return docker_bin
-
-
-@pytest.fixture
-def run_cli(fake_docker, tmp_path):
-    def _run(*args, home=None, cwd=None, fake_docker=None):
-        log_file = tmp_path / "docker_calls.log"
-        env = {
-            **os.environ,
-            "HOME": str(home or tmp_path / "home"),
-            "CONTAIN_AGENT_DOCKER_CMD": str(
-                fake_docker if fake_docker is not None else fake_docker_fixture
-            ),
-            "FAKE_DOCKER_LOG": str(log_file),
-        }
-        Path(env["HOME"]).mkdir(parents=True, exist_ok=True)
-        res = subprocess.run(
-            [*CLI_CMD, *args],
-            env=env,
-            cwd=str(cwd) if cwd else None,
-            capture_output=True,
-            text=True,
-            check=False,
-        )
-        calls = []
-        if log_file.exists():
-            for line in log_file.read_text().splitlines():
-                if line.strip():
-                    calls.append(json.loads(line))
-        return res, calls
-
-    fake_docker_fixture = fake_docker
-    return _run
 
 
 def test_default_invocation(run_cli, tmp_path):
@@ -74,13 +10,25 @@ def test_default_invocation(run_cli, tmp_path):
     res, calls = run_cli(cwd=ws)
     assert res.returncode == 0
     assert len(calls) == 2  # image inspect + run
-    assert calls[0] == ["image", "inspect", "contain-agent"]
+    assert calls[0][:4] == ["image", "inspect", "--format", "{{.Id}}"]
+    assert calls[0][4].startswith("contain-agent:")
     run_args = calls[1]
     assert run_args[0] == "run"
     assert "--rm" in run_args
     assert f"{ws.resolve()}:/workspace/my_project" in run_args
     assert "/workspace/my_project" in run_args
     assert run_args[-3:] == ["bash", "-l", "-i"]
+    assert calls[0][4] in run_args
+
+
+def test_image_id_cached_between_runs(run_cli, tmp_path):
+    ws = tmp_path / "proj"
+    ws.mkdir()
+    res, calls = run_cli(str(ws))
+    assert res.returncode == 0
+    res, calls = run_cli(str(ws))
+    assert res.returncode == 0
+    assert [c[0] for c in calls] == ["image", "run", "run"]
 
 
 def test_mount_dir_and_command(run_cli, tmp_path):
@@ -108,6 +56,27 @@ def test_command_flags_passed_intact(run_cli, tmp_path):
     ]
 
 
+def test_direct_exec_skips_login_shell(run_cli, tmp_path):
+    ws = tmp_path / "proj"
+    ws.mkdir()
+    res, calls = run_cli("--exec", str(ws), "cat", "bar.txt")
+    assert res.returncode == 0
+    assert calls[-1][-3:] == [calls[0][-1], "cat", "bar.txt"]
+
+    # Without a command there is nothing to exec but the shell.
+    res, calls = run_cli("--exec", str(ws))
+    assert calls[-1][-3:] == ["bash", "-l", "-i"]
+
+    # "auto" applies to commands run without a terminal, like this one.
+    settings = tmp_path / "home" / ".contain-agent" / "settings.json"
+    settings.parent.mkdir(parents=True, exist_ok=True)
+    settings.write_text(json.dumps({"direct_exec": "auto"}))
+    res, calls = run_cli(str(ws), "ls")
+    assert calls[-1][-1] == "ls" and "bash" not in calls[-1]
+    res, calls = run_cli("--login-shell", str(ws), "ls")
+    assert calls[-1][-5:] == ["bash", "-l", "-i", "-c", "ls"]
+
+
 def test_no_mount(run_cli):
     res, calls = run_cli("--no-mount", "ls", "-la")
     assert res.returncode == 0
@@ -214,11 +183,12 @@ def test_build_image_flag(run_cli, tmp_path):
     ws.mkdir()
     res, calls = run_cli("--build-image", str(ws))
     assert res.returncode == 0
-    assert len(calls) == 3  # inspect + build + run
-    build_args = calls[1]
+    assert len(calls) == 3  # build + inspect + run
+    build_args = calls[0]
     assert build_args[0] == "build"
     assert "-t" in build_args
     assert "contain-agent" in build_args
+    assert any(a.startswith("contain-agent:") for a in build_args)
     assert "-f" in build_args
     assert "Dockerfile" in build_args[build_args.index("-f") + 1]
     assert "--no-cache" not in build_args
@@ -231,11 +201,45 @@ def test_fresh_rebuild_image_flag(run_cli, tmp_path):
     ws.mkdir()
     res, calls = run_cli("--fresh-rebuild-image", str(ws))
     assert res.returncode == 0
-    assert len(calls) == 3  # inspect + build + run
-    build_args = calls[1]
+    assert len(calls) == 4  # build + inspect + read agent versions + run
+    build_args = calls[0]
     assert "--build-arg" in build_args
     assert f"UID={os.getuid()}" in build_args
     assert any(a.startswith("CACHE_BUST=") for a in build_args)
+    for agent in ("CLAUDE", "CODEX", "ANTIGRAVITY"):
+        assert any(a.startswith(f"CACHE_BUST_{agent}=") for a in build_args)
+    assert calls[2][:2] == ["run", "--rm"]
+    assert calls[3][-3:] == ["bash", "-l", "-i"]
+
+
+def test_fresh_rebuild_selected_agents(run_cli, tmp_path):
+    ws = tmp_path / "ws"
+    ws.mkdir()
+    res, calls = run_cli("--fresh-rebuild-image=claude,codex", str(ws), "ls")
+    assert res.returncode == 0
+    build_args = calls[0]
+    assert any(a.startswith("CACHE_BUST_CLAUDE=") for a in build_args)
+    assert any(a.startswith("CACHE_BUST_CODEX=") for a in build_args)
+    assert not any(a.startswith("CACHE_BUST_ANTIGRAVITY=") for a in build_args)
+    assert calls[-1][-5:] == ["bash", "-l", "-i", "-c", "ls"]
+
+
+def test_fresh_rebuild_unknown_agent(run_cli, tmp_path):
+    ws = tmp_path / "ws"
+    ws.mkdir()
+    res, calls = run_cli("--fresh-rebuild-image=nope", str(ws))
+    assert res.returncode == 1
+    assert "Unknown agent(s) for --fresh-rebuild-image: nope" in res.stderr
+    assert calls == []
+
+
+def test_agent_version_report(tmp_path, monkeypatch):
+    from contain_agent.images import record_agent_versions
+
+    monkeypatch.setenv("HOME", str(tmp_path))
+    assert record_agent_versions("img", {"claude": "1.0"}) == {}
+    assert record_agent_versions("img", {"claude": "1.1"}) == {"claude": "1.0"}
+    assert record_agent_versions("img", {}) == {"claude": "1.1"}
 
 
 def test_no_cache_rebuild_image_flag(run_cli, tmp_path):
@@ -243,8 +247,8 @@ def test_no_cache_rebuild_image_flag(run_cli, tmp_path):
     ws.mkdir()
     res, calls = run_cli("--no-cache-rebuild-image", str(ws))
     assert res.returncode == 0
-    assert len(calls) == 3  # inspect + build + run
-    build_args = calls[1]
+    assert len(calls) == 3  # build + inspect + run
+    build_args = calls[0]
     assert "--no-cache" in build_args
     assert f"UID={os.getuid()}" in build_args
 
@@ -254,17 +258,56 @@ def test_auto_build_when_image_missing(run_cli, tmp_path):
     ws.mkdir()
     res, calls = run_cli("--image", "missing-image", str(ws))
     assert res.returncode == 0
-    assert len(calls) == 3  # inspect (failed) + build + run
-    assert calls[0] == ["image", "inspect", "missing-image"]
+    assert len(calls) == 4  # inspect (failed) + build + inspect + run
+    assert calls[0][:2] == ["image", "inspect"]
+    assert calls[0][-1].startswith("missing-image:")
     assert calls[1][0] == "build"
     assert "missing-image" in calls[1]
-    assert calls[2][0] == "run"
-    assert "missing-image" in calls[2]
+    assert calls[0][-1] in calls[1]
+    assert calls[3][0] == "run"
+    assert calls[0][-1] in calls[3]
     assert (
         "Docker image 'missing-image' not found locally. Building it..." in res.stderr
     )
 
 
+def test_dry_run_writes_no_dockerfile(run_cli, tmp_path):
+    home = tmp_path / "home"
+    ws = tmp_path / "ws"
+    ws.mkdir()
+    dockerfile = home / ".contain-agent" / "build" / "Dockerfile"
+
+    res, _ = run_cli("--dry-run", "--image", "missing-image", str(ws), home=home)
+    assert res.returncode == 0
+    assert f"-f {dockerfile}" in res.stdout
+    assert not dockerfile.exists()
+
+    res, _ = run_cli("--image", "missing-image", str(ws), home=home)
+    assert res.returncode == 0
+    assert dockerfile.is_file()
+
+
+def test_profile_builds_and_runs_its_own_image(run_cli, tmp_path):
+    ws = tmp_path / "ws"
+    ws.mkdir()
+    res, calls = run_cli("--image", "missing-image", "--profile", "minimal", str(ws))
+    assert res.returncode == 0
+    assert calls[0][-1].startswith("missing-image-minimal:")
+    build = calls[1]
+    assert build[0] == "build"
+    assert build[build.index("--target") + 1] == "minimal"
+    assert "missing-image-minimal" in build
+    assert calls[0][-1] in build
+    assert calls[-1][0] == "run"
+    assert calls[0][-1] in calls[-1]
+
+    before = len(calls)
+    res, calls = run_cli("--profile", "nope", str(ws))
+    assert res.returncode == 1
+    assert "Unknown image profile 'nope'" in res.stderr
+    assert calls[before:] == []
+
+
 def test_auto_build_failure_propagation(run_cli, tmp_path):
     ws = tmp_path / "ws"
     ws.mkdir()
@@ -325,6 +368,27 @@ def test_build_image_command_uid():
     assert cmd_custom[idx + 1] == "UID=1234"
 
 
+def test_profile_image_names():
+    from contain_agent.docker import profile_image
+
+    assert profile_image("contain-agent", None) == "contain-agent"
+    assert profile_image("contain-agent", "full") == "contain-agent"
+    assert profile_image("contain-agent", "web") == "contain-agent-web"
+    assert profile_image("custom:v1", "web") == "custom-web:v1"
+    assert profile_image("registry:5000/agent", "web") == "registry:5000/agent-web"
+
+
+def test_content_image_tag(tmp_path):
+    from contain_agent.docker import content_image_tag
+
+    tag = content_image_tag("contain-agent", uid=1000)
+    assert tag.startswith("contain-agent:")
+    assert content_image_tag("contain-agent", uid=1000) == tag
+    assert content_image_tag("contain-agent", uid=1001) != tag
+    assert content_image_tag("custom:v1") == "custom:v1"
+    assert content_image_tag("registry:5000/agent").startswith("registry:5000/agent:")
+
+
 def test_load_valid_settings(tmp_path):
     from contain_agent import load_settings
 
@@ -356,6 +420,114 @@ def test_load_invalid_settings(tmp_path):
     assert load_settings(p2) == Settings()
 
 
+def test_project_settings_override_global(tmp_path):
+    from contain_agent import load_settings
+
+    global_file = tmp_path / "settings.json"
+    global_file.write_text(
+        json.dumps({"default_command": "claude", "network": "global", "cpus": 2})
+    )
+    project = tmp_path / "project"
+    ws = project / "pkg" / "sub"
+    ws.mkdir(parents=True)
+    (project / ".contain-agent.json").write_text(
+        json.dumps({"network": "proj", "mounts": ["data:/data:ro"]})
+    )
+
+    s = load_settings(global_file, workspace=ws)
+    assert s.default_command == "claude"
+    assert s.cpus == 2
+    assert s.network == "proj"
+    assert s.mounts == [f"{(project / 'data').resolve()}:/data:ro"]
+    assert load_settings(global_file).network == "global"
+
+    (project / ".contain-agent.json").write_text(json.dumps({"image": "custom"}))
+    s = load_settings(global_file, workspace=ws)
+    assert (s.image, s.network) == ("custom", "global")
+
+
+def test_load_settings_twice_uses_memo(tmp_path):
+    from contain_agent import load_settings
+
+    settings_file = tmp_path / "settings.json"
+    settings_file.write_text(json.dumps({"default_args": ["--verbose"]}))
+    first = load_settings(settings_file, workspace=tmp_path)
+    first.default_args.append("--changed")
+    second = load_settings(settings_file, workspace=tmp_path)
+    assert second.default_args == ["--verbose"]
+
+    settings_file.write_text(json.dumps({"default_args": ["--quiet", "-x"]}))
+    assert load_settings(settings_file).default_args == ["--quiet", "-x"]
+
+
+def test_import_reads_no_settings(tmp_path):
+    code = """
+import sys
+home = sys.argv[1]
+opened = []
+sys.addaudithook(
+    lambda event, args: opened.append(str(args[0]))
+    if event == "open" and str(args[0]).startswith(home)
+    else None
+)
+import contain_agent
+import contain_agent.cli
+assert not opened, opened
+"""
+    home = tmp_path / "home"
+    (home / ".contain-agent").mkdir(parents=True)
+    (home / ".contain-agent" / "settings.json").write_text("{}")
+    res = subprocess.run(
+        [sys.executable, "-c", code, str(home)],
+        env={**os.environ, "HOME": str(home)},
+        capture_output=True,
+        text=True,
+        check=False,
+    )
+    assert res.returncode == 0, res.stderr
+
+
+def test_project_settings_apply_to_run(run_cli, tmp_path):
+    ws = tmp_path / "ws"
+    ws.mkdir()
+    (ws / ".contain-agent.json").write_text(
+        json.dumps({"image": "proj-img", "network": "net", "memory": "2g"})
+    )
+    res, calls = run_cli(str(ws))
+    assert res.returncode == 0
+    run_args = calls[-1]
+    assert run_args[run_args.index("--network") + 1] == "net"
+    assert run_args[run_args.index("--memory") + 1] == "2g"
+    assert any(arg.startswith("proj-img:") for arg in run_args)
+
+
+def test_resource_limits_and_auto_partition(run_cli, tmp_path):
+    ws = tmp_path / "ws"
+    ws.mkdir()
+    res, calls = run_cli("--cpus", "2", "--pids-limit", "512", str(ws))
+    assert res.returncode == 0
+    run_args = calls[-1]
+    assert run_args[run_args.index("--cpus") + 1] == "2"
+    assert run_args[run_args.index("--pids-limit") + 1] == "512"
+    assert "--cpuset-cpus" not in run_args
+
+    res, calls = run_cli(
+        "--auto-resources",
+        str(ws),
+        env={"FAKE_DOCKER_INFO": f"8 {16 << 30}", "FAKE_DOCKER_PS": "0-3"},
+    )
+    assert res.returncode == 0
+    run_args = calls[-1]
+    assert run_args[run_args.index("--cpuset-cpus") + 1] == "4-7"
+    assert run_args[run_args.index("--memory") + 1] == "8192m"
+    assert run_args[run_args.index("--label") + 1] == "contain-agent.cpuset=4-7"
+
+    res, calls = run_cli("--auto-resources", str(ws))
+    assert res.returncode == 0
+    assert "running without automatic limits" in res.stderr
+    assert "--cpuset-cpus" not in calls[-1]
+
+
 def test_default_command_changes_command_line(run_cli, tmp_path):
     home = tmp_path / "home"
     agent_dir = home / ".contain-agent"
@@ -0,0 +1,117 @@
+from pathlib import Path
+
+import pytest
+
+from contain_agent.dockerfile import (
+    generated_dockerfile,
+    load_manifest,
+    parse_manifest,
+    render_dockerfile,
+)
+
+PACKAGED_DOCKERFILE = (
+    Path(__file__).parent.parent / "src" / "contain_agent" / "Dockerfile"
+)
+
+SMALL_MANIFEST = """
+base_image = "ubuntu:26.04"
+packages = ["curl"]
+path = ["/home/agent/.local/bin"]
+
+[[toolchain]]
+name = "node"
+run = ["install-node"]
+copy = ["/home/agent/.node"]
+
+[[agent]]
+name = "tool"
+from = "node"
+run = ["npm install -g tool"]
+copy = ["/home/agent/.node"]
+"""
+
+
+def test_packaged_dockerfile_matches_manifest():
+    # Regenerate with: python -m contain_agent.dockerfile > src/contain_agent/Dockerfile
+    assert render_dockerfile(load_manifest()) == PACKAGED_DOCKERFILE.read_text()
+
+
+def test_toolchains_built_in_parallel_stages():
+    rendered = render_dockerfile(load_manifest())
+    for name in ("uv", "fnm", "bun", "deno", "rust"):
+        assert f"FROM base AS toolchain-{name}" in rendered
+    assert "FROM toolchain-fnm AS agent-codex" in rendered
+    assert (
+        "COPY --from=toolchain-rust --chown=agent:agent /home/agent/.cargo" in rendered
+    )
+
+
+def test_descendant_stage_supersedes_copy():
+    rendered = render_dockerfile(parse_manifest(SMALL_MANIFEST))
+    assert "COPY --from=toolchain-node" not in rendered
+    assert (
+        "COPY --from=agent-tool --chown=agent:agent /home/agent/.node /home/agent/.node"
+        in rendered
+    )
+    assert rendered.index("ARG CACHE_BUST\nRUN date") < rendered.index(
+        "COPY --from=agent-tool"
+    )
+
+
+def test_unknown_parent_stage_rejected():
+    with pytest.raises(ValueError, match="unknown"):
+        parse_manifest(SMALL_MANIFEST.replace('from = "node"', 'from = "nope"'))
+
+
+def test_generated_dockerfile_written_to_state_dir(tmp_path, monkeypatch):
+    monkeypatch.setenv("HOME", str(tmp_path))
+    path = generated_dockerfile()
+    assert path == tmp_path / ".contain-agent" / "build" / "Dockerfile"
+    assert path.read_text() == PACKAGED_DOCKERFILE.read_text()
+
+
+def test_cache_directories_created_in_image():
+    manifest = load_manifest()
+    assert manifest.caches["npm"] == "/home/agent/.npm"
+    assert manifest.caches["cargo-registry"] == "/home/agent/.cargo/registry"
+    rendered = render_dockerfile(manifest)
+    assert f"RUN mkdir -p {' '.join(manifest.caches.values())}" in rendered
+
+
+def test_profiles_share_base_layers():
+    manifest = load_manifest()
+    assert [p.name for p in manifest.profiles] == ["minimal", "web", "full"]
+    rendered = render_dockerfile(manifest)
+    assert "FROM base AS packages-web" in rendered
+    assert "FROM packages-web AS packages-full" in rendered
+    assert "FROM base AS minimal" in rendered
+    assert "FROM packages-web AS web" in rendered
+    # The default profile is the last stage, built when no --target is given.
+    assert rendered.rindex("FROM ") == rendered.index("FROM packages-full AS full")
+    minimal = rendered[rendered.index("AS minimal") : rendered.index("AS web\n")]
+    assert "toolchain-rust" not in minimal
+    assert "ffmpeg" not in rendered[: rendered.index("AS packages-full")]
+
+
+def test_manifest_without_profiles_has_default():
+    rendered = render_dockerfile(parse_manifest(SMALL_MANIFEST))
+    assert "FROM base AS full" in rendered
+
+
+def test_profile_with_unknown_toolchain_rejected():
+    manifest = (
+        SMALL_MANIFEST
+        + """
+[[profile]]
+name = "full"
+toolchains = ["nope"]
+"""
+    )
+    with pytest.raises(ValueError, match="unknown toolchain"):
+        parse_manifest(manifest)
+
+
+def test_toolchain_environment_baked_into_image():
+    rendered = render_dockerfile(load_manifest())
+    assert "/home/agent/.local/share/fnm/aliases/default/bin:${PATH}" in rendered
+    assert 'ENV FNM_DIR="/home/agent/.local/share/fnm"' in rendered
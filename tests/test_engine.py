@@ -0,0 +1,158 @@
+import json
+import socketserver
+import struct
+import threading
+from http.server import BaseHTTPRequestHandler
+from pathlib import Path
+
+import pytest
+
+from contain_agent.engine import EngineClient, container_config, run_container
+
+
+class FakeEngineHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        super().setup()
+        self.server.connections += 1
+
+    def log_message(self, *args):
+        pass
+
+    def _reply(self, status, body=b"", content_type="application/json"):
+        if isinstance(body, (dict, list)):
+            body = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_body(self):
+        if self.headers.get("Transfer-Encoding") == "chunked":
+            data = b""
+            while True:
+                size = int(self.rfile.readline().strip(), 16)
+                if size == 0:
+                    self.rfile.readline()
+                    return data
+                data += self.rfile.read(size)
+                self.rfile.readline()
+        return self.rfile.read(int(self.headers.get("Content-Length", 0)))
+
+    def do_GET(self):
+        self.server.requests.append(("GET", self.path))
+        if self.path == "/v1.41/_ping":
+            self._reply(200, b"OK", "text/plain")
+        elif self.path.startswith("/v1.41/images/missing"):
+            self._reply(404, {"message": "No such image"})
+        elif self.path.startswith("/v1.41/images/"):
+            self._reply(200, {"Id": "sha256:abc"})
+        else:
+            self._reply(404, {"message": "not found"})
+
+    def do_POST(self):
+        self.server.requests.append(("POST", self.path))
+        body = self._read_body()
+        if self.path.startswith("/v1.41/containers/create"):
+            self.server.created = json.loads(body)
+            self._reply(201, {"Id": "c1"})
+        elif self.path.startswith("/v1.41/containers/c1/attach"):
+            self.send_response(101)
+            self.send_header("Connection", "Upgrade")
+            self.send_header("Upgrade", "tcp")
+            self.end_headers()
+            for stream, data in ((1, b"hello\n"), (2, b"oops\n")):
+                self.wfile.write(struct.pack(">BxxxL", stream, len(data)) + data)
+            self.wfile.flush()
+            self.close_connection = True
+        elif self.path.startswith("/v1.41/containers/c1/wait"):
+            self._reply(200, {"StatusCode": 3})
+        elif self.path.startswith("/v1.41/containers/c1/start"):
+            self._reply(204)
+        else:
+            self._reply(404, {"message": "not found"})
+
+
+@pytest.fixture
+def fake_engine(tmp_path):
+    socket_path = tmp_path / "docker.sock"
+    server = socketserver.ThreadingUnixStreamServer(str(socket_path), FakeEngineHandler)
+    server.daemon_threads = True
+    server.connections = 0
+    server.requests = []
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server, f"unix://{socket_path}"
+    server.shutdown()
+    server.server_close()
+
+
+def test_connection_reused(fake_engine):
+    server, host = fake_engine
+    client = EngineClient(host)
+    assert client.ping()
+    assert client.inspect_image("contain-agent:abc")["Id"] == "sha256:abc"
+    assert client.inspect_image("missing") is None
+    assert server.connections == 1
+    client.close()
+
+
+def test_container_config_matches_cli_options(tmp_path):
+    ws = tmp_path / "proj"
+    ws.mkdir()
+    env_file = tmp_path / ".env"
+    env_file.write_text("# comment\nFOO=bar\n")
+    config = container_config(
+        image="img:abc",
+        workspace_path=ws,
+        config_mounts=[("/home/u/.claude", "/home/agent/.claude")],
+        env_file_path=env_file,
+        command=["ls", "-la"],
+        network="net",
+        rm=False,
+        interactive=False,
+    )
+    assert config["Image"] == "img:abc"
+    assert config["Cmd"] == ["bash", "-l", "-i", "-c", "ls -la"]
+    assert config["WorkingDir"] == "/workspace/proj"
+    assert config["Env"] == ["FOO=bar"]
+    assert config["Tty"] is False
+    assert config["HostConfig"] == {
+        "Binds": [
+            "/home/u/.claude:/home/agent/.claude",
+            f"{ws.resolve()}:/workspace/proj",
+        ],
+        "AutoRemove": False,
+        "NetworkMode": "net",
+    }
+
+
+def test_run_container_demuxes_output(fake_engine, capfd):
+    server, host = fake_engine
+    client = EngineClient(host)
+    config = container_config(image="img", command=["true"], interactive=False)
+    outputs = []
+    assert run_container(client, config, on_output=lambda: outputs.append(1)) == 3
+    assert outputs
+    out, err = capfd.readouterr()
+    assert out == "hello\n"
+    assert err == "oops\n"
+    paths = {p.split("?")[0] for _, p in server.requests}
+    assert "/v1.41/containers/c1/wait" in paths
+    assert "/v1.41/containers/c1/start" in paths
+
+
+def test_engine_backend_falls_back_to_cli(run_cli, tmp_path):
+    ws = tmp_path / "ws"
+    ws.mkdir()
+    res, calls = run_cli(
+        "--backend",
+        "engine",
+        str(ws),
+        env={"DOCKER_HOST": f"unix://{Path(tmp_path) / 'nope.sock'}"},
+    )
+    assert res.returncode == 0
+    assert "falling back to the docker CLI" in res.stderr
+    assert calls[-1][0] == "run"
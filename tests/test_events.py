@@ -0,0 +1,64 @@
+import io
+import json
+import sys
+import time
+
+from contain_agent.events import EventWriter, stream_events
+
+
+def test_stream_events_orders_lifecycle():
+    out = io.StringIO()
+    code = stream_events(
+        [sys.executable, "-c", "import sys; print('a'); print('b'); sys.exit(3)"],
+        EventWriter(out),
+    )
+    events = [json.loads(line) for line in out.getvalue().splitlines()]
+    assert code == 3
+    assert [e["event"] for e in events] == ["start", "stdout", "stdout", "exit"]
+    assert [e["line"] for e in events[1:3]] == ["a", "b"]
+    assert events[-1]["exit_code"] == 3
+    assert all(isinstance(e["time"], float) for e in events)
+
+
+def test_stream_events_exit_not_held_by_leftover_process():
+    out = io.StringIO()
+    # The grandchild inherits the output pipes and outlives the command.
+    code = (
+        "import subprocess, sys; "
+        "subprocess.Popen([sys.executable, '-c', 'import time; time.sleep(30)']); "
+        "print('bye')"
+    )
+    started = time.monotonic()
+    assert stream_events([sys.executable, "-c", code], EventWriter(out)) == 0
+    assert time.monotonic() - started < 10
+    events = [json.loads(line) for line in out.getvalue().splitlines()]
+    assert [e["event"] for e in events] == ["start", "stdout", "exit"]
+    assert events[-1]["duration"] < 10
+
+
+def test_stream_events_missing_binary(tmp_path):
+    out = io.StringIO()
+    code = stream_events([str(tmp_path / "nope")], EventWriter(out))
+    events = [json.loads(line) for line in out.getvalue().splitlines()]
+    assert code == 127
+    assert [e["event"] for e in events] == ["error", "exit"]
+
+
+def test_headless_run(run_cli, tmp_path):
+    ws = tmp_path / "ws"
+    ws.mkdir()
+    res, calls = run_cli(
+        "--headless",
+        str(ws),
+        "emit_output",
+        cmd=[sys.executable, "-m", "contain_agent"],
+    )
+    assert res.returncode == 0
+    events = [json.loads(line) for line in res.stdout.splitlines()]
+    assert events[0]["event"] == "start"
+    assert events[-1] == {**events[-1], "event": "exit", "exit_code": 0}
+    lines = {(e["event"], e.get("line")) for e in events[1:-1]}
+    assert lines == {("stdout", "out line"), ("stderr", "err line")}
+    run = calls[-1]
+    assert "-i" in run and "-it" not in run
+    assert not (tmp_path / "home" / ".contain-agent" / "plans").exists()
@@ -0,0 +1,87 @@
+import json
+import sqlite3
+
+from contain_agent.history import (
+    RunInfo,
+    Usage,
+    history_path,
+    query_stats,
+    record_run,
+    usage_from_stats,
+)
+
+
+def test_usage_from_stats():
+    stats = {
+        "cpu_stats": {"cpu_usage": {"total_usage": 2_500_000_000}},
+        "memory_stats": {"usage": 300, "max_usage": 500},
+        "blkio_stats": {
+            "io_service_bytes_recursive": [
+                {"op": "Read", "value": 10},
+                {"op": "read", "value": 5},
+                {"op": "Write", "value": 7},
+                {"op": "Total", "value": 22},
+            ]
+        },
+    }
+    assert usage_from_stats(stats) == Usage(2.5, 500, 15, 7)
+    assert usage_from_stats({"blkio_stats": {}}) == Usage(None, None, 0, 0)
+
+
+def test_query_stats_percentiles(tmp_path):
+    db_path = history_path(tmp_path)
+    claude = RunInfo(db_path, "img:a", tmp_path / "ws", ["yclaude", "-p", "x"])
+    shell = RunInfo(db_path, "img:a", tmp_path / "ws", [])
+    for i in range(1, 11):
+        record_run(claude, 1000.0 + i, 0 if i < 10 else 1, float(i), Usage(1.0, i))
+    record_run(shell, 5000.0, 0, 3.0, Usage())
+
+    rows = query_stats(db_path, ["command"])
+    assert rows[0]["command"] == "yclaude"
+    assert rows[0]["runs"] == 10
+    assert rows[0]["failed"] == 1
+    assert (rows[0]["p50"], rows[0]["p90"], rows[0]["p99"]) == (5.0, 9.0, 10.0)
+    assert rows[0]["mean_cpu"] == 1.0
+    assert rows[0]["max_memory"] == 10
+    assert rows[1] == {
+        "command": "(shell)",
+        "runs": 1,
+        "failed": 0,
+        "p50": 3.0,
+        "p90": 3.0,
+        "p99": 3.0,
+        "mean_cpu": None,
+        "max_memory": None,
+    }
+    assert [r["runs"] for r in query_stats(db_path, ["command"], since=4000)] == [1]
+    assert query_stats(tmp_path / "none.sqlite", ["command"]) == []
+
+
+def test_run_records_history(run_cli, tmp_path):
+    home = tmp_path / "home"
+    ws = tmp_path / "ws"
+    ws.mkdir()
+    env = {"DOCKER_HOST": f"unix://{tmp_path / 'nope.sock'}"}
+    res, calls = run_cli("--history", str(ws), "fail_42", home=home, env=env)
+    assert res.returncode == 42
+    run_args = calls[-1]
+    assert run_args[run_args.index("--name") + 1].startswith("contain-agent-run-")
+
+    db = sqlite3.connect(home / ".contain-agent" / "history.sqlite")
+    ((command, exit_code, workspace),) = db.execute(
+        "SELECT command, exit_code, workspace FROM runs"
+    ).fetchall()
+    db.close()
+    assert json.loads(command) == ["fail_42"]
+    assert exit_code == 42
+    assert workspace == str(ws.resolve())
+
+    res, _ = run_cli("stats", "--by", "command", "--by", "workspace", home=home)
+    assert res.returncode == 0, res.stderr
+    header, row = res.stdout.splitlines()
+    assert header.split()[:4] == ["COMMAND", "WORKSPACE", "RUNS", "FAILED"]
+    assert row.split()[:4] == ["fail_42", str(ws.resolve()), "1", "1"]
+
+    res, _ = run_cli("stats", "--by", "host", home=home)
+    assert res.returncode == 1
+    assert "Cannot group by host" in res.stderr
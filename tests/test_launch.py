@@ -0,0 +1,88 @@
+import subprocess
+import sys
+
+LAUNCH_CMD = [sys.executable, "-m", "contain_agent"]
+
+
+def test_plan_cached_and_execd(run_cli, tmp_path):
+    home = tmp_path / "home"
+    ws = tmp_path / "ws"
+    ws.mkdir()
+
+    res, calls = run_cli(str(ws), "ls", home=home, cmd=LAUNCH_CMD)
+    assert res.returncode == 0
+    assert [c[0] for c in calls] == ["image", "run"]
+    assert len(list((home / ".contain-agent" / "plans").glob("*.json"))) == 1
+
+    res, calls2 = run_cli(str(ws), "ls", home=home, cmd=LAUNCH_CMD)
+    assert res.returncode == 0
+    assert calls2[len(calls) :] == [calls[-1]]
+
+
+def test_plan_invalidated_by_settings_change(run_cli, tmp_path):
+    home = tmp_path / "home"
+    ws = tmp_path / "ws"
+    ws.mkdir()
+
+    run_cli(str(ws), home=home, cmd=LAUNCH_CMD)
+    settings_file = home / ".contain-agent" / "settings.json"
+    settings_file.write_text('{"default_command": "claude"}')
+
+    res, calls = run_cli(str(ws), home=home, cmd=LAUNCH_CMD)
+    assert res.returncode == 0
+    # Plan cache miss, but the image ID cache still avoids an inspect.
+    assert [c[0] for c in calls] == ["image", "run", "run"]
+    assert calls[-1][-5:] == ["bash", "-l", "-i", "-c", "claude"]
+
+
+def test_plan_key_includes_arguments(run_cli, tmp_path):
+    home = tmp_path / "home"
+    ws = tmp_path / "ws"
+    ws.mkdir()
+
+    run_cli(str(ws), "ls", home=home, cmd=LAUNCH_CMD)
+    res, calls = run_cli(str(ws), "fail_42", home=home, cmd=LAUNCH_CMD)
+    assert res.returncode == 42
+    assert calls[-1][-1] == "fail_42"
+
+
+def test_rebuild_run_is_not_cached(run_cli, tmp_path):
+    home = tmp_path / "home"
+    ws = tmp_path / "ws"
+    ws.mkdir()
+
+    run_cli("--build-image", str(ws), "ls", home=home, cmd=LAUNCH_CMD)
+    res, calls = run_cli("--build-image", str(ws), "ls", home=home, cmd=LAUNCH_CMD)
+    assert res.returncode == 0
+    assert [c[0] for c in calls].count("build") == 2
+    assert not list((home / ".contain-agent" / "plans").glob("*.json"))
+
+
+def test_import_is_lightweight():
+    code = (
+        "import sys, contain_agent.launch; "
+        "assert 'typer' not in sys.modules, 'typer'; "
+        "assert 'pydantic' not in sys.modules, 'pydantic'"
+    )
+    res = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, check=False
+    )
+    assert res.returncode == 0, res.stderr
+
+
+def test_settings_export_is_settings_object():
+    import contain_agent
+    from contain_agent import Settings, settings
+    from contain_agent.cli import app  # noqa: F401
+
+    assert isinstance(settings, Settings)
+    assert isinstance(contain_agent.settings, Settings)
+
+
+def test_settings_export_can_be_replaced(monkeypatch):
+    import contain_agent
+    from contain_agent import Settings
+
+    replacement = Settings(default_command="bash")
+    monkeypatch.setattr(contain_agent, "settings", replacement)
+    assert contain_agent.settings is replacement
@@ -0,0 +1,140 @@
+import json
+import os
+import subprocess
+import sys
+import time
+
+
+def _wait_for(predicate, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.05)
+    return False
+
+
+def test_pool_cold_start_then_exec(run_cli, tmp_path):
+    home = tmp_path / "home"
+    ws = tmp_path / "ws"
+    ws.mkdir()
+
+    res, calls = run_cli("--pool", "--pool-size", "1", str(ws), "ls", home=home)
+    assert res.returncode == 0
+    assert any(c[0] == "run" and c[-1] == "ls" for c in calls)
+
+    pool_root = home / ".contain-agent" / "pool"
+    assert _wait_for(lambda: list(pool_root.glob("*/*.idle")))
+    idle = list(pool_root.glob("*/*.idle"))
+    assert len(idle) == 1
+    name = idle[0].stem
+
+    res, calls = run_cli(
+        "--pool",
+        "--pool-size",
+        "1",
+        str(ws),
+        "ls",
+        home=home,
+        env={"FAKE_DOCKER_PS": name},
+    )
+    assert res.returncode == 0
+    exec_calls = [c for c in calls if c[0] == "exec"]
+    assert exec_calls[-1][-6:] == [
+        name,
+        "bash",
+        "-l",
+        "-i",
+        "-c",
+        "ls",
+    ]
+    assert "/workspace/ws" in exec_calls[-1]
+    info = json.loads((idle[0].parent / f"{name}.idle").read_text())
+    assert info["uses"] == 1
+
+
+def test_pool_recycles_after_max_uses(fake_docker, tmp_path, monkeypatch):
+    from contain_agent.pool import Pool, PoolConfig
+
+    monkeypatch.setenv("CONTAIN_AGENT_DOCKER_CMD", str(fake_docker))
+    pool = Pool(tmp_path, "img", ["-w", "/workspace"], PoolConfig(max_uses=2))
+    pool.dir.mkdir(parents=True)
+    (pool.dir / "c1.idle").write_text(json.dumps({"created": time.time(), "uses": 1}))
+
+    assert pool.claim() == "c1"
+    assert pool.claim() is None
+    pool.release("c1")
+    assert not list(pool.dir.iterdir())
+
+
+def test_pool_reaps_idle_and_dead_containers(fake_docker, tmp_path, monkeypatch):
+    from contain_agent.pool import Pool, PoolConfig
+
+    monkeypatch.setenv("CONTAIN_AGENT_DOCKER_CMD", str(fake_docker))
+    monkeypatch.setenv("FAKE_DOCKER_PS", "alive stale")
+    pool = Pool(tmp_path, "img", [], PoolConfig(size=5, idle_timeout=60))
+    pool.dir.mkdir(parents=True)
+    info = json.dumps({"created": time.time(), "uses": 0})
+    for name in ("alive", "stale", "dead"):
+        (pool.dir / f"{name}.idle").write_text(info)
+    old = time.time() - 120
+    os.utime(pool.dir / "stale.idle", (old, old))
+
+    pool.reap()
+    assert sorted(p.name for p in pool.dir.iterdir()) == ["alive.idle"]
+
+
+def test_pool_reaps_busy_entries_without_live_owner(fake_docker, tmp_path, monkeypatch):
+    from contain_agent.pool import STARTING_TIMEOUT, Pool, PoolConfig
+
+    monkeypatch.setenv("CONTAIN_AGENT_DOCKER_CMD", str(fake_docker))
+    pool = Pool(tmp_path, "img", [], PoolConfig(size=0))
+    pool.dir.mkdir(parents=True)
+    exited = subprocess.Popen([sys.executable, "-c", ""])
+    exited.wait()
+    (pool.dir / "owned.busy").write_text(json.dumps({"pid": os.getpid()}))
+    (pool.dir / "dead.busy").write_text(json.dumps({"pid": exited.pid}))
+    (pool.dir / "claiming.busy").write_text("{}")
+    (pool.dir / "orphan.busy").write_text(json.dumps({"pid": 0}))
+    (pool.dir / "unknown.busy").write_text("{}")
+    old = time.time() - STARTING_TIMEOUT - 1
+    for name in ("orphan.busy", "unknown.busy"):
+        os.utime(pool.dir / name, (old, old))
+
+    pool.reap()
+    assert sorted(p.name for p in pool.dir.iterdir()) == [
+        "claiming.busy",
+        "owned.busy",
+    ]
+
+
+def test_pool_reap_spares_entries_being_claimed_or_released(
+    fake_docker, tmp_path, monkeypatch
+):
+    from contain_agent.pool import STARTING_TIMEOUT, Pool, PoolConfig
+
+    monkeypatch.setenv("CONTAIN_AGENT_DOCKER_CMD", str(fake_docker))
+    monkeypatch.setenv("FAKE_DOCKER_PS", "c1")
+    pool = Pool(tmp_path, "img", [], PoolConfig(size=1))
+    pool.dir.mkdir(parents=True)
+    (pool.dir / "c1.idle").write_text(json.dumps({"created": time.time(), "uses": 0}))
+    old = time.time() - STARTING_TIMEOUT - 1
+    os.utime(pool.dir / "c1.idle", (old, old))
+
+    # Reap on both sides of every rewrite, where claim and release hold a
+    # busy entry without a pid.
+    seen = []
+    write = Pool._write
+
+    def write_between_reaps(self, path, info):
+        self.reap()
+        seen.append(sorted(p.name for p in self.dir.iterdir()))
+        write(self, path, info)
+        self.reap()
+        seen.append(sorted(p.name for p in self.dir.iterdir()))
+
+    monkeypatch.setattr(Pool, "_write", write_between_reaps)
+    assert pool.claim() == "c1"
+    pool.release("c1")
+    assert seen == [["c1.busy"]] * 4
+    assert sorted(p.name for p in pool.dir.iterdir()) == ["c1.idle"]
@@ -0,0 +1,177 @@
+import json
+import os
+import subprocess
+import sys
+import time
+
+import pytest
+
+from contain_agent import launch
+from contain_agent.prewarm import (
+    BuildInProgress,
+    build_lock,
+    mark_built,
+    refresh_at,
+    retry_at,
+)
+
+# Holds the build lock until its stdin closes, then dies without releasing it.
+DYING_BUILDER = """
+import fcntl, os, sys
+lock = open(sys.argv[1], "w")
+fcntl.flock(lock, fcntl.LOCK_EX)
+lock.write(str(os.getpid()))
+lock.flush()
+print("locked", flush=True)
+sys.stdin.read()
+os._exit(1)
+"""
+
+
+def test_refresh_clock_starts_on_first_check(tmp_path):
+    assert refresh_at(tmp_path, "img", 0) is None
+    first = refresh_at(tmp_path, "img", 3600)
+    assert first is not None
+    assert refresh_at(tmp_path, "img", 3600) == first
+
+    mark_built(tmp_path, "img", now=1000.0)
+    assert refresh_at(tmp_path, "img", 3600) == 4600.0
+
+
+def test_expired_plan_is_ignored(tmp_path, monkeypatch):
+    monkeypatch.setenv("HOME", str(tmp_path))
+    launch.save_plan("k", ["docker", "run"], [], "sha256:x", expires=None)
+    assert launch.load_plan("k") == ["docker", "run"]
+    launch.save_plan("k", ["docker", "run"], [], "sha256:x", expires=1.0)
+    assert launch.load_plan("k") is None
+
+
+def test_prewarm_builds_to_temporary_tag(run_cli, tmp_path):
+    res, calls = run_cli("prewarm", "--image", "missing-img")
+    assert res.returncode == 0, res.stderr
+    build = next(c for c in calls if c[0] == "build")
+    temp = build[build.index("-t") + 1]
+    assert temp.startswith("missing-img:prewarm-")
+    assert build.count("-t") == 1
+    tags = [c for c in calls if c[0] == "tag"]
+    assert tags[0] == ["tag", temp, "missing-img"]
+    assert tags[1][2].startswith("missing-img:")
+    assert ["rmi", temp] in calls
+
+
+def test_prewarm_skips_current_image(run_cli, tmp_path):
+    res, calls = run_cli("prewarm")
+    assert res.returncode == 0
+    assert "up to date" in res.stderr
+    assert not any(c[0] == "build" for c in calls)
+
+
+def test_run_uses_previous_build_while_prewarming(run_cli, tmp_path):
+    home = tmp_path / "home"
+    state = home / ".contain-agent"
+    state.mkdir(parents=True)
+    (state / "settings.json").write_text(json.dumps({"prewarm": True}))
+    (state / "images.json").write_text(json.dumps({"missing-img": "sha256:old"}))
+    ws = tmp_path / "ws"
+    ws.mkdir()
+
+    res, calls = run_cli("--image", "missing-img", str(ws), home=home)
+    assert res.returncode == 0, res.stderr
+    assert "builds in the background" in res.stderr
+    runs = [c for c in calls if c[0] == "run"]
+    assert runs and "missing-img" in runs[0]
+    assert not any(c[0] == "build" for c in calls[: calls.index(runs[0])])
+    assert (state / "prewarm" / "missing-img.log").exists()
+
+
+def test_prewarm_is_opt_in(run_cli, tmp_path):
+    home = tmp_path / "home"
+    state = home / ".contain-agent"
+    state.mkdir(parents=True)
+    (state / "images.json").write_text(json.dumps({"missing-img": "sha256:old"}))
+    ws = tmp_path / "ws"
+    ws.mkdir()
+
+    res, calls = run_cli("--image", "missing-img", str(ws), home=home)
+    assert res.returncode == 0, res.stderr
+    assert "not found locally" in res.stderr
+    assert calls[1][0] == "build"
+    assert not (state / "prewarm" / "missing-img.log").exists()
+
+
+def test_failed_build_backs_off(run_cli, tmp_path):
+    home = tmp_path / "home"
+    state = home / ".contain-agent"
+    res, _ = run_cli("prewarm", "--image", "missing-img-fail_build", home=home)
+    assert res.returncode == 2
+    retry = retry_at(state, "missing-img-fail_build")
+    assert retry is not None and retry > time.time()
+
+    (state / "settings.json").write_text(json.dumps({"prewarm": True}))
+    (state / "images.json").write_text(
+        json.dumps({"missing-img-fail_build": "sha256:old"})
+    )
+    ws = tmp_path / "ws"
+    ws.mkdir()
+    res, _ = run_cli("--image", "missing-img-fail_build", str(ws), home=home)
+    assert res.returncode == 0, res.stderr
+    assert "the last background build failed" in res.stderr
+    assert not (state / "prewarm" / "missing-img-fail_build.log").exists()
+
+    mark_built(state, "missing-img-fail_build")
+    assert retry_at(state, "missing-img-fail_build") is None
+
+
+def test_build_lock_excludes_other_builds(tmp_path):
+    with build_lock(tmp_path, "img") as waited:
+        assert not waited
+        with pytest.raises(BuildInProgress), build_lock(tmp_path, "img", wait=False):
+            pass
+    with build_lock(tmp_path, "img", wait=False) as waited:
+        assert not waited
+
+
+def test_run_waits_for_concurrent_build(fake_docker, tmp_path):
+    home = tmp_path / "home"
+    lock_path = home / ".contain-agent" / "prewarm" / "missing-img.lock"
+    lock_path.parent.mkdir(parents=True)
+    holder = subprocess.Popen(
+        [sys.executable, "-c", DYING_BUILDER, str(lock_path)],
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+        text=True,
+    )
+    assert holder.stdout.readline() == "locked\n"
+    ws = tmp_path / "ws"
+    ws.mkdir()
+    log = tmp_path / "docker_calls.log"
+    env = {
+        **os.environ,
+        "HOME": str(home),
+        "CONTAIN_AGENT_DOCKER_CMD": str(fake_docker),
+        "FAKE_DOCKER_LOG": str(log),
+    }
+    cli = subprocess.Popen(
+        [sys.executable, "-c", "from contain_agent import app; app()"]
+        + ["--image", "missing-img", str(ws)],
+        env=env,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        text=True,
+    )
+    # Let the builder die only once the run is waiting for its lock.
+    stderr = ""
+    for line in cli.stderr:
+        stderr += line
+        if line.startswith("Waiting for another build"):
+            break
+    holder.stdin.close()
+    holder.wait()
+    _, rest = cli.communicate(timeout=60)
+    stderr += rest
+    assert cli.returncode == 0, stderr
+    assert f"Waiting for another build of 'missing-img' by process {holder.pid}" in (
+        stderr
+    )
+    calls = [json.loads(line) for line in log.read_text().splitlines()]
+    assert any(c[0] == "build" for c in calls)
@@ -0,0 +1,48 @@
+from contain_agent.proxy import PROXY_CONTAINER, proxy_env
+
+
+def test_cache_proxy_started_and_injected(run_cli, tmp_path):
+    ws = tmp_path / "ws"
+    ws.mkdir()
+    res, calls = run_cli("--cache-proxy", str(ws), "pip", "install", "x")
+    assert res.returncode == 0, res.stderr
+    sidecar = next(c for c in calls if c[:2] == ["run", "-d"])
+    assert sidecar[sidecar.index("--name") + 1] == PROXY_CONTAINER
+    assert sidecar[sidecar.index("--network") + 1] == "contain-agent"
+    assert "/proxy_server.py" in sidecar
+
+    run = calls[-1]
+    assert run[0] == "run" and "-d" not in run
+    assert run[run.index("--network") + 1] == "contain-agent"
+    for key, value in proxy_env().items():
+        assert f"{key}={value}" in run
+    assert any(a.endswith(":/home/agent/.cargo/config.toml:ro") for a in run)
+    config = tmp_path / "home" / ".contain-agent" / "cache-proxy" / "cargo-config.toml"
+    assert "sparse+http://contain-agent-cache-proxy:3128/crates-index/" in (
+        config.read_text()
+    )
+
+
+def test_cache_proxy_joins_given_network(run_cli, tmp_path):
+    ws = tmp_path / "ws"
+    ws.mkdir()
+    res, calls = run_cli(
+        "--cache-proxy",
+        "--network",
+        "mynet",
+        str(ws),
+        env={"FAKE_DOCKER_CONTAINER": "false stale-spec"},
+    )
+    assert res.returncode == 0, res.stderr
+    assert ["rm", "-f", PROXY_CONTAINER] in calls
+    assert ["network", "connect", "mynet", PROXY_CONTAINER] in calls
+    assert calls[-1][calls[-1].index("--network") + 1] == "mynet"
+
+
+def test_cache_proxy_refuses_host_network(run_cli, tmp_path):
+    ws = tmp_path / "ws"
+    ws.mkdir()
+    res, calls = run_cli("--cache-proxy", "--network", "host", str(ws))
+    assert res.returncode == 1
+    assert "cannot be reached on network 'host'" in res.stderr
+    assert not any(c[0] == "run" for c in calls)
@@ -0,0 +1,108 @@
+import threading
+import urllib.error
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import ClassVar
+
+import pytest
+
+from contain_agent.proxy_server import ArtifactCache, ProxyServer
+
+WHEEL = b"wheel bytes" * 100
+
+
+class FakeUpstream(BaseHTTPRequestHandler):
+    hits: ClassVar[list[str]] = []
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        type(self).hits.append(self.path)
+        base = f"http://127.0.0.1:{self.server.server_port}"
+        if self.path == "/simple/pkg/":
+            body = f'<a href="{base}/files/pkg-1.0-py3-none-any.whl">pkg</a>'.encode()
+        elif self.path == "/files/pkg-1.0-py3-none-any.whl":
+            body = WHEEL
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def _serve(server):
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
+
+
+@pytest.fixture
+def proxy(tmp_path):
+    FakeUpstream.hits = []
+    upstream = _serve(ThreadingHTTPServer(("127.0.0.1", 0), FakeUpstream))
+    base = f"http://127.0.0.1:{upstream.server_port}"
+    server = ProxyServer(
+        ("127.0.0.1", 0),
+        ArtifactCache(tmp_path / "cache", 1 << 20),
+        "http://proxy.invalid",
+        {"pypi": base, "pythonhosted": f"{base}/files"},
+    )
+    server.public = f"http://127.0.0.1:{server.server_port}"
+    _serve(server)
+    yield server
+    server.shutdown()
+    upstream.shutdown()
+
+
+def _get(url):
+    with urllib.request.urlopen(url, timeout=5) as resp:
+        return resp.read(), resp.headers.get("X-Cache")
+
+
+def test_metadata_links_rewritten_to_proxy(proxy):
+    body, _ = _get(f"{proxy.public}/pypi/simple/pkg/")
+    assert body == (
+        b'<a href="http://proxy.invalid/pythonhosted/pkg-1.0-py3-none-any.whl">pkg</a>'
+    )
+
+
+def test_artifact_served_from_cache(proxy):
+    url = f"{proxy.public}/pythonhosted/pkg-1.0-py3-none-any.whl"
+    assert _get(url) == (WHEEL, "MISS")
+    assert _get(url) == (WHEEL, "HIT")
+    assert FakeUpstream.hits == ["/files/pkg-1.0-py3-none-any.whl"]
+    assert proxy.cache.size == len(WHEEL)
+
+
+def test_upstream_errors_passed_through(proxy):
+    with pytest.raises(urllib.error.HTTPError) as e:
+        _get(f"{proxy.public}/pypi/simple/nope/")
+    assert e.value.code == 404
+    with pytest.raises(urllib.error.HTTPError) as e:
+        _get(f"{proxy.public}/unknown/x")
+    assert e.value.code == 404
+
+
+def _store(cache, key, data):
+    with cache.writer() as f:
+        f.write(data)
+    cache.commit(key, Path(f.name))
+
+
+def test_cache_evicts_least_recently_used(tmp_path):
+    cache = ArtifactCache(tmp_path, 250)
+    _store(cache, "a", b"a" * 100)
+    _store(cache, "b", b"b" * 100)
+    cache.open("a").close()  # a is now more recently used than b
+    _store(cache, "c", b"c" * 100)
+    assert cache.open("b") is None
+    for key in ("a", "c"):
+        with cache.open(key) as f:
+            assert f.read() == key.encode() * 100
+    assert cache.size == 200
+    # The running total survives a restart.
+    assert ArtifactCache(tmp_path, 250).size == 200
@@ -0,0 +1,27 @@
+from contain_agent.resources import format_cpuset, parse_cpuset, partition
+
+
+def test_cpuset_round_trip():
+    assert parse_cpuset("0-3,6, 8-9") == {0, 1, 2, 3, 6, 8, 9}
+    assert format_cpuset([9, 0, 1, 2, 3, 6, 8]) == "0-3,6,8-9"
+    assert format_cpuset([5]) == "5"
+    assert format_cpuset([]) == ""
+
+
+def test_partition_gives_disjoint_even_slices():
+    gib = 1 << 30
+    first = partition(8, 16 * gib, [])
+    assert first.cpuset_cpus == "0-7"
+    assert first.memory == "16384m"
+
+    second = partition(8, 16 * gib, [{0, 1, 2, 3}])
+    assert second.cpuset_cpus == "4-7"
+    assert second.memory == "8192m"
+
+    third = partition(12, 12 * gib, [{0, 1, 2, 3}, {8, 9, 10, 11}])
+    assert third.cpuset_cpus == "4-7"
+
+
+def test_partition_with_more_agents_than_cores():
+    share = partition(2, 1 << 30, [{0}, {1}, {0}])
+    assert share.cpuset_cpus == "1"
@@ -0,0 +1,59 @@
+def _labels(run_args):
+    return [run_args[i + 1] for i, a in enumerate(run_args) if a == "--label"]
+
+
+def test_session_created_then_resumed(run_cli, tmp_path):
+    ws = tmp_path / "ws"
+    ws.mkdir()
+    res, calls = run_cli("--session", "s1", str(ws), "make")
+    assert res.returncode == 0, res.stderr
+    create = next(c for c in calls if c[0] == "run")
+    assert create[:4] == ["run", "-d", "--name", "contain-agent-session-s1"]
+    assert create[-2:] == ["sleep", "infinity"]
+    assert "--rm" not in create
+    exec_call = next(c for c in calls if c[0] == "exec")
+    assert "CONTAIN_AGENT_SESSION=s1" in exec_call
+    assert "CONTAIN_AGENT_SESSION_RESUMED=1" not in exec_call
+    assert exec_call[-1] == "make"
+    assert calls[-1] == ["stop", "--time", "0", "contain-agent-session-s1"]
+
+    spec = next(
+        label.split("=", 1)[1]
+        for label in _labels(create)
+        if label.startswith("contain-agent.session-spec=")
+    )
+    before = len(calls)
+    res, calls = run_cli(
+        "--session",
+        "s1",
+        str(ws),
+        "make",
+        env={"FAKE_DOCKER_CONTAINER": f"false {spec}"},
+    )
+    assert res.returncode == 0, res.stderr
+    # The call log accumulates across runs; only look at the second one.
+    calls = calls[before:]
+    kinds = [c[0] for c in calls]
+    assert "run" not in kinds[kinds.index("container") :]
+    assert ["start", "contain-agent-session-s1"] in calls
+    exec_call = next(c for c in calls if c[0] == "exec")
+    assert "CONTAIN_AGENT_SESSION_RESUMED=1" in exec_call
+
+
+def test_session_with_different_spec_is_refused(run_cli, tmp_path):
+    ws = tmp_path / "ws"
+    ws.mkdir()
+    res, calls = run_cli(
+        "--session", "s1", str(ws), env={"FAKE_DOCKER_CONTAINER": "true other"}
+    )
+    assert res.returncode == 1
+    assert "created with a different image or options" in res.stderr
+    assert not any(c[0] == "exec" for c in calls)
+
+
+def test_session_name_is_validated(run_cli, tmp_path):
+    ws = tmp_path / "ws"
+    ws.mkdir()
+    res, _ = run_cli("--session", "../x", str(ws))
+    assert res.returncode == 1
+    assert "invalid session name" in res.stderr
@@ -0,0 +1,79 @@
+import subprocess
+
+from contain_agent.snapshot import collect_snapshot, create_snapshot
+
+
+def _git(cwd, *args):
+    subprocess.run(
+        ["git", "-c", "user.name=t", "-c", "user.email=t@t", *args],
+        cwd=cwd,
+        check=True,
+        capture_output=True,
+    )
+
+
+def _repo(path):
+    path.mkdir()
+    _git(path, "init", "-q")
+    (path / "tracked.txt").write_text("one\n")
+    (path / "sub").mkdir()
+    (path / "sub" / "keep.txt").write_text("keep\n")
+    (path / ".gitignore").write_text("ignored.txt\n")
+    _git(path, "add", "-A")
+    _git(path, "commit", "-q", "-m", "init")
+    return path
+
+
+def test_snapshot_carries_dirty_state_and_collects_diff(tmp_path):
+    repo = _repo(tmp_path / "repo")
+    (repo / "tracked.txt").write_text("two\n")
+    (repo / "new.txt").write_text("untracked\n")
+    (repo / "ignored.txt").write_text("secret\n")
+
+    snap = create_snapshot(repo / "sub", tmp_path / "snapshots")
+    assert snap.worktree.name == "repo"
+    assert snap.workspace == snap.worktree / "sub"
+    assert (snap.worktree / "tracked.txt").read_text() == "two\n"
+    assert (snap.worktree / "new.txt").read_text() == "untracked\n"
+    assert not (snap.worktree / "ignored.txt").exists()
+
+    assert collect_snapshot(snap, tmp_path / "none.patch") is None
+
+    (snap.workspace / "keep.txt").write_text("changed\n")
+    (snap.worktree / "added.txt").write_text("added\n")
+    _git(snap.worktree, "commit", "-q", "-am", "agent commit")
+    patch = collect_snapshot(snap, tmp_path / "out.patch")
+    assert patch is not None
+
+    # Only the agent's changes are in the patch, so it applies to the host.
+    _git(repo, "apply", str(patch))
+    assert (repo / "sub" / "keep.txt").read_text() == "changed\n"
+    assert (repo / "added.txt").read_text() == "added\n"
+    assert (repo / "tracked.txt").read_text() == "two\n"
+
+
+def test_snapshot_run(run_cli, tmp_path):
+    repo = _repo(tmp_path / "repo")
+    home = tmp_path / "home"
+    res, calls = run_cli("--snapshot", str(repo), "ls", home=home)
+    assert res.returncode == 0, res.stderr
+    assert "Snapshot: no changes." in res.stderr
+
+    run = calls[-1]
+    mounts = [run[i + 1] for i, arg in enumerate(run) if arg == "-v"]
+    snapshots = home / ".contain-agent" / "snapshots"
+    assert any(
+        m.startswith(f"{snapshots}/") and m.endswith(":/workspace/repo") for m in mounts
+    )
+    git_dir = str(repo / ".git")
+    assert f"{git_dir}:{git_dir}" in mounts
+    assert list(snapshots.iterdir()) == []
+
+
+def test_snapshot_requires_git_repo(run_cli, tmp_path):
+    ws = tmp_path / "ws"
+    ws.mkdir()
+    res, calls = run_cli("--snapshot", str(ws), "ls")
+    assert res.returncode == 1
+    assert "cannot snapshot" in res.stderr
+    assert not any(c[0] == "run" for c in calls)
@@ -0,0 +1,107 @@
+import os
+
+from contain_agent.sync import LocalTree, SyncResult, sync_trees, volume_name
+
+
+class CountingTree(LocalTree):
+    """LocalTree that records which files it was asked to hash."""
+
+    def __init__(self, root):
+        super().__init__(root)
+        self.hashed = []
+
+    def hashes(self, paths):
+        self.hashed.extend(paths)
+        return super().hashes(paths)
+
+
+def _trees(tmp_path):
+    host = tmp_path / "host"
+    (host / "src").mkdir(parents=True)
+    (host / "src" / "a.txt").write_text("a\n")
+    (host / "b.txt").write_text("b\n")
+    os.symlink("b.txt", host / "link")
+    volume = tmp_path / "volume"
+    volume.mkdir()
+    return CountingTree(host), CountingTree(volume), tmp_path / "manifest.json"
+
+
+def test_initial_sync_pushes_everything(tmp_path):
+    local, remote, manifest = _trees(tmp_path)
+    result = sync_trees(local, remote, manifest)
+    assert sorted(result.pushed) == ["b.txt", "link", "src/a.txt"]
+    assert (remote.root / "src" / "a.txt").read_text() == "a\n"
+    assert os.readlink(remote.root / "link") == "b.txt"
+
+
+def test_incremental_sync_only_touches_changed_files(tmp_path):
+    local, remote, manifest = _trees(tmp_path)
+    sync_trees(local, remote, manifest)
+    local.hashed.clear()
+    remote.hashed.clear()
+
+    assert sync_trees(local, remote, manifest) == SyncResult()
+    assert local.hashed == remote.hashed == []
+
+    (local.root / "b.txt").write_text("b2\n")
+    (remote.root / "src" / "a.txt").write_text("a2\n")
+    (remote.root / "built.o").write_text("obj\n")
+    (local.root / "link").unlink()
+    result = sync_trees(local, remote, manifest)
+
+    assert result.pushed == ["b.txt"]
+    assert sorted(result.pulled) == ["built.o", "src/a.txt"]
+    assert result.deleted_remote == ["link"]
+    assert sorted(local.hashed) == ["b.txt"]
+    assert sorted(remote.hashed) == ["built.o", "src/a.txt"]
+    assert (remote.root / "b.txt").read_text() == "b2\n"
+    assert (local.root / "src" / "a.txt").read_text() == "a2\n"
+    assert not os.path.lexists(remote.root / "link")
+
+
+def test_conflicts_resolved_by_preference(tmp_path):
+    local, remote, manifest = _trees(tmp_path)
+    sync_trees(local, remote, manifest)
+    (local.root / "b.txt").write_text("host\n")
+    (remote.root / "b.txt").write_text("agent\n")
+
+    result = sync_trees(local, remote, manifest, prefer="remote")
+    assert result.conflicts == ["b.txt"]
+    assert (local.root / "b.txt").read_text() == "agent\n"
+
+
+def test_recreated_volume_is_not_a_deletion(tmp_path):
+    local, remote, manifest = _trees(tmp_path)
+    sync_trees(local, remote, manifest)
+    os.rename(remote.root, tmp_path / "old")
+    remote.root.mkdir()
+
+    result = sync_trees(local, remote, manifest)
+    assert result.deleted_local == []
+    assert (local.root / "b.txt").exists()
+    assert (remote.root / "b.txt").exists()
+
+
+def test_volume_name_is_stable_and_valid(tmp_path):
+    ws = tmp_path / "my project"
+    ws.mkdir()
+    name = volume_name(ws)
+    assert name == volume_name(ws)
+    assert name.startswith("contain-agent-sync-my-project-")
+
+
+def test_sync_run_mounts_volume(run_cli, tmp_path):
+    ws = tmp_path / "ws"
+    ws.mkdir()
+    (ws / "file.txt").write_text("x\n")
+    res, calls = run_cli("--sync", str(ws), "ls")
+    assert res.returncode == 0, res.stderr
+    assert res.stderr.count("Synced contain-agent-sync-ws-") == 2
+
+    volume = volume_name(ws)
+    run = next(c for c in calls if c[0] == "run" and "--entrypoint" not in c)
+    assert f"{volume}:/workspace/ws" in run
+    helpers = [c for c in calls if c[0] == "run" and "--entrypoint" in c]
+    assert any(c[-1].startswith("find ") for c in helpers)
+    assert any("tar --unlink-first -xf -" in c[-1] for c in helpers)
+    assert all(f"{volume}:/sync" in c for c in helpers)
@@ -0,0 +1,66 @@
+import json
+import os
+import sys
+
+from contain_agent.timings import Timings
+from contain_agent.transcript import relay
+
+
+def test_timings_phases_and_markers():
+    clock = Timings(start=0.0)
+    clock.record("settings")
+    with clock.phase("container"):
+        clock.mark("first_output")
+        clock.mark("first_output")
+    data = clock.as_dict()
+    assert [p["name"] for p in data["phases"]] == ["settings", "container"]
+    assert list(data["markers"]) == ["first_output"]
+    assert data["phases"][1]["start_ms"] <= data["markers"]["first_output"]
+
+
+def test_timings_table(run_cli, tmp_path):
+    ws = tmp_path / "ws"
+    ws.mkdir()
+    res, _ = run_cli("--timings", str(ws), "ls")
+    assert res.returncode == 0
+    table = res.stderr.splitlines()
+    assert table[0].split() == ["PHASE", "START", "TOOK"]
+    names = [line.split()[0] for line in table[1:]]
+    for phase in ("import", "settings", "config_mounts", "image", "container", "total"):
+        assert phase in names
+
+
+def test_timings_env_appends_jsonl(run_cli, tmp_path):
+    ws = tmp_path / "ws"
+    ws.mkdir()
+    log = tmp_path / "timings.jsonl"
+    for _ in range(2):
+        res, _ = run_cli(
+            str(ws), "emit_output", env={"CONTAIN_AGENT_TIMINGS": str(log)}
+        )
+        assert res.returncode == 0
+        assert "out line" in res.stdout
+    lines = [json.loads(line) for line in log.read_text().splitlines()]
+    assert len(lines) == 2
+    assert "first_output" in lines[0]["markers"]
+    assert lines[0]["argv"][-1] == "emit_output"
+
+
+def test_timed_relay_keeps_a_terminal(capfd, monkeypatch):
+    master, slave = os.openpty()
+    clock = Timings()
+    code = "import sys; print(sys.stdin.isatty() and sys.stdout.isatty())"
+    try:
+        with open(slave, closefd=False) as stdin:
+            monkeypatch.setattr(sys, "stdin", stdin)
+            status = relay(
+                [sys.executable, "-c", code],
+                None,
+                on_output=lambda: clock.mark("first_output"),
+            )
+    finally:
+        os.close(master)
+        os.close(slave)
+    assert status == 0
+    assert capfd.readouterr().out.strip() == "True"
+    assert "first_output" in clock.markers
@@ -0,0 +1,67 @@
+import gzip
+import os
+import sys
+
+from contain_agent.transcript import RING_SIZE, Transcript, relay
+
+
+def test_transcript_round_trip(tmp_path):
+    path = tmp_path / "t.log.gz"
+    transcript = Transcript(path, max_bytes=1 << 30)
+    chunks = [bytes([i % 256]) * 70000 for i in range(20)]
+    for chunk in chunks:
+        transcript.feed(memoryview(chunk))
+    transcript.close()
+    assert gzip.decompress(path.read_bytes()) == b"".join(chunks)
+
+
+def test_transcript_keeps_head_and_tail_when_capped(tmp_path):
+    path = tmp_path / "t.log.gz"
+    transcript = Transcript(path, max_bytes=1)
+    data = os.urandom(RING_SIZE * 3 + 12345)
+    for i in range(0, len(data), 65536):
+        transcript.feed(memoryview(data)[i : i + 65536])
+    transcript.close()
+    text = gzip.decompress(path.read_bytes())
+    head = RING_SIZE // 2
+    skipped = len(data) - head - RING_SIZE
+    note = f"\n[contain-agent: {skipped} bytes of output omitted]\n".encode()
+    assert text == data[:head] + note + data[-RING_SIZE:]
+    assert os.path.getsize(path) < len(data)
+
+
+def test_no_output_writes_no_file(tmp_path):
+    path = tmp_path / "t.log.gz"
+    Transcript(path, max_bytes=100).close()
+    assert not path.exists()
+
+
+def test_relay_tees_piped_output(tmp_path, capfd, monkeypatch):
+    path = tmp_path / "t.log.gz"
+    seen = []
+    code = "import sys; sys.stdout.write('x' * 200000 + 'end'); sys.exit(3)"
+    with open(os.devnull) as stdin:
+        monkeypatch.setattr(sys, "stdin", stdin)
+        status = relay(
+            [sys.executable, "-c", code],
+            Transcript(path, max_bytes=1 << 20),
+            on_output=lambda: seen.append(1),
+        )
+    assert status == 3
+    assert seen
+    out, _ = capfd.readouterr()
+    assert out == "x" * 200000 + "end"
+    assert gzip.decompress(path.read_bytes()) == out.encode()
+
+
+def test_run_with_transcript(run_cli, tmp_path):
+    home = tmp_path / "home"
+    ws = tmp_path / "ws"
+    ws.mkdir()
+    res, calls = run_cli("--transcript", str(ws), "emit_output", home=home)
+    assert res.returncode == 0, res.stderr
+    assert res.stdout == "out line\n"
+    assert "Transcript saved to" in res.stderr
+    (saved,) = (home / ".contain-agent" / "transcripts").glob("*.log.gz")
+    assert gzip.decompress(saved.read_bytes()) == b"out line\n"
+    assert calls[-1][0] == "run"